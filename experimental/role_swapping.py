@@ -8,6 +8,7 @@ sys.path.append(FILE_PATH + "/../src")
 
 from bluetoothctl import Bluetoothctl
 from follower import Follower
+from framesource import DeviceSource
 from leader import Leader
 from tagrec import TagRecognition
 
@@ -44,14 +45,19 @@ def disconnect_and_remove_device(bt, bt_addr):
 
 
 def main():
-    tag = TagRecognition()
+    # The follower shares the camera with the role swapping tag. Only one of
+    # them reads it at a time: a VideoCapture must not be read from two
+    # threads, and the follower reads on a capture thread.
+    camera = DeviceSource(0)
+    tag = TagRecognition(source=camera)
     bt = Bluetoothctl()
     BT_ADDR = "5C:BA:37:26:6D:9A"
 
     # If an ARTag is detected, the vehicle will become a follower.
     # If an ARTag is not detected, the vehicle will become a leader.
     if tag.detect():
-        vehicle = Follower()
+        tag.release()
+        vehicle = Follower(source=camera)
     else:
         if not is_controller_connected():
             # If a controller is not connected, remove it to avoid problems
@@ -71,17 +77,18 @@ def main():
     start_time = time.time()
 
     while True:
-        tag_visible = tag.detect()
         if isinstance(vehicle, Leader):
+            tag_visible = tag.detect()
             vehicle.lead()
 
             if tag_visible:
                 while is_controller_connected():
                     bt.disconnect('5C:BA:37:26:6D:9A')
                     sleep(Follower.CYCLE_TIME)
-                vehicle = Follower()
+                tag.release()
+                vehicle = Follower(source=camera)
         else:
-            vehicle.follow()
+            tag_visible = vehicle.follow()
             if tag_visible:
                 timer_set = False
             elif not timer_set:
@@ -97,6 +104,7 @@ def main():
                 sleep(Follower.CYCLE_TIME)
 
                 if is_controller_connected():
+                    vehicle.release()
                     vehicle = Leader()
                 else:
                     start_time = time.time()
@@ -0,0 +1,575 @@
+"""
+actuators
+
+Author: Wisam Bunni
+"""
+import threading
+
+from stagetimer import StageTimer, clock
+
+
+class _WriteCache:
+    """
+    Remembers the last value written to an actuator and decides whether a new
+    value is worth a bus write.
+
+    A value is written if nothing was written yet, if it differs from the last
+    written value by more than deadband, or if it is the rest value (such as
+    a speed of 0) and the last written value was not. Otherwise the write is
+    suppressed.
+
+    :param deadband: The largest change that is not written.
+    :type deadband: float
+
+    :param rest: A value that is always written when it is reached.
+    :type rest: float
+    """
+
+    def __init__(self, deadband=0, rest=None):
+        self._deadband = deadband
+        self._rest = rest
+        self._value = None
+        self.issued = 0
+        self.suppressed = 0
+
+
+    def should_write(self, value):
+        """
+        Checks if a value needs to be written, and counts the answer.
+
+        :param value: The commanded value.
+        :type value: float
+
+        :return: True if the value should be written, False otherwise.
+        :rtype: bool
+        """
+        last = self._value
+        if (last is None or abs(value - last) > self._deadband
+                or (value == self._rest and last != self._rest)):
+            self._value = value
+            self.issued += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+
+    def get(self):
+        """
+        Gets the last written value.
+
+        :return: The value, or None if nothing was written.
+        :rtype: float
+        """
+        return self._value
+
+
+    def invalidate(self):
+        """Forgets the last written value, so the next value is written."""
+        self._value = None
+
+
+def _invalidating(method, caches):
+    """
+    Wraps a method of wrapped wheels so that calling it forgets the values
+    in the caches, since it moves the wheels without going through them.
+
+    :param method: The method.
+    :type method: callable
+
+    :param caches: The caches to invalidate after each call.
+    :type caches: tuple of _WriteCache
+
+    :return: The wrapped method.
+    :rtype: callable
+    """
+    def call(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        finally:
+            for cache in caches:
+                cache.invalidate()
+
+    return call
+
+
+class CachedServo:
+    """
+    A servo, such as picar's Servo.Servo, that is only written to when its
+    angle really changes.
+
+    :param servo: The servo to write to.
+    :type servo: picar.SunFounder_PCA9685.Servo.Servo
+
+    :param deadband: The largest change in angle (in degrees) that is not
+                     written.
+    :type deadband: float
+    """
+
+    def __init__(self, servo, deadband=0):
+        self._servo = servo
+        self._cache = _WriteCache(deadband)
+
+
+    def write(self, angle):
+        """
+        Moves the servo to an angle, unless it is already there.
+
+        :param angle: The angle (in degrees).
+        :type angle: float
+        """
+        if self._cache.should_write(angle):
+            self._servo.write(angle)
+
+
+    def invalidate(self):
+        """Forgets the servo's angle, so the next angle is written."""
+        self._cache.invalidate()
+
+
+    def get_write_counts(self):
+        """
+        Gets the number of writes issued to the bus and suppressed.
+
+        :return: Dictionary containing the issued and suppressed counts.
+        :rtype: dict
+        """
+        return {'issued': self._cache.issued,
+                'suppressed': self._cache.suppressed}
+
+
+class CachedFrontWheels:
+    """
+    picar's front_wheels.Front_Wheels, only written to when the wheel angle
+    really changes.
+
+    Attributes other than the ones below, such as turning_max, are read from
+    the wrapped wheels. Calling their other methods that move the wheels, such
+    as turn_left(), or writing their attributes, such as turning_offset, is
+    passed through and forgets the wheel angle, so the next turn() is written.
+
+    :param front_wheels: The front wheels to write to.
+    :type front_wheels: picar.front_wheels.Front_Wheels
+
+    :param deadband: The largest change in angle (in degrees) that is not
+                     written. Turning straight is always written.
+    :type deadband: float
+
+    :param straight_angle: The angle that turns the wheels straight.
+    :type straight_angle: float
+    """
+
+    WRITE_METHODS = ('turn_left', 'turn_straight', 'turn_right', 'cali_left',
+                     'cali_right', 'cali_ok')
+    """The methods of the wrapped wheels that move them."""
+
+    def __init__(self, front_wheels, deadband=0, straight_angle=90):
+        self._wheels = front_wheels
+        self._angle = _WriteCache(deadband, rest=straight_angle)
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self._wheels, name)
+        if name in self.WRITE_METHODS:
+            return _invalidating(attribute, (self._angle,))
+        return attribute
+
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            self.__dict__[name] = value
+            return
+
+        setattr(self._wheels, name, value)
+        self._angle.invalidate()
+
+
+    def turn(self, angle):
+        """
+        Turns the wheels to an angle, unless they are already there.
+
+        :param angle: The angle (in degrees).
+        :type angle: float
+        """
+        if self._angle.should_write(angle):
+            self._wheels.turn(angle)
+
+
+    def ready(self):
+        """Turns the wheels straight."""
+        self._wheels.ready()
+        self._angle.invalidate()
+
+
+    def calibration(self):
+        """Starts calibrating the wheels."""
+        self._wheels.calibration()
+        self._angle.invalidate()
+
+
+    def get_write_counts(self):
+        """
+        Gets the number of writes issued to the bus and suppressed.
+
+        :return: Dictionary containing the issued and suppressed counts.
+        :rtype: dict
+        """
+        return {'issued': self._angle.issued,
+                'suppressed': self._angle.suppressed}
+
+
+class CachedBackWheels:
+    """
+    picar's back_wheels.Back_Wheels, only written to when the speed or the
+    direction really changes.
+
+    Attributes other than the ones below are read from the wrapped wheels.
+    Writing speed is the same as set_speed(). Calling the other methods of the
+    wrapped wheels that move them, such as cali_ok(), or writing their other
+    attributes is passed through and forgets the speed and the direction, so
+    the next ones are written.
+
+    :param back_wheels: The back wheels to write to.
+    :type back_wheels: picar.back_wheels.Back_Wheels
+
+    :param deadband: The largest change in speed that is not written. A speed
+                     of 0 is always written.
+    :type deadband: float
+    """
+
+    FORWARD = 1
+    """The direction set by forward()."""
+    BACKWARD = -1
+    """The direction set by backward()."""
+    WRITE_METHODS = ('cali_left', 'cali_right', 'cali_ok', 'calibration')
+    """The methods of the wrapped wheels that move them."""
+
+    def __init__(self, back_wheels, deadband=0):
+        self._wheels = back_wheels
+        self._speed = _WriteCache(deadband, rest=0)
+        self._direction = _WriteCache()
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self._wheels, name)
+        if name in self.WRITE_METHODS:
+            return _invalidating(attribute, (self._speed, self._direction))
+        return attribute
+
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            self.__dict__[name] = value
+        elif name == 'speed':
+            self.set_speed(value)
+        else:
+            setattr(self._wheels, name, value)
+            self._speed.invalidate()
+            self._direction.invalidate()
+
+
+    def set_speed(self, speed):
+        """
+        Sets the speed, unless it is already set.
+
+        :param speed: The speed in [0, 100].
+        :type speed: int
+        """
+        if self._speed.should_write(speed):
+            self._wheels.speed = speed
+
+
+    def get_speed(self):
+        """
+        Gets the last speed written.
+
+        :return: The speed, or None if no speed was written.
+        :rtype: int
+        """
+        return self._speed.get()
+
+
+    def forward(self):
+        """Drives forward, unless already driving forward."""
+        if self._direction.should_write(self.FORWARD):
+            self._wheels.forward()
+
+
+    def backward(self):
+        """Drives backward, unless already driving backward."""
+        if self._direction.should_write(self.BACKWARD):
+            self._wheels.backward()
+
+
+    def stop(self):
+        """Stops the wheels. Always written."""
+        self._wheels.stop()
+        self._speed.invalidate()
+        self._speed.should_write(0)
+
+
+    def ready(self):
+        """Stops the wheels and resets the direction."""
+        self._wheels.ready()
+        self._speed.invalidate()
+        self._direction.invalidate()
+
+
+    def get_write_counts(self):
+        """
+        Gets the number of writes issued to the bus and suppressed.
+
+        :return: Dictionary containing the issued and suppressed counts.
+        :rtype: dict
+        """
+        return {'issued': self._speed.issued + self._direction.issued,
+                'suppressed': self._speed.suppressed
+                              + self._direction.suppressed}
+
+
+class ActuatorWorker:
+    """
+    Writes steering, throttle and direction commands to the wheels, on a
+    background thread once started.
+
+    Each kind of command has a single slot. Posting a command fills its slot
+    and returns without waiting for the bus; a command still in its slot when
+    a newer one of the same kind is posted is overwritten, so the worker only
+    ever writes the latest value. The worker empties the slots as fast as the
+    bus allows, writing the speed before the direction and the direction
+    before the steering angle.
+
+    Until start() is called, and after release(), commands are written by
+    the caller as they are posted.
+
+    stop() does not go through the slots: it empties them and stops the back
+    wheels from the caller, after at most the write already on the bus.
+
+    The time each command waited in its slot (wait), was written for (write)
+    and both together (total) are recorded in a stage timer.
+
+    :param front_wheels: The front wheels to turn.
+    :type front_wheels: actuators.CachedFrontWheels
+
+    :param back_wheels: The back wheels to drive.
+    :type back_wheels: actuators.CachedBackWheels
+    """
+
+    TIMED_STAGES = ('wait', 'write')
+    """The stages timed by the stage timer."""
+    SLOTS = ('speed', 'direction', 'steering')
+    """The command slots, in the order they are written."""
+    JOIN_TIMEOUT = 1.0
+    """Seconds to wait for the worker thread to exit when releasing."""
+
+    def __init__(self, front_wheels, back_wheels):
+        self._front_wheels = front_wheels
+        self._back_wheels = back_wheels
+
+        self._condition = threading.Condition(threading.Lock())
+        # Held while writing, so stop() waits for the write on the bus.
+        self._bus_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+        # Slot name to (value, post time), or None when empty.
+        self._slots = dict((slot, None) for slot in self.SLOTS)
+
+        self._timer = StageTimer(self.TIMED_STAGES, name='actuators',
+                                 enabled=True)
+        self._posted = 0
+        self._written = 0
+        self._dropped = 0
+        self._stops = 0
+
+
+    def start(self):
+        """
+        Starts the worker thread.
+
+        Calling start() on a running worker has no effect.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run,
+                                        name='ActuatorWorker')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def release(self):
+        """
+        Stops the worker thread. Commands still in their slots are dropped,
+        and later commands are written by the caller.
+        """
+        if not self._running:
+            return
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.JOIN_TIMEOUT)
+        self._thread = None
+
+
+    def is_running(self):
+        """
+        Checks if the worker thread is running.
+
+        :return: True if the worker thread is running, False otherwise.
+        :rtype: bool
+        """
+        return self._running
+
+
+    def turn(self, angle):
+        """
+        Posts a wheel angle.
+
+        :param angle: The angle (in degrees).
+        :type angle: float
+        """
+        self._post('steering', angle)
+
+
+    def set_speed(self, speed):
+        """
+        Posts a speed.
+
+        :param speed: The speed in [0, 100].
+        :type speed: int
+        """
+        self._post('speed', speed)
+
+
+    def forward(self):
+        """Posts driving forward."""
+        self._post('direction', CachedBackWheels.FORWARD)
+
+
+    def backward(self):
+        """Posts driving backward."""
+        self._post('direction', CachedBackWheels.BACKWARD)
+
+
+    def stop(self):
+        """
+        Stops the back wheels now, dropping the commands in the slots.
+        """
+        with self._condition:
+            for slot in self.SLOTS:
+                if self._slots[slot] is not None:
+                    self._slots[slot] = None
+                    self._dropped += 1
+            self._stops += 1
+
+        with self._bus_lock:
+            self._back_wheels.stop()
+
+
+    def _post(self, slot, value):
+        now = clock()
+        with self._condition:
+            self._posted += 1
+            if self._running:
+                if self._slots[slot] is not None:
+                    self._dropped += 1
+                self._slots[slot] = (value, now)
+                self._condition.notify_all()
+                return
+
+        self._write(slot, value, now)
+
+
+    def _run(self):
+        """Writes the commands in the slots until released."""
+        while True:
+            with self._condition:
+                while self._running and not any(self._slots.values()):
+                    self._condition.wait()
+                if not self._running:
+                    return
+
+                commands = [(slot, self._slots[slot]) for slot in self.SLOTS
+                            if self._slots[slot] is not None]
+                for slot, _ in commands:
+                    self._slots[slot] = None
+                stops = self._stops
+
+            for slot, (value, posted) in commands:
+                self._write(slot, value, posted, stops)
+
+
+    def _write(self, slot, value, posted, stops=None):
+        """
+        Writes a command to the wheels and records its times.
+
+        :param slot: The slot the command was posted to.
+        :type slot: str
+
+        :param value: The command.
+        :type value: float
+
+        :param posted: When the command was posted (in seconds).
+        :type posted: float
+
+        :param stops: The number of stops when the command was taken from its
+                      slot. The command is dropped if stop() was called since,
+                      so it cannot undo the stop. Always written if None.
+        :type stops: int
+        """
+        with self._bus_lock:
+            if stops is not None and stops != self._stops:
+                with self._condition:
+                    self._dropped += 1
+                return
+
+            started = clock()
+            if slot == 'steering':
+                self._front_wheels.turn(value)
+            elif slot == 'speed':
+                self._back_wheels.set_speed(value)
+            elif value == CachedBackWheels.FORWARD:
+                self._back_wheels.forward()
+            else:
+                self._back_wheels.backward()
+            finished = clock()
+
+            self._timer.record('wait', started - posted)
+            self._timer.record('write', finished - started)
+            self._timer.record(StageTimer.TOTAL, finished - posted)
+
+        with self._condition:
+            self._written += 1
+
+
+    def get_timer(self):
+        """
+        Gets the timer of the wait and write times of each command.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._timer
+
+
+    def get_stats(self):
+        """
+        Gets the command counters.
+
+        :return: Dictionary containing the number of commands posted, written
+                 and dropped, because a newer command or stop() replaced them
+                 before they were written, and the number of stops.
+        :rtype: dict
+        """
+        with self._condition:
+            return {
+                    'posted': self._posted,
+                    'written': self._written,
+                    'dropped': self._dropped,
+                    'stops': self._stops
+            }
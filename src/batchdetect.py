@@ -0,0 +1,170 @@
+"""
+batchdetect
+
+Author: Wisam Bunni
+"""
+from collections import namedtuple
+import argparse
+import multiprocessing
+import numpy as np
+import os
+
+from tagrec import TagRecognition
+
+DetectionRecord = namedtuple('DetectionRecord',
+        ['index', 'source', 'detected', 'x', 'z', 'direction', 'decision',
+         'yaw'])
+"""
+The result of detecting an ARTag in one image. source is the image path, or
+None if the image was passed in as an array. The tag fields are None if no ARTag
+was detected.
+"""
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png')
+"""File extensions recognized as images when expanding directories."""
+
+CHUNK_SIZE = 4
+"""The number of images sent to a worker process at a time."""
+
+_worker_tag = None
+"""The TagRecognition object of a worker process."""
+
+
+def _init_worker(tag_args):
+    """
+    Creates the TagRecognition object used by a worker process.
+
+    :param tag_args: Keyword arguments for TagRecognition.
+    :type tag_args: dict
+    """
+    global _worker_tag
+    _worker_tag = TagRecognition(**tag_args)
+
+
+def _detect_one(item):
+    """
+    Detects an ARTag in one image with the worker's TagRecognition object.
+
+    :param item: The input index and an image path or array.
+    :type item: int, str or numpy.ndarray
+
+    :return: The detection result.
+    :rtype: DetectionRecord
+    """
+    index, image = item
+    if isinstance(image, np.ndarray):
+        source = None
+        tag_data = _worker_tag.detect_frame(image)
+    else:
+        source = image
+        tag_data = _worker_tag.detect(img_src=image)
+
+    if not tag_data:
+        return DetectionRecord(index, source, False,
+                               None, None, None, None, None)
+
+    return DetectionRecord(index, source, True,
+                           float(tag_data.x), float(tag_data.z),
+                           float(tag_data.direction),
+                           int(tag_data.decision), float(tag_data.yaw))
+
+
+def detect_many(images, workers=None, **tag_args):
+    """
+    Detects ARTags in many images using a pool of worker processes.
+
+    Results are generated in the same order as the input so large image sets
+    can be processed without holding every result in memory.
+
+    :param images: Image paths and/or BGR or grayscale arrays.
+    :type images: iterable
+
+    :param workers: The number of worker processes. Defaults to the number of
+                    CPUs. 1 runs detection in the calling process.
+    :type workers: int
+
+    :param tag_args: Keyword arguments for each worker's TagRecognition.
+
+    :return: A generator of detection results in input order.
+    :rtype: generator of DetectionRecord
+
+    :raise IOError: Thrown if an image path is not a file.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    items = enumerate(images)
+
+    if workers <= 1:
+        _init_worker(tag_args)
+        for item in items:
+            yield _detect_one(item)
+        return
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(tag_args,))
+    try:
+        for record in pool.imap(_detect_one, items, CHUNK_SIZE):
+            yield record
+        pool.close()
+    finally:
+        # Stops the workers early if the caller stops iterating or a worker
+        # fails. Does nothing to a pool that already finished.
+        pool.terminate()
+        pool.join()
+
+
+def find_images(paths):
+    """
+    Expands directories into the images they contain.
+
+    :param paths: Image and directory paths.
+    :type paths: list
+
+    :return: The image paths. Images within a directory are sorted by name.
+    :rtype: list
+    """
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            images.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS))
+        else:
+            images.append(path)
+
+    return images
+
+
+def main():
+    """
+    Detects ARTags in images and directories of images.
+
+    Prints one comma-separated line per image in input order.
+    """
+    parser = argparse.ArgumentParser(
+            description='Detect ARTags in a set of images.')
+    parser.add_argument('paths', nargs='+',
+                        help='images or directories of images')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPUs)')
+    parser.add_argument('-r', '--resolution', type=int, default=90,
+                        choices=sorted(TagRecognition.RESOLUTIONS))
+    parser.add_argument('-m', '--marker-length', type=float, default=0.025,
+                        help='ARTag length in meters')
+    parser.add_argument('-c', '--contrast', type=float, default=1)
+    parser.add_argument('-b', '--brightness', type=int, default=0)
+    args = parser.parse_args()
+
+    print(','.join(DetectionRecord._fields))
+    for record in detect_many(find_images(args.paths), workers=args.workers,
+                              resolution=args.resolution,
+                              marker_length=args.marker_length,
+                              contrast=args.contrast,
+                              brightness=args.brightness):
+        print(','.join('' if value is None else str(value)
+                       for value in record))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+calibration
+
+Author: Wisam Bunni
+"""
+import cv2
+import logging
+import numpy as np
+import os
+import threading
+
+
+class Calibration:
+    """
+    Camera calibration parameters with intrinsics scaled to frame sizes of the
+    same aspect ratio.
+
+    :param camera_matrix: The calibrated 3x3 camera matrix, or None if the camera
+                          is not calibrated.
+    :type camera_matrix: numpy.ndarray
+
+    :param dist_coeffs: The distortion coefficients, or None.
+    :type dist_coeffs: numpy.ndarray
+
+    :param image_size: The (width, height) of the calibration images. Required
+                       with a camera matrix.
+    :type image_size: tuple
+
+    :param sizes: Frame sizes, as (width, height), to compute camera matrices
+                  for up front.
+    :type sizes: iterable
+
+    :raise ValueError: Thrown if a camera matrix is given without image_size.
+    """
+
+    MAX_ASPECT_ERROR = 0.01
+    """
+    The largest relative difference between the aspect ratios of a frame size
+    and the calibration images for the calibration to be scaled to it.
+    """
+
+    def __init__(self, camera_matrix=None, dist_coeffs=None, image_size=None,
+                 sizes=()):
+        if camera_matrix is not None and image_size is None:
+            raise ValueError('A camera matrix needs its calibration image '
+                             'size')
+
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.image_size = image_size
+
+        self._matrices = {}
+        for width, height in sizes:
+            self.get_camera_matrix(width, height)
+
+
+    def get_camera_matrix(self, width, height):
+        """
+        Gets the camera matrix for a frame size.
+
+        The calibrated focal lengths and principal point are scaled uniformly
+        from the calibration image size to the frame size. A frame size with a
+        different aspect ratio comes from a sensor mode that crops rather than
+        scales, which the calibration cannot be scaled to. Such sizes, and
+        every size without a calibrated camera matrix, get an approximation: the
+        focal length is the frame width and the principal point is the center
+        of the frame. A warning is logged for the cropped sizes.
+
+        :param width: The frame width in pixels.
+        :type width: int
+
+        :param height: The frame height in pixels.
+        :type height: int
+
+        :return: The 3x3 camera matrix. Shared between callers and must not be
+                 modified.
+        :rtype: numpy.ndarray
+        """
+        matrix = self._matrices.get((width, height))
+        if matrix is not None:
+            return matrix
+
+        calibrated = self.camera_matrix is not None
+        if calibrated:
+            image_width, image_height = self.image_size
+            aspect = (float(width) / height) / (float(image_width)
+                                                / image_height)
+            if abs(aspect - 1) > self.MAX_ASPECT_ERROR:
+                logging.getLogger('calibration').warning(
+                        'The calibration (%dx%d) does not match the aspect '
+                        'ratio of %dx%d frames, approximating their camera '
+                        'matrix', image_width, image_height, width, height)
+                calibrated = False
+
+        if calibrated:
+            matrix = np.array(self.camera_matrix, dtype='double')
+            matrix[:2] *= float(width) / image_width
+        else:
+            focal_length = width
+            center = (width/2, height/2)
+            matrix = np.array(
+                [[focal_length, 0, center[0]],
+                 [0, focal_length, center[1]],
+                 [0, 0, 1]], dtype='double'
+            )
+
+        self._matrices[(width, height)] = matrix
+        return matrix
+
+
+_calibrations = {}
+"""Loaded calibrations keyed by file path and modification time."""
+_lock = threading.Lock()
+
+
+def _optional(array):
+    """
+    Converts an empty array from a cache file back to None.
+
+    :param array: The array read from the cache file.
+    :type array: numpy.ndarray
+
+    :return: The array, or None if it is empty.
+    :rtype: numpy.ndarray
+    """
+    return array if array.size else None
+
+
+def _read_xml(path):
+    """
+    Reads calibration parameters written by OpenCV's calibration tools.
+
+    :param path: Path to the calibration XML file.
+    :type path: str
+
+    :return: The camera matrix, distortion coefficients and calibration image
+             size. Each is None if it is missing from the file.
+    :rtype: numpy.ndarray, numpy.ndarray, tuple
+    """
+    storage = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+    camera_matrix = storage.getNode('cameraMatrix').mat()
+    dist_coeffs = storage.getNode('distCoeffs').mat()
+
+    image_size = None
+    width = storage.getNode('image_width')
+    height = storage.getNode('image_height')
+    if not width.empty() and not height.empty():
+        image_size = (width.real(), height.real())
+
+    storage.release()
+    return camera_matrix, dist_coeffs, image_size
+
+
+def _cache_path(path):
+    """
+    Gets the path of the binary cache of a calibration file.
+
+    :param path: Path to the calibration XML file.
+    :type path: str
+
+    :return: Path to the cache file.
+    :rtype: str
+    """
+    return os.path.splitext(path)[0] + '.npz'
+
+
+def _read_cache(path, mtime):
+    """
+    Reads the binary cache of a calibration file if it is up to date.
+
+    :param path: Path to the calibration XML file.
+    :type path: str
+
+    :param mtime: The modification time of the calibration XML file.
+    :type mtime: float
+
+    :return: The camera matrix, distortion coefficients and calibration image
+             size, or None if there is no up to date cache.
+    :rtype: tuple
+    """
+    try:
+        cache = np.load(_cache_path(path))
+        try:
+            if float(cache['source_mtime']) != mtime:
+                return None
+            return (_optional(cache['camera_matrix']),
+                    _optional(cache['dist_coeffs']),
+                    _optional(cache['image_size']))
+        finally:
+            cache.close()
+    except (IOError, OSError, KeyError, ValueError):
+        return None
+
+
+def _write_cache(path, mtime, camera_matrix, dist_coeffs, image_size):
+    """
+    Writes the binary cache of a calibration file.
+
+    Failing to write the cache, for example in a read-only directory, is not an
+    error.
+    """
+    empty = np.empty(0)
+    cache_path = _cache_path(path)
+    logging.getLogger('calibration').info('Caching %s in %s', path,
+                                          cache_path)
+    try:
+        with open(cache_path, 'wb') as cache:
+            np.savez(cache, source_mtime=np.float64(mtime),
+                     camera_matrix=(camera_matrix if camera_matrix is not None
+                                    else empty),
+                     dist_coeffs=(dist_coeffs if dist_coeffs is not None
+                                  else empty),
+                     image_size=(np.array(image_size) if image_size is not None
+                                 else empty))
+    except (IOError, OSError):
+        pass
+
+
+def get_calibration(path, sizes=(), cache=False):
+    """
+    Gets the calibration stored in a file.
+
+    The file is parsed once per process and again only if it changes. A
+    missing file gives an uncalibrated camera. A camera matrix without the
+    image_width and image_height it was calibrated at cannot be scaled to
+    frame sizes, so it is ignored with a warning and the camera matrices are
+    approximated. The distortion coefficients are still used.
+
+    :param path: Path to the calibration XML file.
+    :type path: str
+
+    :param sizes: Frame sizes, as (width, height), to compute camera matrices
+                  for up front.
+    :type sizes: iterable
+
+    :param cache: Keep the parsed parameters in a binary .npz file next to the
+                  calibration file, which is much faster to load than the XML
+                  on later runs. Disabled by default.
+    :type cache: bool
+
+    :return: The calibration.
+    :rtype: Calibration
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    key = (os.path.abspath(path), mtime)
+    with _lock:
+        calibration = _calibrations.get(key)
+        if calibration is not None:
+            for width, height in sizes:
+                calibration.get_camera_matrix(width, height)
+            return calibration
+
+        if mtime is None:
+            calibration = Calibration(sizes=sizes)
+        else:
+            params = _read_cache(path, mtime) if cache else None
+            if params is None:
+                params = _read_xml(path)
+                if cache:
+                    _write_cache(path, mtime, *params)
+            camera_matrix, dist_coeffs, image_size = params
+            if image_size is not None:
+                image_size = tuple(float(value) for value in image_size)
+            elif camera_matrix is not None:
+                logging.getLogger('calibration').warning(
+                        '%s has a camera matrix but no image_width and '
+                        'image_height, approximating the camera matrix', path)
+                camera_matrix = None
+            calibration = Calibration(camera_matrix, dist_coeffs, image_size,
+                                      sizes)
+
+        _calibrations[key] = calibration
+        return calibration
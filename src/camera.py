@@ -6,6 +6,7 @@ Author: Steven Dropiewski
 from time import sleep
 import numpy as np
 
+from actuators import CachedServo
 from picar import filedb
 from picar.SunFounder_PCA9685 import Servo
 import picar
@@ -62,10 +63,12 @@ class Camera:
         self._pan_offset = int(self._db.get('pan_offset', default_value=0))
         self._tilt_offset = int(self._db.get('tilt_offset', default_value=0))
 
-        self._pan_servo = Servo.Servo(pan_channel, bus_number=bus_number,
-                                                   offset=offset)
-        self._tilt_servo = Servo.Servo(tilt_channel, bus_number=bus_number,
-                                                     offset=offset)
+        self._pan_servo = CachedServo(Servo.Servo(pan_channel,
+                                                  bus_number=bus_number,
+                                                  offset=offset))
+        self._tilt_servo = CachedServo(Servo.Servo(tilt_channel,
+                                                   bus_number=bus_number,
+                                                   offset=offset))
 
         self._camera_type = RELATIVE if camera_type is RELATIVE else ABSOLUTE
 
@@ -186,6 +189,21 @@ class Camera:
         return self._current_tilt_angle
 
 
+    def get_write_counts(self):
+        """
+        Gets the number of servo writes issued to the bus and suppressed
+        because the angle did not change.
+
+        :return: Dictionary containing the write counts of the pan servo and
+                 the tilt servo.
+        :rtype: dict
+        """
+        return {
+                'pan': self._pan_servo.get_write_counts(),
+                'tilt': self._tilt_servo.get_write_counts()
+        }
+
+
     def reset_camera(self):
         """
         Resets the camera to default position.
@@ -0,0 +1,69 @@
+"""
+detectorprofile
+
+Author: Wisam Bunni
+"""
+import cv2.aruco as ar
+import json
+
+
+def make_parameters(profile=None):
+    """
+    Creates ARTag detector parameters from a profile.
+
+    :param profile: Dictionary of DetectorParameters attribute names to values.
+                    Attributes that are not in the profile keep OpenCV's
+                    defaults.
+    :type profile: dict
+
+    :return: The detector parameters.
+    :rtype: cv2.aruco_DetectorParameters
+
+    :raise ValueError: Thrown if the profile names an unknown parameter.
+    """
+    parameters = ar.DetectorParameters_create()
+    for name, value in (profile or {}).items():
+        if not hasattr(parameters, name):
+            raise ValueError('Unknown detector parameter %s' % name)
+        # Keep the attribute's type, since OpenCV rejects a float for an int.
+        setattr(parameters, name, type(getattr(parameters, name))(value))
+
+    return parameters
+
+
+def load_profile(path):
+    """
+    Loads a profile written by save_profile().
+
+    :param path: Path to the profile.
+    :type path: str
+
+    :return: Dictionary of DetectorParameters attribute names to values.
+    :rtype: dict
+
+    :raise IOError: Thrown if the profile cannot be read.
+    """
+    with open(path) as profile_file:
+        profile = json.load(profile_file)
+
+    return profile.get('parameters', profile)
+
+
+def save_profile(path, parameters, metrics=None):
+    """
+    Saves a profile as JSON.
+
+    :param path: Path to the profile.
+    :type path: str
+
+    :param parameters: Dictionary of DetectorParameters attribute names to
+                       values.
+    :type parameters: dict
+
+    :param metrics: What the profile was measured to do, such as its recall and
+                    time per frame. Ignored by load_profile().
+    :type metrics: dict
+    """
+    with open(path, 'w') as profile_file:
+        json.dump({'parameters': parameters, 'metrics': metrics or {}},
+                  profile_file, indent=2, sort_keys=True)
@@ -0,0 +1,239 @@
+"""
+detectortuner
+
+Author: Wisam Bunni
+"""
+import argparse
+import cv2.aruco as ar
+import multiprocessing
+import numpy as np
+import sys
+from timeit import default_timer
+
+from detectorprofile import save_profile
+from tagdataset import load_dataset
+from tagrec import TagRecognition
+
+SEARCH_SPACE = {
+        'adaptiveThreshWinSizeMin': [3, 5, 7, 9],
+        'adaptiveThreshWinSizeMax': [7, 9, 11, 15, 19, 23],
+        'adaptiveThreshWinSizeStep': [2, 4, 6, 10, 20],
+        'adaptiveThreshConstant': [5, 7, 9, 11],
+        'minMarkerPerimeterRate': [0.01, 0.02, 0.03, 0.05, 0.08],
+        'polygonalApproxAccuracyRate': [0.02, 0.03, 0.05, 0.08],
+        'cornerRefinementMethod': [ar.CORNER_REFINE_NONE,
+                                   ar.CORNER_REFINE_SUBPIX,
+                                   ar.CORNER_REFINE_CONTOUR]
+}
+"""The values tried for each DetectorParameters attribute."""
+
+MAX_RECALL_LOSS = 0.01
+"""The largest recall a tuned profile may lose against OpenCV's defaults."""
+
+_worker_datasets = None
+"""The labeled frames of a worker process."""
+
+
+def _init_worker(paths):
+    """
+    Loads the datasets used by a worker process.
+
+    :param paths: Paths to datasets written by tagdataset.generate_dataset().
+    :type paths: list
+    """
+    global _worker_datasets
+    _worker_datasets = [load_dataset(path) for path in paths]
+
+
+def _evaluate(profile):
+    """
+    Measures a profile on the worker's datasets.
+
+    :param profile: Dictionary of DetectorParameters attribute names to values.
+    :type profile: dict
+
+    :return: The profile and its recall, mean absolute z error (in meters) and
+             mean detection time per frame (in seconds).
+    :rtype: dict, dict
+    """
+    frames = 0
+    detected = 0
+    z_error = 0.0
+    elapsed = 0.0
+
+    for dataset in _worker_datasets:
+        tag = TagRecognition(resolution=int(dataset['resolution']),
+                             marker_length=float(dataset['marker_length']),
+                             detector_profile=profile)
+        for index, frame in enumerate(dataset['frames']):
+            start = default_timer()
+            tag_data = tag.detect_frame(frame)
+            elapsed += default_timer() - start
+            frames += 1
+            if tag_data:
+                detected += 1
+                z_error += abs(tag_data.z - dataset['z'][index])
+
+    return profile, {
+            'recall': detected / float(frames) if frames else 0.0,
+            'z_error': z_error / detected if detected else None,
+            'time': elapsed / frames if frames else 0.0
+    }
+
+
+def _score(metrics):
+    """
+    Ranks a profile's metrics. Smaller is better.
+
+    :param metrics: The metrics returned by _evaluate().
+    :type metrics: dict
+
+    :return: The time per frame, then the z error. A profile that detected
+             nothing has no z error and ranks after every profile that did.
+    :rtype: tuple
+    """
+    z_error = metrics['z_error']
+    return (metrics['time'], z_error if z_error is not None else float('inf'))
+
+
+def random_profiles(count, seed=None):
+    """
+    Draws profiles from SEARCH_SPACE.
+
+    Window sizes are drawn so the smallest is never above the largest.
+
+    :param count: The number of profiles.
+    :type count: int
+
+    :param seed: The random seed.
+    :type seed: int
+
+    :return: A generator of profiles.
+    :rtype: generator of dict
+    """
+    random = np.random.RandomState(seed)
+    names = sorted(SEARCH_SPACE)
+    for _ in range(count):
+        profile = dict((name, SEARCH_SPACE[name][
+                        random.randint(len(SEARCH_SPACE[name]))])
+                       for name in names)
+        if (profile['adaptiveThreshWinSizeMin']
+                > profile['adaptiveThreshWinSizeMax']):
+            profile['adaptiveThreshWinSizeMin'], \
+                profile['adaptiveThreshWinSizeMax'] = (
+                    profile['adaptiveThreshWinSizeMax'],
+                    profile['adaptiveThreshWinSizeMin'])
+        # Plain Python values, so profiles can be saved as JSON.
+        yield dict((name, value.item() if hasattr(value, 'item') else value)
+                   for name, value in profile.items())
+
+
+def tune(paths, trials=100, workers=None, seed=None,
+         max_recall_loss=MAX_RECALL_LOSS):
+    """
+    Searches for the fastest detector profile that keeps the default recall.
+
+    Random profiles are measured in parallel against labeled datasets. A
+    profile qualifies if it loses at most max_recall_loss recall against
+    OpenCV's defaults. The fastest qualifying profile wins, and ties go to the
+    smaller z error. Since trials share the CPU, their times are only
+    comparable with each other.
+
+    :param paths: Paths to datasets written by tagdataset.generate_dataset().
+    :type paths: list
+
+    :param trials: The number of random profiles to try.
+    :type trials: int
+
+    :param workers: The number of worker processes. Defaults to the number of
+                    CPUs. 1 runs the trials in the calling process.
+    :type workers: int
+
+    :param seed: The random seed of the search.
+    :type seed: int
+
+    :param max_recall_loss: The largest recall loss against the defaults.
+    :type max_recall_loss: float
+
+    :return: The best profile and its metrics, and the defaults' metrics. The
+             best profile is empty if no trial beat the defaults.
+    :rtype: dict, dict, dict
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    profiles = [{}] + list(random_profiles(trials, seed))
+
+    if workers <= 1:
+        _init_worker(paths)
+        results = [_evaluate(profile) for profile in profiles]
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                    initargs=(paths,))
+        try:
+            results = list(pool.imap_unordered(_evaluate, profiles))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    default_metrics = [metrics for profile, metrics in results
+                       if not profile][0]
+    min_recall = default_metrics['recall'] - max_recall_loss
+
+    best_profile = {}
+    best_metrics = default_metrics
+    for profile, metrics in results:
+        if metrics['recall'] < min_recall:
+            continue
+        if _score(metrics) < _score(best_metrics):
+            best_profile, best_metrics = profile, metrics
+
+    return best_profile, best_metrics, default_metrics
+
+
+def main():
+    """
+    Tunes the detector parameters and saves the best profile.
+
+    Exits with an error and saves nothing if the best profile is not faster
+    than the defaults when timed on its own.
+    """
+    parser = argparse.ArgumentParser(
+            description='Tune ARTag detector parameters for speed and recall.')
+    parser.add_argument('datasets', nargs='+',
+                        help='datasets written by tagdataset.py')
+    parser.add_argument('-o', '--output', default='detector_profile.json',
+                        help='profile to write')
+    parser.add_argument('-t', '--trials', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPUs)')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--max-recall-loss', type=float,
+                        default=MAX_RECALL_LOSS)
+    args = parser.parse_args()
+
+    profile, metrics, default_metrics = tune(
+            args.datasets, args.trials, args.workers, args.seed,
+            args.max_recall_loss)
+
+    # Time the winner again on its own, since the trials shared the CPU.
+    _init_worker(args.datasets)
+    default_metrics = _evaluate({})[1]
+    metrics = _evaluate(profile)[1]
+
+    print('default: recall %.3f, %.2f ms per frame' % (
+            default_metrics['recall'], default_metrics['time'] * 1e3))
+    print('tuned:   recall %.3f, %.2f ms per frame' % (
+            metrics['recall'], metrics['time'] * 1e3))
+
+    if not profile or metrics['time'] >= default_metrics['time']:
+        sys.exit('No profile is faster than the defaults, not writing '
+                 + args.output)
+
+    save_profile(args.output, profile, metrics)
+    print('Wrote ' + args.output)
+
+
+if __name__ == '__main__':
+    main()
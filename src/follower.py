@@ -10,9 +10,19 @@ import os
 from picar import back_wheels, front_wheels
 import picar
 
+from actuators import ActuatorWorker, CachedBackWheels, CachedFrontWheels
 from leader import MAX_SPEED as LEADER_MAX_SPEED
+from loopscheduler import LoopScheduler
 from camera import Camera
+from gapcontroller import BandGapController
+from framesource import DeviceSource
+from pipeline import PerceptionPipeline
+from resolutionscheduler import ResolutionScheduler
+from smartcamera import SmartCamera
+from stagetimer import StageTimer
+from tagobservation import TagObservation
 from tagrec import TagRecognition
+from tagtracker import TagTracker
 
 
 class Follower:
@@ -27,6 +37,67 @@ class Follower:
                          testing. Disabled by default.
     :type test_img_src: str
 
+    :param source: The frame source to follow ARTags from. Defaults to camera
+                   0. Can be shared with another TagRecognition object.
+    :type source: framesource.FrameSource
+
+    :param predict_frames: The number of missed frames in a row to keep
+                           following the leader's predicted position through.
+                           0 disables tracking (default).
+    :type predict_frames: int
+
+    :param adaptive_resolution: Raise the camera resolution when the leader is
+                                far away and lower it when the leader is close,
+                                within the cycle time. Disabled by default.
+    :type adaptive_resolution: bool
+
+    :param timing: Time each stage of follow() and of the ARTag detection, and
+                   log a summary every LOG_INTERVAL seconds. Can also be
+                   switched with set_timing(). Disabled by default.
+    :type timing: bool
+
+    :param pipeline_workers: The number of processes to detect ARTags in. If
+                             above 0, frames are captured and detected in
+                             separate processes by a PerceptionPipeline, and
+                             follow() acts on the newest detection. The
+                             resolution is then fixed. 0 detects in the
+                             calling thread (default).
+    :type pipeline_workers: int
+
+    :param pixel_format: The format to read camera 0 in when no source is
+                         given. 'GREY' or 'YUYV' reads the camera's luma plane
+                         instead of converting frames to BGR and back, and
+                         falls back to BGR if the camera does not support it.
+                         Defaults to BGR.
+    :type pixel_format: str
+
+    :param smart_camera: The serial port of a smart camera that detects ARTags
+                         itself, such as /dev/ttyACM0. If given, follow() acts
+                         on the detections the camera sends instead of
+                         detecting ARTags on this computer. None by default.
+    :type smart_camera: str
+
+    :param gap_controller: Sets the speed from the distance to the leader,
+                           such as a gapcontroller.PIGapController. Defaults to
+                           a gapcontroller.BandGapController that stops within
+                           MIN_DISTANCE, matches the leader within twice
+                           MIN_DISTANCE and speeds up by one every CYCLE_TIME
+                           otherwise.
+    :type gap_controller: gapcontroller.BandGapController
+
+    :param steering: Computes a continuous wheel angle from the ARTag's
+                     position, such as a steering.PurePursuitSteering. The
+                     wheels are then turned every frame. By default, the wheels
+                     are turned every CYCLE_TIME from the ARTag's decision and
+                     yaw by opencv_to_wheels().
+    :type steering: steering.PurePursuitSteering
+
+    :param async_actuators: Write wheel commands on a background thread, so
+                            follow() never waits for the bus. Only the latest
+                            command of each kind is written. Disabled by
+                            default.
+    :type async_actuators: bool
+
     :raise IOError: Thrown if test_img_src is not a file.
     """
 
@@ -41,8 +112,15 @@ class Follower:
     """
     CYCLE_TIME = 0.1
     """The cycle time of the system."""
-
-    def __init__(self, test_img_src=None):
+    LOG_INTERVAL = 10
+    """The time between stage timing summaries (in seconds)."""
+    LOOP_FREQUENCY = 30
+    """The rate main() calls follow() at (in Hz), about the camera frame rate."""
+
+    def __init__(self, test_img_src=None, source=None, predict_frames=0,
+                 adaptive_resolution=False, timing=False, pipeline_workers=0,
+                 pixel_format=None, smart_camera=None, gap_controller=None,
+                 steering=None, async_actuators=False):
         self._test_mode = False
         self._test_img_src = None
         if test_img_src:
@@ -55,76 +133,170 @@ class Follower:
         picar.setup()
 
         db_file = "config"
-        self._fw = front_wheels.Front_Wheels(debug=False, db=db_file)
-        self._bw = back_wheels.Back_Wheels(debug=False, db=db_file)
+        self._fw = CachedFrontWheels(
+                front_wheels.Front_Wheels(debug=False, db=db_file))
+        self._bw = CachedBackWheels(
+                back_wheels.Back_Wheels(debug=False, db=db_file))
 
         self._fw.ready()
         self._bw.ready()
 
         self._fw.calibration()
 
+        self._actuators = ActuatorWorker(self._fw, self._bw)
+        if async_actuators:
+            self._actuators.start()
+
         self._camera = Camera()
 
-        self._tag = TagRecognition(resolution=144, marker_length=0.025)
+        if source is None and pixel_format and not self._test_mode:
+            source = DeviceSource(0, pixel_format=pixel_format)
+        if smart_camera and not self._test_mode:
+            self._tag = SmartCamera(smart_camera)
+        elif pipeline_workers > 0 and not self._test_mode:
+            self._tag = PerceptionPipeline(source, workers=pipeline_workers,
+                                           resolution=144, marker_length=0.025)
+        else:
+            scheduler = None
+            if adaptive_resolution:
+                scheduler = ResolutionScheduler(
+                        TagRecognition.RESOLUTIONS,
+                        latency_budget=self.CYCLE_TIME / 2)
+            self._tag = TagRecognition(resolution=144, marker_length=0.025,
+                                       threaded=not self._test_mode,
+                                       source=source,
+                                       resolution_scheduler=scheduler)
+        self._tag_timer = self._tag.get_timer()
+        self._timer = StageTimer(('detect', 'drive', 'turn', 'stop'),
+                                 name='follower')
+        self._stage_timers = [self._timer]
+        if not isinstance(self._tag, PerceptionPipeline):
+            # The pipeline's frame age timer stays on whatever the timing.
+            self._stage_timers.append(self._tag_timer)
+        self.set_timing(timing)
+        if predict_frames > 0:
+            self._tag = TagTracker(self._tag, max_missed_frames=predict_frames)
         self._speed = 0
+        if gap_controller is None:
+            gap_controller = BandGapController(self.MIN_DISTANCE,
+                                               LEADER_MAX_SPEED,
+                                               self.FOLLOWER_MAX_SPEED,
+                                               self.CYCLE_TIME)
+        self._gap_controller = gap_controller
+        self._steering = steering
 
-        self._tag_data = {
-                'x': 0,
-                'z': 0,
-                'direction': 0,
-                'decision': 0,
-                'yaw': 0
-        }
+        self._tag_data = TagObservation()
 
         self._tag_lost_time = 0
-        self._speed_cycle_time = time()
         self._turn_time = time()
 
 
+    def set_timing(self, enabled):
+        """
+        Switches timing of the follow() and ARTag detection stages on or off.
+        The frame age timer of the pipeline is always on.
+
+        :param enabled: Whether to time the stages.
+        :type enabled: bool
+        """
+        for timer in self._stage_timers:
+            if enabled:
+                timer.enable()
+                timer.set_log_interval(self.LOG_INTERVAL)
+            else:
+                timer.disable()
+
+
+    def get_timers(self):
+        """
+        Gets the stage timers.
+
+        :return: The timer of the follow() stages and the timer of the ARTag
+                 detection stages, or the frame age timer of the pipeline if
+                 pipeline_workers is above 0.
+        :rtype: stagetimer.StageTimer, stagetimer.StageTimer
+        """
+        return self._timer, self._tag_timer
+
+
+    def get_actuator_timer(self):
+        """
+        Gets the timer of the time wheel commands wait to be written and take
+        to write.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._actuators.get_timer()
+
+
+    def get_write_counts(self):
+        """
+        Gets the number of actuator writes issued to the bus and suppressed
+        because nothing changed.
+
+        :return: Dictionary containing the write counts of the front wheels,
+                 the back wheels and the camera.
+        :rtype: dict
+        """
+        return {
+                'front_wheels': self._fw.get_write_counts(),
+                'back_wheels': self._bw.get_write_counts(),
+                'camera': self._camera.get_write_counts()
+        }
+
+
     def drive(self):
         """
         Drives forward and avoids forward collisions with recognized objects.
 
         Manages the speed to avoid collisions depending on the distance to the
-        recognized object. If the recognized object is within MIN_DISTANCE, the
-        speed will be set to 0. If the recognized object is outside of the
-        MAX_DISTANCE, the speed will be set to FOLLOWER_MAX_SPEED. If the
-        vehicle is within [MIN_DISTANCE, MAX_DISTANCE), the vehicle will match
-        the leader vehicle's speed.
-        """
-
-        # If the vehicle is too close to the object, stop the vehicle.
-        if self._tag_data['z'] <= self.MIN_DISTANCE:
-            self._speed = 0
-        elif self.MIN_DISTANCE < self._tag_data['z'] <= (self.MIN_DISTANCE * 2):
-            # If we are in range of the leader vehicle, match the leader
-            # vehicle's speed.This will keep the distance between the ego
-            # vehicle and the leader vehicle.
-            self._speed = LEADER_MAX_SPEED
-        elif (((time() - self._speed_cycle_time) > self.CYCLE_TIME)
-              and (self._speed + 1 <= self.FOLLOWER_MAX_SPEED)):
-                # If the ego vehicle is not in the minimum distance for
-                # CYCLE_TIME, increase the speed and reset the timer.
-                self._speed += 1
-                self._speed_cycle_time = time()
+        recognized object, as set by the gap controller. By default, if the
+        recognized object is within MIN_DISTANCE, the speed will be set to 0.
+        If the vehicle is within (MIN_DISTANCE, 2 * MIN_DISTANCE], the vehicle
+        will match the leader vehicle's speed. Otherwise, the speed increases
+        by 1 every CYCLE_TIME, up to FOLLOWER_MAX_SPEED.
+        """
+        # The capture time of the frame, so the controller sees the real time
+        # between measurements.
+        self._speed = self._gap_controller.update(
+                self._tag_data.z, self._tag_data.timestamp or time())
 
         if not self._test_mode:
-            self._bw.speed = self._speed
-            self._bw.forward()
+            self._actuators.set_speed(self._speed)
+            self._actuators.forward()
 
 
     def stop(self):
-        """Stops the vehicle."""
-        self._bw.speed = 0
-        self._bw.forward()
+        """
+        Stops the vehicle right away, dropping pending wheel commands.
+
+        The gap controller starts over, so the vehicle speeds up from
+        standstill when the leader is seen again.
+        """
+        self._actuators.stop()
+        self._speed = 0
+        self._gap_controller.reset()
 
 
     def turn(self):
-        """Turn the wheels towards the last recognized object."""
-        turn_angle = self.opencv_to_wheels(self._tag_data['decision'],
-                                           self._tag_data['yaw'])
+        """
+        Turn the wheels towards the last recognized object.
+
+        :return: The wheel angle in [45, 135]. Smaller angles turn left.
+        :rtype: float
+        """
+        if self._steering:
+            turn_angle = self._steering.update(
+                    self._tag_data.x, self._tag_data.z,
+                    self._tag_data.timestamp or time())
+        else:
+            turn_angle = self.opencv_to_wheels(self._tag_data.decision,
+                                               self._tag_data.yaw)
         if not self._test_mode:
-            self._fw.turn(turn_angle)
+            self._actuators.turn(turn_angle)
+
+        return turn_angle
 
 
     def opencv_to_wheels(self, turn_decision, yaw):
@@ -136,8 +308,8 @@ class Follower:
         with -45 being the leftmost angle. Everything to the right of center is
         positive ranging from (90, 135] with 135 being the rightmost angle.
 
-        The wheels turn on a range of [45, 135] with 45 being the rightmost, 135
-        being the leftmost, and 90 being center.
+        The wheels turn on a range of [45, 135] with 45 being the leftmost, 135
+        being the rightmost, and 90 being center.
 
         :param turn_decision: Where the leader vehicle is turning. -1 means the
                               leader is turning left, 1 means the leader is
@@ -184,8 +356,10 @@ class Follower:
 
         if tag_data:
             detected = True
-            self._tag_data = tag_data
-            self._tag_data['direction'] = np.degrees(self._tag_data['direction'])
+            # Observations are immutable, so converting the direction makes a
+            # copy and never changes the detector's record.
+            self._tag_data = tag_data._replace(
+                    direction=np.degrees(tag_data.direction))
 
         return detected
 
@@ -196,28 +370,64 @@ class Follower:
 
         If an ARTag is detected, the follower vehicle will turn towards it and
         manage speed to avoid collisions. If an ARTag is not detected, the vehicle
-        will stop.
+        will stop. The wheels are turned every CYCLE_TIME, or every frame with
+        continuous steering.
+
+        :return: True if an ARTag is detected, False otherwise.
+        :rtype: Boolean
         """
-        if self.detect():
+        self._timer.start()
+        detected = self.detect()
+        self._timer.mark('detect')
+
+        if detected:
             self.drive()
-            if not self._turn_time:
+            self._timer.mark('drive')
+            if self._steering:
+                # Continuous steering is rate limited by itself, so it reacts
+                # to every frame.
+                self.turn()
+                self._timer.mark('turn')
+            elif not self._turn_time:
                 self._turn_time = time()
             elif (time() - self._turn_time) >= self.CYCLE_TIME:
                 self.turn()
                 self._turn_time = time()
+                self._timer.mark('turn')
             self._tag_lost_time = 0
         else:
             if not self._tag_lost_time:
                 self._tag_lost_time = time()
             elif (time() - self._tag_lost_time) >= self.CYCLE_TIME:
                 self.stop()
+                self._timer.mark('stop')
+
+        self._timer.finish()
+
+        return detected
+
+
+    def release(self):
+        """
+        Stops the vehicle and detecting ARTags, frees the camera for other
+        readers and stops the actuator thread.
+
+        The camera is opened again by the next detection, and later wheel
+        commands are written by the caller.
+        """
+        self.stop()
+        self._actuators.release()
+        self._tag.release()
 
 
 def main():
-    """Instantiates a Follower object and continously calls Follower.follow()."""
+    """
+    Instantiates a Follower object and calls Follower.follow() LOOP_FREQUENCY
+    times a second.
+    """
     follower = Follower()
-    while True:
-        follower.follow()
+    LoopScheduler(Follower.LOOP_FREQUENCY, name='follower loop').run(
+            follower.follow)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,175 @@
+"""
+framegrabber
+
+Author: Wisam Bunni
+"""
+from time import time
+import threading
+
+
+class FrameGrabber:
+    """
+    Continuously reads frames from a capture device on a background thread.
+
+    The grabber drains the capture as fast as the device delivers frames and
+    only keeps the most recent one, so a consumer never waits for the sensor's
+    frame interval and never processes a stale, buffered frame.
+
+    Frames are read into a small ring of reused buffers. A frame returned by
+    read() stays valid until the next call to read(), so the grabber supports a
+    single consumer.
+
+    :param capture: An opened capture device. Must provide read() returning a
+                    (ret, frame) pair, like cv2.VideoCapture. The thread stops
+                    when a read fails. If it also provides get_frame_info(),
+                    like framesource.FrameSource, the sequence number and
+                    capture time it records for each frame are kept with the
+                    frame.
+    :type capture: framesource.FrameSource
+    """
+
+    JOIN_TIMEOUT = 1.0
+    """Seconds to wait for the capture thread to exit when stopping."""
+    BUFFERS = 3
+    """
+    The number of frame buffers: one being captured into, the latest frame and
+    the frame held by the consumer.
+    """
+
+    def __init__(self, capture):
+        self._capture = capture
+        # cv2.VideoCapture does not record frame info.
+        self._get_capture_info = getattr(capture, 'get_frame_info', None)
+
+        self._condition = threading.Condition(threading.Lock())
+        self._running = False
+        self._thread = None
+
+        self._buffers = [None] * self.BUFFERS
+        self._held = -1
+
+        # Latest-frame slot.
+        self._latest = -1
+        self._ret = False
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0
+        self._info = None
+        self._held_info = None
+
+
+    def start(self):
+        """
+        Starts the capture thread.
+
+        Calling start() on a running grabber has no effect.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run,
+                                        name='FrameGrabber')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self):
+        """Stops the capture thread and wakes up any waiting readers."""
+        if not self._running:
+            return
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.JOIN_TIMEOUT)
+        self._thread = None
+
+
+    def is_running(self):
+        """
+        Checks if the capture thread is running.
+
+        :return: True if the capture thread is running, False otherwise.
+        :rtype: bool
+        """
+        return self._running
+
+
+    def _run(self):
+        """Reads frames until stopped, replacing the latest-frame slot."""
+        while self._running:
+            with self._condition:
+                index = [i for i in range(self.BUFFERS)
+                         if i != self._latest and i != self._held][0]
+
+            ret, frame = self._capture.read(self._buffers[index])
+            timestamp = time()
+            info = self._get_capture_info() if self._get_capture_info else None
+
+            with self._condition:
+                if frame is not None:
+                    self._buffers[index] = frame
+                self._latest = index
+                self._ret = ret
+                self._frame = frame
+                self._seq += 1
+                self._timestamp = timestamp
+                self._info = info
+                if not ret:
+                    # The source is out of frames or has failed.
+                    self._running = False
+                self._condition.notify_all()
+
+
+    def read(self, last_seq=None, timeout=None):
+        """
+        Gets the most recent frame.
+
+        Returns immediately with the freshest frame unless no frame has been
+        captured yet, or last_seq is given and no newer frame exists, in which
+        case it waits until one arrives or the timeout expires.
+
+        :param last_seq: The sequence number of the last frame the caller
+                         processed. Waits for a newer frame if given.
+        :type last_seq: int
+
+        :param timeout: Seconds to wait for a frame. Waits indefinitely if
+                        None.
+        :type timeout: float
+
+        :return: Whether the read succeeded, the frame, its sequence number and
+                 its capture timestamp.
+        :rtype: bool, numpy.ndarray, int, float
+        """
+        newest_seen = last_seq if last_seq is not None else 0
+        deadline = None if timeout is None else time() + timeout
+
+        with self._condition:
+            while self._seq <= newest_seen and self._running:
+                remaining = None if deadline is None else deadline - time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            # Keep the capture thread from reusing the frame's buffer until the
+            # next read.
+            self._held = self._latest
+            self._held_info = self._info
+            return self._ret, self._frame, self._seq, self._timestamp
+
+
+    def get_frame_info(self):
+        """
+        Gets the sequence number and capture time the capture device recorded
+        for the frame returned by the last read().
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+
+        :return: None if the capture device does not record them.
+        :rtype: None
+        """
+        return self._held_info
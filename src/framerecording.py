@@ -0,0 +1,352 @@
+"""
+framerecording
+
+Author: Wisam Bunni
+"""
+import argparse
+import numpy as np
+import os
+import struct
+from time import sleep
+
+from framesource import DeviceSource, FrameSource
+from stagetimer import clock
+from tagrec import TagRecognition
+
+EXTENSION = '.frames'
+"""The file extension of frame recordings."""
+MAGIC = b'TAGFRAME'
+"""The first bytes of a frame recording."""
+VERSION = 1
+"""The version of the recording format."""
+HEADER = struct.Struct('<8sIIII')
+"""The magic, version, frame height, frame width and channel count."""
+HEADER_SIZE = 64
+"""The size of the header (in bytes). Frames start after the header."""
+RECORD_HEADER = struct.Struct('<dq')
+"""The capture timestamp and sequence number stored before each frame."""
+
+
+def _record_dtype(shape):
+    """
+    Gets the layout of one record of a recording.
+
+    :param shape: The shape of a frame.
+    :type shape: tuple
+
+    :return: The record layout.
+    :rtype: numpy.dtype
+    """
+    return np.dtype([('timestamp', '<f8'), ('seq', '<i8'),
+                     ('frame', np.uint8, tuple(shape))])
+
+
+def _read_header(recording_file):
+    """
+    Reads the frame shape from the header of a recording.
+
+    :param recording_file: The recording, opened for binary reading.
+    :type recording_file: file
+
+    :return: The shape of a frame.
+    :rtype: tuple
+
+    :raise IOError: Thrown if the file is not a frame recording.
+    """
+    header = recording_file.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise IOError('Not a frame recording')
+
+    magic, version, height, width, channels = HEADER.unpack_from(header)
+    if magic != MAGIC or version != VERSION:
+        raise IOError('Not a frame recording')
+
+    if channels == 1:
+        return (height, width)
+    return (height, width, channels)
+
+
+def load_recording(path):
+    """
+    Maps a recording into memory without reading it.
+
+    A record that was cut short, such as by a crash while recording, is left
+    out.
+
+    :param path: Path to the recording.
+    :type path: str
+
+    :return: The records, with timestamp, seq and frame fields. Empty if the
+             recording has no frames.
+    :rtype: numpy.memmap or numpy.ndarray
+
+    :raise IOError: Thrown if the file does not exist or is not a frame
+                    recording.
+    """
+    if not os.path.isfile(path):
+        raise IOError('File does not exist')
+
+    with open(path, 'rb') as recording_file:
+        shape = _read_header(recording_file)
+
+    dtype = _record_dtype(shape)
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count <= 0:
+        # An empty memory map cannot be created.
+        return np.zeros(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE,
+                     shape=(count,))
+
+
+class FrameRecorder:
+    """
+    Appends frames and their capture times to a recording.
+
+    A recording is a fixed size header followed by fixed size records, each a
+    timestamp, a sequence number and the raw frame pixels. Records are only
+    ever appended, so a recording cut short by a crash loses at most its last
+    frame, and the file can be mapped into memory as an array of records.
+
+    Every frame of a recording has the shape of the first one. An existing
+    recording is appended to.
+
+    :param path: Path to the recording.
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._file = None
+        self._shape = None
+        self._count = 0
+
+
+    def _open(self, frame):
+        """
+        Opens the recording for the first frame, writing its header if the
+        recording is new.
+
+        :param frame: The first frame to write.
+        :type frame: numpy.ndarray
+
+        :raise ValueError: Thrown if an existing recording has another frame
+                           shape.
+        """
+        if os.path.isfile(self._path) and os.path.getsize(self._path):
+            with open(self._path, 'rb') as recording_file:
+                self._shape = _read_header(recording_file)
+            if self._shape != frame.shape:
+                raise ValueError('Frame shape does not match the recording')
+
+            # Drop a record that was cut short, so records stay aligned.
+            record_size = _record_dtype(self._shape).itemsize
+            self._count = ((os.path.getsize(self._path) - HEADER_SIZE)
+                           // record_size)
+            self._file = open(self._path, 'r+b')
+            self._file.truncate(HEADER_SIZE + self._count * record_size)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._shape = frame.shape
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            self._file = open(self._path, 'wb')
+            header = HEADER.pack(MAGIC, VERSION, frame.shape[0],
+                                 frame.shape[1], channels)
+            self._file.write(header + b'\0' * (HEADER_SIZE - len(header)))
+            self._count = 0
+
+
+    def write(self, frame, timestamp, seq):
+        """
+        Appends a frame.
+
+        :param frame: A BGR or grayscale frame.
+        :type frame: numpy.ndarray
+
+        :param timestamp: The frame's capture time.
+        :type timestamp: float
+
+        :param seq: The frame's sequence number.
+        :type seq: int
+
+        :raise ValueError: Thrown if the frame's shape or type does not match
+                           the recording.
+        """
+        if frame.dtype != np.uint8:
+            raise ValueError('Only 8-bit frames can be recorded')
+        if self._file is None:
+            self._open(frame)
+        elif frame.shape != self._shape:
+            raise ValueError('Frame shape does not match the recording')
+
+        self._file.write(RECORD_HEADER.pack(timestamp, seq))
+        np.ascontiguousarray(frame).tofile(self._file)
+        self._count += 1
+
+
+    def get_count(self):
+        """
+        Gets the number of frames in the recording.
+
+        :return: The number of frames.
+        :rtype: int
+        """
+        return self._count
+
+
+    def flush(self):
+        """Writes buffered frames to the file."""
+        if self._file is not None:
+            self._file.flush()
+
+
+    def close(self):
+        """Closes the recording. The next frame is appended to it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordingSource(FrameSource):
+    """
+    Frames replayed from a recording written by FrameRecorder.
+
+    Frames are read straight from the memory mapped recording without being
+    decoded or copied. They are read-only.
+
+    :param path: Path to the recording.
+    :type path: str
+
+    :param realtime: Return each frame no sooner than it was captured relative
+                     to the first frame. Frames are returned as fast as they
+                     are read by default.
+    :type realtime: bool
+
+    :param loop: Restart from the first frame after the last one.
+    :type loop: bool
+    """
+
+    def __init__(self, path, realtime=False, loop=False):
+        FrameSource.__init__(self)
+        self._path = path
+        self._realtime = realtime
+        self._loop = loop
+        self._records = None
+        self._next = 0
+        self._start = None
+        self._seq = 0
+        self._timestamp = 0
+
+
+    def get_frame_info(self):
+        """
+        Gets the recorded sequence number and capture time of the last frame
+        read.
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+        """
+        return self._seq, self._timestamp
+
+
+    def __len__(self):
+        """Gets the number of frames, opening the source if needed."""
+        if not self._opened:
+            self.open()
+
+        return len(self._records)
+
+
+    def _open(self):
+        self._records = load_recording(self._path)
+        self._next = 0
+        self._start = None
+
+
+    def _read(self, image):
+        if self._next >= len(self._records):
+            if not self._loop or not len(self._records):
+                return False, None
+            self._next = 0
+            self._start = None
+
+        index = self._next
+        self._next += 1
+        self._seq = int(self._records['seq'][index])
+        self._timestamp = float(self._records['timestamp'][index])
+
+        if self._realtime:
+            offset = self._timestamp - float(self._records['timestamp'][0])
+            if self._start is None:
+                self._start = clock() - offset
+            delay = self._start + offset - clock()
+            if delay > 0:
+                sleep(delay)
+
+        return True, self._resize(self._records['frame'][index])
+
+
+    def _release(self):
+        # Drop the memory map so the file is unmapped.
+        self._records = None
+
+
+def main():
+    """
+    Records frames from a camera, or replays a recording through detect().
+
+    Replaying prints one line per detection and a summary of the detection rate
+    and time per frame.
+    """
+    parser = argparse.ArgumentParser(
+            description='Record camera frames or replay them through the '
+                        'ARTag detector.')
+    parser.add_argument('command', choices=('record', 'replay'))
+    parser.add_argument('path', help='recording to write or read')
+    parser.add_argument('-r', '--resolution', type=int, default=144,
+                        choices=sorted(TagRecognition.RESOLUTIONS))
+    parser.add_argument('-m', '--marker-length', type=float, default=0.025,
+                        help='ARTag length in meters')
+    parser.add_argument('-n', '--frames', type=int, default=300,
+                        help='number of frames to record')
+    parser.add_argument('-d', '--device', type=int, default=0,
+                        help='camera to record from')
+    parser.add_argument('--realtime', action='store_true',
+                        help='replay at the recorded frame rate')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        recorder = FrameRecorder(args.path)
+        tag = TagRecognition(resolution=args.resolution,
+                             marker_length=args.marker_length,
+                             source=DeviceSource(args.device),
+                             recorder=recorder)
+        try:
+            for _ in range(args.frames):
+                tag.detect()
+        finally:
+            tag.release()
+            recorder.close()
+        print('Recorded %d frames to %s' % (recorder.get_count(), args.path))
+        return
+
+    source = RecordingSource(args.path, realtime=args.realtime)
+    tag = TagRecognition(resolution=args.resolution,
+                         marker_length=args.marker_length, source=source,
+                         timing=True)
+    frames = len(source)
+    detected = 0
+    for _ in range(frames):
+        tag_data = tag.detect()
+        seq, timestamp = source.get_frame_info()
+        if tag_data:
+            detected += 1
+            print('%d %.3f x %.3f z %.3f yaw %.1f' % (
+                    seq, timestamp, tag_data.x, tag_data.z, tag_data.yaw))
+
+    print(tag.get_timer().summary())
+    print('%d of %d frames detected' % (detected, frames))
+
+
+if __name__ == '__main__':
+    main()
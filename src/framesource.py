@@ -0,0 +1,441 @@
+"""
+framesource
+
+Author: Wisam Bunni
+"""
+import cv2
+import itertools
+import logging
+import numpy as np
+import os
+
+
+class FrameSource:
+    """
+    Base class for the sources of frames fed to TagRecognition.
+
+    A source is opened lazily by the first call to read(), so creating one never
+    touches a device or file. Subclasses implement _open(), _read() and
+    _release().
+    """
+
+    def __init__(self):
+        self._opened = False
+        self._size = None
+
+
+    def set_size(self, width, height):
+        """
+        Sets the size of the frames returned by read().
+
+        :param width: The frame width in pixels.
+        :type width: int
+
+        :param height: The frame height in pixels.
+        :type height: int
+        """
+        self._size = (int(width), int(height))
+        if self._opened:
+            self._apply_size()
+
+
+    def get_frame_info(self):
+        """
+        Gets the sequence number and capture time the source recorded for the
+        last frame read.
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+
+        :return: None if the source does not record them, in which case the
+                 reader numbers and stamps frames itself.
+        :rtype: None
+        """
+        return None
+
+
+    def is_opened(self):
+        """
+        Checks if the source has been opened.
+
+        :return: True if the source is open, False otherwise.
+        :rtype: bool
+        """
+        return self._opened
+
+
+    def open(self):
+        """
+        Opens the source.
+
+        Calling open() on an open source has no effect.
+
+        :raise IOError: Thrown if the source cannot be opened.
+        """
+        if not self._opened:
+            self._open()
+            self._opened = True
+            self._apply_size()
+
+
+    def read(self, image=None):
+        """
+        Reads the next frame, opening the source first if needed.
+
+        :param image: A preallocated frame to read into. Sources that can decode
+                      in place reuse it when its size and type match. The
+                      returned frame should always be used instead of image.
+        :type image: numpy.ndarray
+
+        :return: Whether a frame was read and the frame.
+        :rtype: bool, numpy.ndarray
+
+        :return: False and None when the source has no more frames.
+        :rtype: bool, None
+        """
+        if not self._opened:
+            self.open()
+
+        return self._read(image)
+
+
+    def release(self):
+        """Closes the source. It is opened again by the next read()."""
+        if self._opened:
+            self._release()
+            self._opened = False
+
+
+    def _resize(self, frame):
+        """
+        Resizes a frame to the set size.
+
+        :param frame: The frame to resize.
+        :type frame: numpy.ndarray
+
+        :return: The resized frame.
+        :rtype: numpy.ndarray
+        """
+        if self._size and (frame.shape[1], frame.shape[0]) != self._size:
+            frame = cv2.resize(frame, self._size)
+
+        return frame
+
+
+    def _apply_size(self):
+        """Applies the set size to an open source."""
+        pass
+
+
+    def _open(self):
+        """
+        Opens the underlying device or file. Subclasses must override it.
+
+        :raise IOError: Thrown if the source cannot be opened.
+        :raise NotImplementedError: Thrown if a subclass does not override it.
+        """
+        raise NotImplementedError
+
+
+    def _read(self, image):
+        """
+        Reads the next frame from the open source, resized to the set size.
+        Subclasses must override it.
+
+        :param image: A preallocated frame to read into, or None. Subclasses
+                      may ignore it.
+        :type image: numpy.ndarray
+
+        :return: True and the frame.
+        :rtype: bool, numpy.ndarray
+
+        :return: False and None when the source has no more frames.
+        :rtype: bool, None
+
+        :raise NotImplementedError: Thrown if a subclass does not override it.
+        """
+        raise NotImplementedError
+
+
+    def _release(self):
+        """Closes the underlying device or file. Does nothing by default."""
+        pass
+
+
+class DeviceSource(FrameSource):
+    """
+    A live camera, such as a V4L2 device.
+
+    Frames are BGR by default. A camera that delivers GREY or YUYV frames can be
+    read in that format instead, in which case read() returns the camera's luma
+    plane as a grayscale frame. This skips the camera backend's conversion to
+    BGR and the detector's conversion back to grayscale. If the camera does not
+    deliver the requested format, frames are read as BGR, and
+    get_pixel_format() reports which format is used.
+
+    :param index: The index of the camera device (/dev/video<index>).
+    :type index: int
+
+    :param pixel_format: One of PIXEL_FORMATS. Defaults to BGR.
+    :type pixel_format: str
+
+    :raise ValueError: Thrown if pixel_format is unknown.
+    """
+
+    PIXEL_FORMATS = ('BGR', 'GREY', 'YUYV')
+    """The formats frames can be read in."""
+
+    def __init__(self, index=0, pixel_format=None):
+        FrameSource.__init__(self)
+        pixel_format = (pixel_format or 'BGR').upper()
+        if pixel_format not in self.PIXEL_FORMATS:
+            raise ValueError('Unknown pixel format %s' % pixel_format)
+
+        self._index = index
+        self._cap = None
+        self._requested_format = pixel_format
+        self._pixel_format = pixel_format
+        self._raw = None
+
+
+    def get_pixel_format(self):
+        """
+        Gets the format frames are read in.
+
+        :return: The requested format until the camera is opened, then the
+                 format the camera delivers: 'GREY' or 'YUYV' if grayscale
+                 frames are read from the luma plane, 'BGR' otherwise.
+        :rtype: str
+        """
+        return self._pixel_format
+
+
+    def _open(self):
+        self._cap = cv2.VideoCapture(self._index)
+        if not self._cap.isOpened():
+            self._cap = None
+            raise IOError('Camera %d could not be opened' % self._index)
+
+        self._pixel_format = self._requested_format
+        if self._pixel_format != 'BGR':
+            fourcc = cv2.VideoWriter_fourcc(*self._pixel_format)
+            self._cap.set(cv2.CAP_PROP_FOURCC, fourcc)
+            # Frames are handed over as the camera delivers them.
+            self._cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+            if int(self._cap.get(cv2.CAP_PROP_FOURCC)) != fourcc:
+                self._use_bgr()
+
+        logging.getLogger('framesource').info(
+                'Camera %d frames are read as %s', self._index,
+                self._pixel_format)
+
+
+    def _use_bgr(self):
+        """Falls back to reading BGR frames."""
+        logging.getLogger('framesource').warning(
+                'Camera %d does not deliver %s frames. Reading BGR frames.',
+                self._index, self._requested_format)
+        self._cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+        self._pixel_format = 'BGR'
+
+
+    def _apply_size(self):
+        if self._size:
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self._size[0])
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self._size[1])
+
+
+    def _read(self, image):
+        if self._pixel_format == 'BGR':
+            return self._cap.read(image)
+
+        ret, self._raw = self._cap.read(self._raw)
+        if not ret or self._raw is None:
+            return False, None
+
+        return True, self._get_luma(self._raw, image)
+
+
+    def _get_luma(self, raw, image):
+        """
+        Gets the luma plane of a frame read in GREY or YUYV.
+
+        :param raw: The frame as delivered by the camera.
+        :type raw: numpy.ndarray
+
+        :param image: A preallocated grayscale frame to write the luma plane
+                      into, or None.
+        :type image: numpy.ndarray
+
+        :return: The grayscale frame.
+        :rtype: numpy.ndarray
+        """
+        width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if (image is None or image.shape != (height, width)
+                or image.dtype != raw.dtype or not image.flags.writeable):
+            image = np.empty((height, width), dtype=np.uint8)
+
+        if raw.size == width * height:
+            # GREY is the luma plane. Copy it, since the camera reuses raw.
+            np.copyto(image, raw.reshape((height, width)))
+        elif raw.size == width * height * 2:
+            # YUYV interleaves a luma byte with every chroma byte.
+            cv2.extractChannel(raw.reshape((height, width, 2)), 0, dst=image)
+        else:
+            # The backend converted the frames after all.
+            self._use_bgr()
+            return self._resize(raw)
+
+        return image
+
+
+    def _release(self):
+        self._cap.release()
+        self._cap = None
+        self._raw = None
+
+
+class VideoFileSource(FrameSource):
+    """
+    A recorded video file.
+
+    :param path: Path to the video file.
+    :type path: str
+
+    :param loop: Restart from the first frame at the end of the video.
+    :type loop: bool
+    """
+
+    def __init__(self, path, loop=False):
+        FrameSource.__init__(self)
+        self._path = path
+        self._loop = loop
+        self._cap = None
+
+
+    def _open(self):
+        if not os.path.isfile(self._path):
+            raise IOError('File does not exist')
+
+        self._cap = cv2.VideoCapture(self._path)
+        if not self._cap.isOpened():
+            self._cap = None
+            raise IOError('Video could not be opened')
+
+
+    def _read(self, image):
+        ret, frame = self._cap.read()
+        if not ret and self._loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+
+        if not ret:
+            return False, None
+
+        return True, self._resize(frame)
+
+
+    def _release(self):
+        self._cap.release()
+        self._cap = None
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    A directory of images, read in name order.
+
+    :param path: Path to the directory.
+    :type path: str
+
+    :param loop: Restart from the first image after the last one.
+    :type loop: bool
+    """
+
+    IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png')
+    """File extensions recognized as images."""
+
+    def __init__(self, path, loop=False):
+        FrameSource.__init__(self)
+        self._path = path
+        self._loop = loop
+        self._images = []
+        self._next = 0
+
+
+    def _open(self):
+        if not os.path.isdir(self._path):
+            raise IOError('Directory does not exist')
+
+        self._images = sorted(
+            os.path.join(self._path, name) for name in os.listdir(self._path)
+            if os.path.splitext(name)[1].lower() in self.IMAGE_EXTENSIONS)
+        self._next = 0
+
+
+    def _read(self, image):
+        if self._next >= len(self._images):
+            if not self._loop or not self._images:
+                return False, None
+            self._next = 0
+
+        frame = cv2.imread(self._images[self._next])
+        self._next += 1
+        if frame is None:
+            return False, None
+
+        return True, self._resize(frame)
+
+
+class ArraySource(FrameSource):
+    """
+    Frames that are already in memory.
+
+    :param frames: BGR or grayscale frames. May be a generator.
+    :type frames: iterable of numpy.ndarray
+
+    :param loop: Restart from the first frame after the last one. Frames are
+                 kept in memory to be replayed.
+    :type loop: bool
+    """
+
+    def __init__(self, frames, loop=False):
+        FrameSource.__init__(self)
+        self._frames = itertools.cycle(frames) if loop else iter(frames)
+
+
+    def _open(self):
+        pass
+
+
+    def _read(self, image):
+        try:
+            frame = next(self._frames)
+        except StopIteration:
+            return False, None
+
+        return True, self._resize(frame)
+
+
+def open_source(spec):
+    """
+    Creates a frame source from a device index or a path.
+
+    :param spec: A camera index, a video file, a directory of images or a frame
+                 recording.
+    :type spec: int or str
+
+    :return: The frame source. It is not opened until it is read from.
+    :rtype: FrameSource
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        return DeviceSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+
+    # Imported here, since recordings are sources themselves.
+    from framerecording import EXTENSION, RecordingSource
+    if spec.endswith(EXTENSION):
+        return RecordingSource(spec)
+
+    return VideoFileSource(spec)
@@ -0,0 +1,214 @@
+"""
+gapcontroller
+
+Author: Wisam Bunni
+"""
+
+
+class BandGapController:
+    """
+    Sets the follower's speed from the band the gap to the leader is in.
+
+    Stops within min_gap, matches the leader's speed within twice min_gap, and
+    otherwise speeds up by one every ramp_interval, up to max_speed. This is
+    how the follower has always driven.
+
+    :param min_gap: The gap to stop within (in meters).
+    :type min_gap: float
+
+    :param match_speed: The speed within twice min_gap.
+    :type match_speed: int
+
+    :param max_speed: The highest speed.
+    :type max_speed: int
+
+    :param ramp_interval: The time between speed steps (in seconds).
+    :type ramp_interval: float
+    """
+
+    def __init__(self, min_gap, match_speed, max_speed, ramp_interval):
+        self._min_gap = min_gap
+        self._match_speed = match_speed
+        self._max_speed = max_speed
+        self._ramp_interval = ramp_interval
+        self._speed = 0
+        self._ramp_time = None
+
+
+    def update(self, gap, timestamp):
+        """
+        Computes the speed for a measured gap.
+
+        :param gap: The distance to the leader (in meters).
+        :type gap: float
+
+        :param timestamp: When the gap was measured (in seconds).
+        :type timestamp: float
+
+        :return: The speed.
+        :rtype: int
+        """
+        if self._ramp_time is None:
+            self._ramp_time = timestamp
+
+        if gap <= self._min_gap:
+            self._speed = 0
+        elif gap <= self._min_gap * 2:
+            self._speed = self._match_speed
+        elif (timestamp - self._ramp_time > self._ramp_interval
+              and self._speed + 1 <= self._max_speed):
+            self._speed += 1
+            self._ramp_time = timestamp
+
+        return self._speed
+
+
+    def reset(self):
+        """Starts over from standstill."""
+        self._speed = 0
+        self._ramp_time = None
+
+
+class PIGapController:
+    """
+    Holds the gap to the leader with a PI controller and feed-forward.
+
+    The feed-forward term is the leader's estimated speed: the last speed
+    command plus the rate the gap is opening at. The PI terms correct the gap
+    error on top of it. Commands are computed from the real time between
+    measurements, limited to [0, max_speed] and changed by at most max_accel
+    per second. The integral stops growing while the command is limited.
+
+    A gap within min_gap always stops the vehicle. If no gap was measured for
+    stale_time, the vehicle is assumed to have stopped and the controller
+    starts over.
+
+    :param min_gap: The gap to stop within (in meters), such as
+                    follower.Follower.MIN_DISTANCE.
+    :type min_gap: float
+
+    :param max_speed: The highest speed, such as
+                      follower.Follower.FOLLOWER_MAX_SPEED.
+    :type max_speed: float
+
+    :param target_gap: The gap to hold (in meters).
+    :type target_gap: float
+
+    :param kp: The proportional gain (speed per meter of error).
+    :type kp: float
+
+    :param ki: The integral gain (speed per meter-second of error).
+    :type ki: float
+
+    :param feed_forward: The weight of the leader's estimated speed.
+    :type feed_forward: float
+
+    :param speed_scale: The speed command that drives at 1 m/s. Measure it for
+                        the vehicle.
+    :type speed_scale: float
+
+    :param max_accel: The largest change in speed per second.
+    :type max_accel: float
+
+    :param rate_smoothing: The weight of each new gap rate in its moving
+                           average, in (0, 1].
+    :type rate_smoothing: float
+
+    :param stale_time: The time without a measurement (in seconds) after which
+                       the controller starts over.
+    :type stale_time: float
+    """
+
+    def __init__(self, min_gap, max_speed, target_gap=0.14, kp=300.0, ki=100.0,
+                 feed_forward=1.0, speed_scale=100.0, max_accel=100.0,
+                 rate_smoothing=0.3, stale_time=0.5):
+        self._target_gap = target_gap
+        self._kp = kp
+        self._ki = ki
+        self._feed_forward = feed_forward
+        self._speed_scale = speed_scale
+        self._min_gap = min_gap
+        self._max_speed = max_speed
+        self._max_accel = max_accel
+        self._rate_smoothing = rate_smoothing
+        self._stale_time = stale_time
+        self.reset()
+
+
+    def reset(self):
+        """Starts over from standstill."""
+        self._speed = 0.0
+        self._integral = 0.0
+        self._gap_rate = 0.0
+        self._last_gap = None
+        self._last_time = None
+
+
+    def get_gap_rate(self):
+        """
+        Gets the estimated rate the gap is opening at.
+
+        :return: The gap rate (in meters per second). Negative while closing.
+        :rtype: float
+        """
+        return self._gap_rate
+
+
+    def update(self, gap, timestamp):
+        """
+        Computes the speed for a measured gap.
+
+        A measurement that is not newer than the last one returns the last
+        speed.
+
+        :param gap: The distance to the leader (in meters).
+        :type gap: float
+
+        :param timestamp: When the gap was measured (in seconds).
+        :type timestamp: float
+
+        :return: The speed.
+        :rtype: int
+        """
+        if (self._last_time is not None
+                and timestamp - self._last_time > self._stale_time):
+            self.reset()
+
+        if gap <= self._min_gap:
+            self.reset()
+            self._last_gap = gap
+            self._last_time = timestamp
+            return 0
+
+        dt = 0.0
+        if self._last_time is not None:
+            dt = timestamp - self._last_time
+            if dt <= 0:
+                return int(round(self._speed))
+
+            rate = (gap - self._last_gap) / dt
+            self._gap_rate += self._rate_smoothing * (rate - self._gap_rate)
+        self._last_gap = gap
+        self._last_time = timestamp
+
+        error = gap - self._target_gap
+        leader_speed = max(self._speed + self._gap_rate * self._speed_scale,
+                           0)
+        command = (self._feed_forward * leader_speed + self._kp * error
+                   + self._ki * (self._integral + error * dt))
+
+        limited = min(max(command, 0), self._max_speed)
+        if dt > 0:
+            step = self._max_accel * dt
+            limited = min(max(limited, self._speed - step), self._speed + step)
+        else:
+            # The first measurement after a start sets no speed yet.
+            limited = self._speed
+
+        # Only integrate while the command is not limited, so the integral
+        # does not wind up.
+        if limited == command:
+            self._integral += error * dt
+
+        self._speed = limited
+        return int(round(self._speed))
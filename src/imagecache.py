@@ -0,0 +1,118 @@
+"""
+imagecache
+
+Author: Wisam Bunni
+"""
+from collections import OrderedDict
+import cv2
+import os
+import stat
+import threading
+
+
+class ImageCache:
+    """
+    Least recently used cache of decoded images.
+
+    Images are decoded, resized and converted to grayscale once and kept in
+    memory. An entry is keyed by the image path, its modification time and the
+    requested size, so an image that changes on disk is decoded again.
+
+    :param max_bytes: The maximum memory used by cached images (in bytes).
+    :type max_bytes: int
+    """
+
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+    """The default memory cap (32 MiB)."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._max_bytes = max(int(max_bytes), 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+
+    def get(self, path, size):
+        """
+        Gets a decoded grayscale image, decoding it on a cache miss.
+
+        The returned image is shared with the cache and must not be modified.
+
+        :param path: Path to an image.
+        :type path: str
+
+        :param size: The (width, height) to resize the image to.
+        :type size: tuple
+
+        :return: The grayscale image.
+        :rtype: numpy.ndarray
+
+        :raise IOError: Thrown if path is not a readable image file.
+        """
+        try:
+            status = os.stat(path)
+        except OSError:
+            raise IOError('File does not exist')
+        if not stat.S_ISREG(status.st_mode):
+            raise IOError('File does not exist')
+
+        key = (path, status.st_mtime, tuple(size))
+
+        with self._lock:
+            image = self._entries.pop(key, None)
+            if image is not None:
+                # Re-insert to mark the entry as the most recently used.
+                self._entries[key] = image
+                self._hits += 1
+                return image
+            self._misses += 1
+
+        image = cv2.imread(path)
+        if image is None:
+            raise IOError('File is not an image')
+        image = cv2.resize(image, tuple(size))
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        with self._lock:
+            if key not in self._entries and image.nbytes <= self._max_bytes:
+                self._entries[key] = image
+                self._bytes += image.nbytes
+                while self._bytes > self._max_bytes:
+                    evicted_key, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+                    self._evictions += 1
+
+        return image
+
+
+    def clear(self):
+        """Removes every cached image. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+    def get_stats(self):
+        """
+        Gets the cache counters.
+
+        :return: Dictionary containing the number of hits, misses, evictions,
+                 cached images and bytes used.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                    'hits': self._hits,
+                    'misses': self._misses,
+                    'evictions': self._evictions,
+                    'entries': len(self._entries),
+                    'bytes': self._bytes
+            }
+
+
+DEFAULT_CACHE = ImageCache()
+"""The image cache shared by every TagRecognition object by default."""
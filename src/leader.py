@@ -5,6 +5,7 @@ Author: John Shamoon
 """
 import numpy as np
 
+from actuators import ActuatorWorker, CachedBackWheels, CachedFrontWheels
 from inputcontroller import InputController
 
 from picar import back_wheels, front_wheels
@@ -24,27 +25,38 @@ class Leader:
 
     :param test_mode: Test mode. Disables movements (off by default).
     :type test_mode: boolean
+
+    :param async_actuators: Write wheel commands on a background thread, so
+                            lead() never waits for the bus. Only the latest
+                            command of each kind is written. Off by default.
+    :type async_actuators: boolean
     """
 
     STRAIGHT_ANGLE = 90
     """The angle that the hardware associates as straight."""
 
 
-    def __init__(self, test_mode=False):
+    def __init__(self, test_mode=False, async_actuators=False):
         self._test_mode = False if test_mode is False else True
         self._controller = InputController()
 
         db_file = "config"
         picar.setup()
 
-        self.fw = front_wheels.Front_Wheels(debug=False, db=db_file)
-        self.bw = back_wheels.Back_Wheels(debug=False, db=db_file)
+        self.fw = CachedFrontWheels(
+                front_wheels.Front_Wheels(debug=False, db=db_file))
+        self.bw = CachedBackWheels(
+                back_wheels.Back_Wheels(debug=False, db=db_file))
 
         self.bw.ready()
         self.fw.ready()
 
         self.fw.calibration()
 
+        self._actuators = ActuatorWorker(self.fw, self.bw)
+        if async_actuators:
+            self._actuators.start()
+
 
     def set_speed(self, position):
         """
@@ -64,7 +76,7 @@ class Leader:
             speed = 0
 
         if not self._test_mode:
-            self.bw.speed = speed
+            self._actuators.set_speed(speed)
 
         return speed
 
@@ -75,7 +87,7 @@ class Leader:
 
         The vehicle moves forward at the last set speed.
         """
-        self.bw.forward()
+        self._actuators.forward()
 
 
     def reverse(self):
@@ -84,7 +96,7 @@ class Leader:
 
         The vehicle moves backward at the last set speed.
         """
-        self.bw.backward()
+        self._actuators.backward()
 
 
     def turn(self, position):
@@ -107,12 +119,38 @@ class Leader:
             position = np.clip(float(position), -1.0, 1.0)
             turn_angle = self.STRAIGHT_ANGLE + (self.fw.turning_max * position)
             if not self._test_mode:
-                self.fw.turn(turn_angle)
+                self._actuators.turn(turn_angle)
             return turn_angle
         except (ValueError, TypeError), e:
             return None
 
 
+    def get_actuator_timer(self):
+        """
+        Gets the timer of the time wheel commands wait to be written and take
+        to write.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._actuators.get_timer()
+
+
+    def get_write_counts(self):
+        """
+        Gets the number of actuator writes issued to the bus and suppressed
+        because nothing changed.
+
+        :return: Dictionary containing the write counts of the front wheels
+                 and the back wheels.
+        :rtype: dict
+        """
+        return {
+                'front_wheels': self.fw.get_write_counts(),
+                'back_wheels': self.bw.get_write_counts()
+        }
+
+
     def lead(self):
         """
         Controls a leader vehicle.
@@ -135,6 +173,7 @@ def main():
     Instantiates a Leader object and continuously calls Leader.lead().
     """
     leader = Leader()
+    # lead() waits for the next joystick event, so the joystick paces the loop.
     while True:
         leader.lead()
 
@@ -0,0 +1,156 @@
+"""
+loopscheduler
+
+Author: Wisam Bunni
+"""
+import math
+from time import sleep
+
+from stagetimer import StageTimer, clock
+
+
+class LoopScheduler:
+    """
+    Runs a control cycle at a fixed rate.
+
+    Cycles start on a fixed grid of deadlines, one period apart, on a
+    monotonic clock. The time left after a cycle is spent sleeping, so the CPU
+    is free for other work. A cycle that runs past its period is an overrun.
+    The deadlines it ran over are missed and skipped rather than made up in a
+    burst, so the next cycle starts on the next deadline of the grid.
+
+    The time each cycle started after its deadline (lateness), ran for
+    (cycle) and slept for (sleep) are recorded in a stage timer, together with
+    the whole period (total).
+
+    :param frequency: The number of cycles per second.
+    :type frequency: float
+
+    :param name: The name used in summary log lines.
+    :type name: str
+
+    :param log_interval: Log a summary line every log_interval seconds. None
+                         disables the summary line.
+    :type log_interval: float
+
+    :raise ValueError: Thrown if frequency is not positive.
+    """
+
+    TIMED_STAGES = ('lateness', 'cycle', 'sleep')
+    """The stages timed by the stage timer."""
+
+    def __init__(self, frequency, name='loop', log_interval=None):
+        if frequency <= 0:
+            raise ValueError('The frequency must be positive')
+
+        self._period = 1.0 / frequency
+        self._timer = StageTimer(self.TIMED_STAGES, name=name, enabled=True,
+                                 log_interval=log_interval)
+        self._deadline = None
+        self._running = False
+
+        self._cycles = 0
+        self._overruns = 0
+        self._missed = 0
+
+
+    def get_period(self):
+        """
+        Gets the time between cycle starts.
+
+        :return: The period (in seconds).
+        :rtype: float
+        """
+        return self._period
+
+
+    def start(self):
+        """Starts timing the first cycle, due now."""
+        self._deadline = clock()
+        self._timer.start()
+
+
+    def wait(self):
+        """
+        Ends a cycle and sleeps until the next one is due.
+
+        Starts the schedule first if start() was not called, in which case the
+        cycle that just ended is not timed.
+        """
+        if self._deadline is None:
+            self.start()
+            return
+
+        self._timer.mark('cycle')
+        self._cycles += 1
+
+        self._deadline += self._period
+        now = clock()
+        if now > self._deadline:
+            self._overruns += 1
+            missed = int(math.ceil((now - self._deadline) / self._period))
+            self._missed += missed
+            self._deadline += missed * self._period
+
+        # Sleep can wake up early, so sleep again until the deadline.
+        remaining = self._deadline - now
+        while remaining > 0:
+            sleep(remaining)
+            remaining = self._deadline - clock()
+
+        self._timer.mark('sleep')
+        self._timer.finish()
+        self._timer.start()
+        self._timer.record('lateness', -remaining)
+
+
+    def run(self, cycle, cycles=None):
+        """
+        Calls cycle at the scheduled rate until stop() is called.
+
+        :param cycle: The function to call every cycle.
+        :type cycle: callable
+
+        :param cycles: The number of cycles to run. Runs until stop() is called
+                       if None.
+        :type cycles: int
+        """
+        self._running = True
+        self.start()
+        count = 0
+        while self._running and (cycles is None or count < cycles):
+            cycle()
+            count += 1
+            self.wait()
+        self._running = False
+
+
+    def stop(self):
+        """Makes run() return once the current cycle ends."""
+        self._running = False
+
+
+    def get_timer(self):
+        """
+        Gets the timer of the lateness, cycle and sleep times.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._timer
+
+
+    def get_stats(self):
+        """
+        Gets the schedule counters.
+
+        :return: Dictionary containing the number of cycles run, the number of
+                 cycles that overran their period and the number of deadlines
+                 missed by overruns.
+        :rtype: dict
+        """
+        return {
+                'cycles': self._cycles,
+                'overruns': self._overruns,
+                'missed': self._missed
+        }
@@ -12,6 +12,7 @@ Authors: Zein Youssef and Steven Dropiewski
 """
 from follower import Follower
 from leader import Leader
+from loopscheduler import LoopScheduler
 from tagrec import TagRecognition
 
 
@@ -38,12 +39,17 @@ def main():
     The main driver program for the robotic leader-follower software.
     """
     tag = TagRecognition(marker_length=0.025)
-    vehicle = decide_role(tag.detect())
+    tag_data = tag.detect()
+    # Free the camera for the follower's own TagRecognition object.
+    tag.release()
+    vehicle = decide_role(tag_data)
 
     if isinstance(vehicle, Follower):
-        while True:
-            vehicle.follow()
+        LoopScheduler(Follower.LOOP_FREQUENCY, name='follower loop').run(
+                vehicle.follow)
     else:
+        # lead() waits for the next joystick event, so the joystick paces the
+        # loop.
         while True:
             vehicle.lead()
 
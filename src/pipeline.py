@@ -0,0 +1,551 @@
+"""
+pipeline
+
+Author: Wisam Bunni
+"""
+import ctypes
+import cv2
+import multiprocessing
+import numpy as np
+from time import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from framesource import DeviceSource
+from imagecache import ImageCache
+from stagetimer import StageTimer
+from tagrec import TagRecognition
+
+FREE = 0
+"""A slot that holds no frame."""
+WRITING = 1
+"""A slot being captured into."""
+READY = 2
+"""A slot holding a captured frame that has not been detected yet."""
+READING = 3
+"""A slot being detected in."""
+
+
+class FrameRing:
+    """
+    Ring of preallocated frame slots in shared memory.
+
+    One capture process writes frames into the slots and any number of
+    detection processes read them in place. Writers never wait for readers:
+    when no slot is free, the oldest frame that has not been read is dropped.
+    Readers always take the newest frame and drop older unread ones.
+
+    The ring must be created before the processes that use it are started.
+
+    :param slots: The number of frame slots.
+    :type slots: int
+
+    :param shape: The shape of a frame.
+    :type shape: tuple
+    """
+
+    POLL_INTERVAL = 0.1
+    """How often (in seconds) a waiting reader checks if the ring stopped."""
+
+    def __init__(self, slots, shape):
+        self._slot_count = slots
+        self._shape = tuple(shape)
+        frame_size = int(np.prod(self._shape))
+
+        self._data = multiprocessing.RawArray(ctypes.c_uint8,
+                                              slots * frame_size)
+        self._states = multiprocessing.RawArray(ctypes.c_int, slots)
+        self._seqs = multiprocessing.RawArray(ctypes.c_long, slots)
+        self._timestamps = multiprocessing.RawArray(ctypes.c_double, slots)
+        # Frames captured and frames dropped without being read.
+        self._counters = multiprocessing.RawArray(ctypes.c_long, 2)
+        self._running = multiprocessing.RawValue(ctypes.c_int, 1)
+        self._condition = multiprocessing.Condition()
+
+        self._frames = None
+
+
+    def get_frame(self, index):
+        """
+        Gets a slot's frame without copying it.
+
+        :param index: The slot.
+        :type index: int
+
+        :return: A view of the slot.
+        :rtype: numpy.ndarray
+        """
+        if self._frames is None:
+            self._frames = np.frombuffer(self._data, dtype=np.uint8).reshape(
+                    (self._slot_count,) + self._shape)
+
+        return self._frames[index]
+
+
+    def acquire_write(self):
+        """
+        Takes a slot to capture into, dropping the oldest unread frame if no
+        slot is free.
+
+        :return: The slot, or None if every slot is being used.
+        :rtype: int
+        """
+        with self._condition:
+            index = None
+            for slot in range(self._slot_count):
+                if self._states[slot] == FREE:
+                    index = slot
+                    break
+                if self._states[slot] == READY and (
+                        index is None or self._seqs[slot] < self._seqs[index]):
+                    index = slot
+
+            if index is None:
+                return None
+            if self._states[index] == READY:
+                self._counters[1] += 1
+            self._states[index] = WRITING
+            return index
+
+
+    def publish(self, index, seq, timestamp):
+        """
+        Makes a captured frame available to readers.
+
+        :param index: The slot captured into.
+        :type index: int
+
+        :param seq: The frame's sequence number.
+        :type seq: int
+
+        :param timestamp: The frame's capture time.
+        :type timestamp: float
+        """
+        with self._condition:
+            self._seqs[index] = seq
+            self._timestamps[index] = timestamp
+            self._states[index] = READY
+            self._counters[0] += 1
+            self._condition.notify_all()
+
+
+    def cancel_write(self, index):
+        """
+        Returns a slot that was not captured into.
+
+        :param index: The slot.
+        :type index: int
+        """
+        with self._condition:
+            self._states[index] = FREE
+
+
+    def acquire_read(self):
+        """
+        Takes the newest captured frame, waiting for one if needed. Older
+        unread frames are dropped.
+
+        :return: The slot, the frame's sequence number and the frame's capture
+                 time, or None if the ring was stopped.
+        :rtype: int, int, float
+        """
+        with self._condition:
+            while True:
+                index = None
+                for slot in range(self._slot_count):
+                    if self._states[slot] == READY and (
+                            index is None
+                            or self._seqs[slot] > self._seqs[index]):
+                        index = slot
+
+                if index is not None:
+                    break
+                if not self._running.value:
+                    return None
+                self._condition.wait(self.POLL_INTERVAL)
+
+            for slot in range(self._slot_count):
+                if slot != index and self._states[slot] == READY:
+                    self._states[slot] = FREE
+                    self._counters[1] += 1
+            self._states[index] = READING
+
+            return index, self._seqs[index], self._timestamps[index]
+
+
+    def release(self, index):
+        """
+        Returns a slot that was read.
+
+        :param index: The slot.
+        :type index: int
+        """
+        with self._condition:
+            self._states[index] = FREE
+
+
+    def stop(self):
+        """Stops the ring. Readers return once no frame is left to read."""
+        with self._condition:
+            self._running.value = 0
+            self._condition.notify_all()
+
+
+    def is_running(self):
+        """
+        Checks if the ring is running.
+
+        :return: True until stop() is called, False afterwards.
+        :rtype: bool
+        """
+        return bool(self._running.value)
+
+
+    def get_counts(self):
+        """
+        Gets the number of frames captured and dropped.
+
+        :return: The number of frames published and the number dropped before
+                 any reader took them.
+        :rtype: int, int
+        """
+        with self._condition:
+            return self._counters[0], self._counters[1]
+
+
+def _capture(ring, source, size):
+    """
+    Captures frames into the ring until it stops or the source runs out.
+
+    :param ring: The frame ring.
+    :type ring: FrameRing
+
+    :param source: The frame source. Opened by this process.
+    :type source: framesource.FrameSource
+
+    :param size: The (width, height) of the frames.
+    :type size: tuple
+    """
+    seq = 0
+    try:
+        while ring.is_running():
+            index = ring.acquire_write()
+            slot = ring.get_frame(index) if index is not None else None
+
+            # Sources that can decode in place write straight into the slot.
+            ret, frame = source.read(slot)
+            # Keep the capture time a recording was made with. The ring
+            # orders frames by its own count.
+            info = source.get_frame_info()
+            timestamp = info[1] if info else time()
+            if not ret or frame is None:
+                if index is not None:
+                    ring.cancel_write(index)
+                break
+            if index is None:
+                continue
+
+            if not np.may_share_memory(frame, slot):
+                if (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size)
+                if frame.ndim == slot.ndim:
+                    np.copyto(slot, frame)
+                elif frame.ndim == 2:
+                    cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR, dst=slot)
+                else:
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=slot)
+
+            seq += 1
+            ring.publish(index, seq, timestamp)
+    finally:
+        source.release()
+        ring.stop()
+
+
+def _detect(ring, results, tag_args):
+    """
+    Detects ARTags in the newest frames of the ring until it stops.
+
+    :param ring: The frame ring.
+    :type ring: FrameRing
+
+    :param results: The queue to put the detection results on.
+    :type results: multiprocessing.Queue
+
+    :param tag_args: Keyword arguments for TagRecognition.
+    :type tag_args: dict
+    """
+    # Let the process exit without waiting for unread results.
+    results.cancel_join_thread()
+    # Frames come from the ring, never from image files, so nothing is cached.
+    tag = TagRecognition(image_cache=ImageCache(0), **tag_args)
+
+    while True:
+        frame = ring.acquire_read()
+        if frame is None:
+            break
+
+        index, seq, timestamp = frame
+        try:
+            observation = tag.detect_frame(ring.get_frame(index))
+        finally:
+            ring.release(index)
+
+        if observation:
+            observation = observation._replace(timestamp=timestamp, seq=seq)
+        results.put((seq, timestamp, time(), observation))
+
+
+class PerceptionPipeline:
+    """
+    Captures frames and detects ARTags in separate processes.
+
+    A capture process reads frames into a shared-memory FrameRing and
+    detection worker processes read them in place. Stale frames are dropped
+    rather than queued, both when the workers fall behind the camera and when
+    the caller falls behind the workers, so detect() always returns the newest
+    result.
+
+    Has the same detect() interface as TagRecognition, so it can replace a
+    TagRecognition object in a control loop. The processes are started by the
+    first detection.
+
+    :param source: Where frames are captured from. Defaults to camera 0. Must
+                   not be opened yet, since it is opened by the capture
+                   process.
+    :type source: framesource.FrameSource
+
+    :param workers: The number of detection processes.
+    :type workers: int
+
+    :param slots: The number of frame slots. Defaults to one per worker plus
+                  one being captured into and one ready to be read.
+    :type slots: int
+
+    :param tag_args: Keyword arguments for each worker's TagRecognition, such
+                     as resolution and marker_length. The source, threaded
+                     capture, the resolution scheduler and the image cache are
+                     not supported.
+    """
+
+    JOIN_TIMEOUT = 1.0
+    """Seconds to wait for each process to exit when stopping."""
+
+    def __init__(self, source=None, workers=1, slots=None, **tag_args):
+        self._workers = max(int(workers), 1)
+        self._tag_args = tag_args
+        # Only used for its ARTag geometry helpers.
+        self._tag = TagRecognition(image_cache=ImageCache(0), **tag_args)
+
+        width, height = TagRecognition.RESOLUTIONS[self._tag.get_resolution()]
+        self._size = (width, height)
+        self._source = source if source is not None else DeviceSource(0)
+        self._source.set_size(width, height)
+
+        self._slots = max(slots or 0, self._workers + 2)
+        self._ring = None
+        self._results = None
+        self._processes = []
+
+        self._seq = 0
+        self._timestamp = 0
+        self._detected = 0
+        self._discarded = 0
+        self._timer = StageTimer(('detected', 'consumed'), name='pipeline',
+                                 enabled=True)
+
+
+    def start(self):
+        """
+        Starts the capture and detection processes.
+
+        Calling start() on a running pipeline has no effect.
+        """
+        if self._processes:
+            return
+
+        shape = (self._size[1], self._size[0], 3)
+        if (isinstance(self._source, DeviceSource)
+                and self._source.get_pixel_format() != 'BGR'):
+            # Keep the camera's luma plane instead of converting it to BGR.
+            shape = shape[:2]
+        self._ring = FrameRing(self._slots, shape)
+        self._results = multiprocessing.Queue()
+
+        self._processes = [multiprocessing.Process(
+                target=_capture, name='PipelineCapture',
+                args=(self._ring, self._source, self._size))]
+        for worker in range(self._workers):
+            self._processes.append(multiprocessing.Process(
+                    target=_detect, name='PipelineDetect-%d' % worker,
+                    args=(self._ring, self._results, self._tag_args)))
+
+        for process in self._processes:
+            process.daemon = True
+            process.start()
+
+
+    def stop(self):
+        """Stops the capture and detection processes."""
+        if not self._processes:
+            return
+
+        self._ring.stop()
+        for process in self._processes:
+            process.join(self.JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join(self.JOIN_TIMEOUT)
+        self._processes = []
+
+
+    def release(self):
+        """Stops the pipeline. It is started again by the next detection."""
+        self.stop()
+
+
+    def is_running(self):
+        """
+        Checks if the pipeline is running.
+
+        :return: True if frames are still being captured or detected, False
+                 otherwise.
+        :rtype: bool
+        """
+        return any(process.is_alive() for process in self._processes)
+
+
+    def detect(self, img_src=None, timeout=None):
+        """
+        Gets the newest detection result the caller has not seen yet.
+
+        Waits for a new result if there is none. Older results that arrived
+        since the last call are discarded.
+
+        :param img_src: Not supported. Must be None.
+        :type img_src: str
+
+        :param timeout: Seconds to wait for a new result. Waits until the
+                        pipeline stops if None.
+        :type timeout: float
+
+        :return: The newest TagRecognition.detect() result. Its timestamp and
+                 seq are those of the captured frame.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the newest frame has no ARTag, or if no new result
+                 arrived.
+        :rtype: None
+
+        :raise ValueError: Thrown if img_src is given.
+        """
+        if img_src:
+            raise ValueError('The pipeline only detects captured frames')
+        if not self._processes:
+            self.start()
+
+        deadline = None if timeout is None else time() + timeout
+        newest = None
+        while newest is None:
+            remaining = FrameRing.POLL_INTERVAL
+            if deadline is not None:
+                remaining = min(remaining, deadline - time())
+            try:
+                newest = self._take_newer(self._results.get(
+                        True, max(remaining, 0)))
+            except queue.Empty:
+                if ((deadline is not None and time() >= deadline)
+                        or not self.is_running()):
+                    return None
+
+        # Skip straight to the newest result that is already waiting.
+        try:
+            while True:
+                result = self._take_newer(self._results.get_nowait(), newest)
+                if result is not None:
+                    newest = result
+        except queue.Empty:
+            pass
+
+        seq, timestamp, detected_time, observation = newest
+        self._seq = seq
+        self._timestamp = timestamp
+        self._timer.record('detected', detected_time - timestamp)
+        self._timer.record('consumed', time() - timestamp)
+
+        return observation
+
+
+    def _take_newer(self, result, newest=None):
+        """
+        Counts a result and checks if it is newer than what was returned.
+
+        :return: The result, or None if it is stale.
+        :rtype: tuple
+        """
+        self._detected += 1
+        newest_seq = newest[0] if newest is not None else self._seq
+        if result[0] <= newest_seq:
+            self._discarded += 1
+            return None
+
+        if newest is not None:
+            self._discarded += 1
+        return result
+
+
+    def get_frame_info(self):
+        """
+        Gets the sequence number and capture time of the frame of the last
+        result returned by detect().
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+        """
+        return self._seq, self._timestamp
+
+
+    def get_timer(self):
+        """
+        Gets the frame age metrics.
+
+        The 'detected' stage is the time from capturing a frame to finishing
+        its detection. The 'consumed' stage is the time from capturing a frame
+        to returning its result from detect().
+
+        :return: The frame age timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._timer
+
+
+    def get_stats(self):
+        """
+        Gets the pipeline counters.
+
+        :return: Dictionary containing the number of frames captured, frames
+                 dropped before detection, results received and results
+                 discarded as stale.
+        :rtype: dict
+        """
+        captured, dropped = (self._ring.get_counts() if self._ring
+                             else (0, 0))
+        return {
+                'captured': captured,
+                'dropped': dropped,
+                'detected': self._detected,
+                'discarded': self._discarded
+        }
+
+
+    def get_direction(self, object_x, object_z):
+        """Same as TagRecognition.get_direction()."""
+        return self._tag.get_direction(object_x, object_z)
+
+
+    def make_decision(self, direction):
+        """Same as TagRecognition.make_decision()."""
+        return self._tag.make_decision(direction)
@@ -0,0 +1,192 @@
+"""
+resolutionscheduler
+
+Author: Wisam Bunni
+"""
+
+
+class ResolutionScheduler:
+    """
+    Picks the cheapest resolution that still detects the ARTag reliably.
+
+    The ARTag's size in pixels scales with the frame width, so one measurement
+    predicts its size at every resolution. The scheduler keeps the ARTag's
+    side length within [min_tag_pixels, max_tag_pixels] using the lowest
+    resolution that fits in the per-frame latency budget. A resolution change
+    has to be wanted for switch_frames frames in a row before it happens.
+
+    :param resolutions: The available resolutions, mapping a resolution name to
+                        its [width, height], like TagRecognition.RESOLUTIONS.
+    :type resolutions: dict
+
+    :param min_tag_pixels: The smallest ARTag side length (in pixels) that is
+                           detected reliably.
+    :type min_tag_pixels: float
+
+    :param max_tag_pixels: The ARTag side length (in pixels) above which a lower
+                           resolution is used.
+    :type max_tag_pixels: float
+
+    :param latency_budget: The longest a frame may take to process (in
+                           seconds). None disables the budget.
+    :type latency_budget: float
+
+    :param switch_frames: The number of frames in a row a new resolution must be
+                          wanted for before switching to it.
+    :type switch_frames: int
+
+    :param lost_frames: The number of frames in a row without an ARTag before a
+                        higher resolution is tried.
+    :type lost_frames: int
+
+    :param near_distance: An ARTag lost closer than this (in meters) most likely
+                          left the field of view rather than became too small,
+                          so the resolution is not raised to look for it.
+    :type near_distance: float
+    """
+
+    LATENCY_SMOOTHING = 0.2
+    """The weight of a new latency measurement in the running average."""
+
+    def __init__(self, resolutions, min_tag_pixels=24, max_tag_pixels=64,
+                 latency_budget=None, switch_frames=5, lost_frames=10,
+                 near_distance=0.1):
+        self._resolutions = dict(resolutions)
+        self._order = sorted(self._resolutions,
+                             key=lambda name: self._resolutions[name][0])
+        self._min_tag_pixels = float(min_tag_pixels)
+        self._max_tag_pixels = max(float(max_tag_pixels), self._min_tag_pixels)
+        self._latency_budget = latency_budget
+        self._switch_frames = max(int(switch_frames), 1)
+        self._lost_frames = max(int(lost_frames), 1)
+        self._near_distance = near_distance
+
+        self._latencies = {}
+        self._wanted = None
+        self._wanted_frames = 0
+        self._missed_frames = 0
+
+
+    def _width(self, resolution):
+        return float(self._resolutions[resolution][0])
+
+
+    def _pixels(self, resolution):
+        width, height = self._resolutions[resolution]
+        return float(width * height)
+
+
+    def get_latency(self, resolution):
+        """
+        Gets the expected time to process a frame at a resolution.
+
+        Resolutions that have not been used yet are estimated from the closest
+        measured resolution, assuming the time scales with the pixel count.
+
+        :param resolution: The resolution.
+        :type resolution: int
+
+        :return: The expected latency (in seconds), or None if no resolution
+                 has been measured.
+        :rtype: float
+        """
+        if resolution in self._latencies:
+            return self._latencies[resolution]
+        if not self._latencies:
+            return None
+
+        closest = min(self._latencies, key=lambda measured:
+                      abs(self._pixels(measured) - self._pixels(resolution)))
+        return (self._latencies[closest] * self._pixels(resolution)
+                / self._pixels(closest))
+
+
+    def _within_budget(self, resolution):
+        if self._latency_budget is None:
+            return True
+        latency = self.get_latency(resolution)
+        return latency is None or latency <= self._latency_budget
+
+
+    def _wanted_resolution(self, resolution, tag_pixels, distance):
+        """
+        Gets the resolution that suits the last frame.
+
+        :return: The wanted resolution.
+        :rtype: int
+        """
+        index = self._order.index(resolution)
+
+        if tag_pixels is None:
+            self._missed_frames += 1
+            if (self._missed_frames < self._lost_frames
+                    or (distance is not None
+                        and distance < self._near_distance)):
+                return resolution
+            self._missed_frames = 0
+            return self._order[min(index + 1, len(self._order) - 1)]
+
+        self._missed_frames = 0
+        if self._min_tag_pixels <= tag_pixels <= self._max_tag_pixels:
+            return resolution
+
+        # The ARTag's size per pixel of frame width.
+        tag_size = tag_pixels / self._width(resolution)
+        for candidate in self._order:
+            if tag_size * self._width(candidate) >= self._min_tag_pixels:
+                return candidate
+
+        return self._order[-1]
+
+
+    def update(self, resolution, tag_pixels, distance, latency):
+        """
+        Picks the resolution for the next frame.
+
+        :param resolution: The resolution of the last frame.
+        :type resolution: int
+
+        :param tag_pixels: The ARTag's side length in the last frame (in
+                           pixels), or None if it was not detected.
+        :type tag_pixels: float
+
+        :param distance: The last measured distance to the ARTag (in meters),
+                         or None if it was never detected.
+        :type distance: float
+
+        :param latency: The time it took to process the last frame (in
+                        seconds).
+        :type latency: float
+
+        :return: The resolution to use for the next frame.
+        :rtype: int
+        """
+        previous = self._latencies.get(resolution, latency)
+        self._latencies[resolution] = (previous + self.LATENCY_SMOOTHING
+                                       * (latency - previous))
+
+        wanted = self._wanted_resolution(resolution, tag_pixels, distance)
+
+        # Never go over the latency budget.
+        index = self._order.index(wanted)
+        while index > 0 and not self._within_budget(self._order[index]):
+            index -= 1
+        wanted = self._order[index]
+
+        if wanted == resolution:
+            self._wanted = None
+            self._wanted_frames = 0
+            return resolution
+
+        if wanted == self._wanted:
+            self._wanted_frames += 1
+        else:
+            self._wanted = wanted
+            self._wanted_frames = 1
+
+        if self._wanted_frames < self._switch_frames:
+            return resolution
+
+        self._wanted = None
+        self._wanted_frames = 0
+        return wanted
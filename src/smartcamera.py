@@ -0,0 +1,696 @@
+"""
+smartcamera
+
+Author: Wisam Bunni
+"""
+from collections import deque, namedtuple
+import math
+import numpy as np
+import os
+import pty
+import select
+import string
+import termios
+import tty
+from time import time
+
+from stagetimer import StageTimer
+from tagobservation import ObservationHistory, TagObservation
+from tagrec import SMALL_ANGLE, TagRecognition, single_tag_geometry
+
+ID_PREFIXES = string.ascii_letters.encode('ascii')
+"""The letters a marker id can start with, such as U for ArUco."""
+
+SerialDetection = namedtuple('SerialDetection',
+                             ['marker_id', 'tvec', 'quaternion'])
+"""
+One ARTag reported by the camera: its id, its (x, y, z) position in meters and
+its (w, x, y, z) orientation quaternion, or None if the camera did not send
+one.
+"""
+
+SerialFrame = namedtuple('SerialFrame',
+                         ['number', 'camera_time', 'arrival', 'detections'])
+"""
+The ARTags reported for one camera frame: the camera's frame number and time
+(None if not sent), the host time the frame's first message arrived and the
+list of SerialDetection.
+"""
+
+
+def parse_stamp(token):
+    """
+    Parses the frame number and time a message may be prefixed with.
+
+    :param token: A frame number, a time of day (hh:mm:ss.sss) or both joined
+                  by '/'.
+    :type token: bytes
+
+    :return: The frame number and the time (in seconds since midnight), either
+             of which may be None.
+    :rtype: int, float
+
+    :raise ValueError: Thrown if the token is not a stamp.
+    """
+    number = None
+    camera_time = None
+    for part in token.split(b'/'):
+        if b':' in part:
+            hours, minutes, seconds = part.split(b':')
+            camera_time = (int(hours) * 3600 + int(minutes) * 60
+                           + float(seconds))
+        else:
+            number = int(part)
+
+    return number, camera_time
+
+
+def parse_marker_id(token):
+    """
+    Parses a marker id such as U42 (ArUco) or 42.
+
+    :param token: The id token.
+    :type token: bytes
+
+    :return: The id.
+    :rtype: int
+
+    :raise ValueError: Thrown if the token has no number.
+    """
+    return int(token.lstrip(ID_PREFIXES))
+
+
+class MessageParser:
+    """
+    Incrementally parses the standardized 3D serial messages of a JeVois smart
+    camera running ArUco detection.
+
+    Bytes can be fed in chunks of any size. Each line is parsed once, when its
+    end arrives. The messages understood are::
+
+        MARK START
+        D3 <id> <x> <y> <z> <w> <h> <d> <q1> <q2> <q3> <q4> [extra]
+        N3 <id> <x> <y> <z> <w> <h> <d>
+        MARK STOP
+
+    with positions in millimeters, as sent with serstyle Detail or Normal and
+    sermark Both. Any message may be prefixed with a stamp (see parse_stamp())
+    when serstamp is set. Without MARK messages, every D3 or N3 message is a
+    frame of its own. Other messages are ignored.
+    """
+
+    MAX_LINE = 1024
+    """The longest line kept (in bytes). Longer lines are dropped as noise."""
+    MILLIMETERS = 1000.0
+    """Millimeters per meter."""
+
+    def __init__(self):
+        self._buffer = b''
+        self._frame = None
+        self._ignored = 0
+
+
+    def get_ignored(self):
+        """
+        Gets the number of lines that could not be used.
+
+        :return: The number of ignored lines.
+        :rtype: int
+        """
+        return self._ignored
+
+
+    def feed(self, data, arrival):
+        """
+        Parses received bytes.
+
+        :param data: The bytes.
+        :type data: bytes
+
+        :param arrival: The host time the bytes arrived.
+        :type arrival: float
+
+        :return: The frames completed by the bytes, oldest first.
+        :rtype: list of SerialFrame
+        """
+        self._buffer += data
+        if b'\n' not in self._buffer:
+            if len(self._buffer) > self.MAX_LINE:
+                self._buffer = b''
+                self._ignored += 1
+            return []
+
+        lines = self._buffer.split(b'\n')
+        self._buffer = lines.pop()
+
+        frames = []
+        for line in lines:
+            try:
+                frame = self._parse_line(line.split(), arrival)
+            except (ValueError, IndexError):
+                self._ignored += 1
+                continue
+            if frame is not None:
+                frames.append(frame)
+
+        return frames
+
+
+    def _parse_line(self, tokens, arrival):
+        """
+        Parses one line.
+
+        :return: The frame the line completes, if any.
+        :rtype: SerialFrame
+        """
+        if not tokens:
+            return None
+
+        number = None
+        camera_time = None
+        if tokens[0] not in (b'MARK', b'D3', b'N3'):
+            number, camera_time = parse_stamp(tokens[0])
+            tokens = tokens[1:]
+
+        if tokens[0] == b'MARK':
+            if tokens[1] == b'START':
+                self._frame = SerialFrame(number, camera_time, arrival, [])
+                return None
+            if tokens[1] == b'STOP' and self._frame is not None:
+                frame = self._frame
+                self._frame = None
+                return frame
+            self._ignored += 1
+            return None
+
+        if tokens[0] == b'D3':
+            quaternion = tuple(float(value) for value in tokens[8:12])
+            if len(quaternion) != 4:
+                raise ValueError('Incomplete D3 message')
+        elif tokens[0] == b'N3':
+            quaternion = None
+        else:
+            self._ignored += 1
+            return None
+
+        detection = SerialDetection(
+                parse_marker_id(tokens[1]),
+                (float(tokens[2]) / self.MILLIMETERS,
+                 float(tokens[3]) / self.MILLIMETERS,
+                 float(tokens[4]) / self.MILLIMETERS),
+                quaternion)
+
+        if self._frame is not None:
+            self._frame.detections.append(detection)
+            return None
+
+        return SerialFrame(number, camera_time, arrival, [detection])
+
+
+class ClockAligner:
+    """
+    Maps camera times to host times.
+
+    The offset between the clocks is the smallest difference between a
+    message's arrival time and its camera time over the last window messages,
+    since the message that was delayed the least gives the closest offset.
+    The window lets the offset follow clock drift. A jump larger than
+    MAX_JUMP, such as the camera restarting or its clock passing midnight,
+    starts over.
+
+    :param window: The number of messages the offset is taken over.
+    :type window: int
+    """
+
+    MAX_JUMP = 1.0
+    """The largest change in offset (in seconds) that is not a jump."""
+
+    def __init__(self, window=64):
+        self._offsets = deque(maxlen=max(int(window), 1))
+        self._offset = None
+
+
+    def update(self, camera_time, host_time):
+        """
+        Adds a message's camera time and arrival time.
+
+        :param camera_time: The camera time (in seconds).
+        :type camera_time: float
+
+        :param host_time: The host time the message arrived.
+        :type host_time: float
+        """
+        offset = host_time - camera_time
+        if (self._offset is not None
+                and abs(offset - self._offset) > self.MAX_JUMP):
+            self._offsets.clear()
+
+        self._offsets.append(offset)
+        self._offset = min(self._offsets)
+
+
+    def to_host(self, camera_time):
+        """
+        Converts a camera time to a host time.
+
+        :param camera_time: The camera time (in seconds).
+        :type camera_time: float
+
+        :return: The host time, or None before the first update().
+        :rtype: float
+        """
+        if self._offset is None:
+            return None
+
+        return camera_time + self._offset
+
+
+def quaternion_to_rvec(quaternion):
+    """
+    Converts a (w, x, y, z) quaternion to a rotation vector.
+
+    :param quaternion: The quaternion. It does not need to be normalized.
+    :type quaternion: tuple
+
+    :return: The rotation vector.
+    :rtype: numpy.ndarray
+    """
+    w, x, y, z = quaternion
+    norm = math.sqrt(w * w + x * x + y * y + z * z)
+    if norm == 0:
+        return np.zeros(3)
+    if w < 0:
+        # The same rotation, the short way round.
+        norm = -norm
+    w, x, y, z = w / norm, x / norm, y / norm, z / norm
+
+    sine = math.sqrt(x * x + y * y + z * z)
+    if sine < SMALL_ANGLE:
+        return np.array([2 * x, 2 * y, 2 * z])
+
+    scale = 2 * math.atan2(sine, w) / sine
+    return np.array([x * scale, y * scale, z * scale])
+
+
+def rvec_to_quaternion(rvec):
+    """
+    Converts a rotation vector to a (w, x, y, z) quaternion.
+
+    :param rvec: The rotation vector.
+    :type rvec: numpy.ndarray
+
+    :return: The quaternion.
+    :rtype: tuple
+    """
+    rx, ry, rz = np.ravel(rvec).tolist()
+    theta = math.sqrt(rx * rx + ry * ry + rz * rz)
+    if theta < SMALL_ANGLE:
+        return (1.0, rx / 2, ry / 2, rz / 2)
+
+    scale = math.sin(theta / 2) / theta
+    return (math.cos(theta / 2), rx * scale, ry * scale, rz * scale)
+
+
+class SmartCamera:
+    """
+    Reads ARTag detections from a smart camera over a serial line instead of
+    detecting them in frames on the host.
+
+    Has the same detect() interface as TagRecognition and returns the same
+    observations, so it can replace a TagRecognition object in a control loop.
+    The camera should run ArUco detection with the dictionary and marker
+    length the vehicles use, and send 3D messages (see MessageParser). The
+    serial line is opened by the first detection.
+
+    Frames are stamped with the camera's time mapped to the host clock if
+    messages carry a time stamp, and with their arrival time minus latency
+    otherwise. Their sequence number is the camera's frame number if messages
+    carry one.
+
+    :param port: The serial device, such as /dev/ttyACM0.
+    :type port: str
+
+    :param baud_rate: The serial line speed.
+    :type baud_rate: int
+
+    :param latency: The time (in seconds) from capturing a frame to its
+                    messages arriving, used when messages carry no time stamp.
+    :type latency: float
+
+    :param frame_timeout: How long detect() waits for the next frame (in
+                          seconds) by default. The camera sends nothing for a
+                          frame without ARTags unless it marks frames.
+    :type frame_timeout: float
+
+    :param dead_zone: The dead zone to consider everything to be directly in
+                      front of the camera. See TagRecognition.
+    :type dead_zone: float
+
+    :param timing: Time each stage of a detection. Disabled by default.
+    :type timing: bool
+
+    :param history_size: The number of recent detections kept by
+                         get_history().
+    :type history_size: int
+    """
+
+    TIMED_STAGES = ('read', 'pose')
+    """The stages of a detection timed by the stage timer."""
+    READ_SIZE = 4096
+    """The most bytes read from the serial line at once."""
+
+    def __init__(self, port, baud_rate=115200, latency=0.0,
+                 frame_timeout=0.1, dead_zone=1.45, timing=False,
+                 history_size=32):
+        self._port = port
+        self._baud_rate = baud_rate
+        self._latency = latency
+        self._frame_timeout = frame_timeout
+        self._fd = None
+
+        # Only used for its direction and decision helpers.
+        self._tag = TagRecognition(dead_zone=dead_zone)
+        self._parser = MessageParser()
+        self._aligner = ClockAligner()
+        self._timer = StageTimer(self.TIMED_STAGES, name='smartcamera',
+                                 enabled=timing)
+        self._history = ObservationHistory(history_size)
+
+        self._frame_seq = 0
+        self._frame_timestamp = 0
+        self._frames = 0
+
+
+    def open(self):
+        """
+        Opens the serial line.
+
+        Calling open() on an open line has no effect.
+
+        :raise IOError: Thrown if the serial line cannot be opened.
+        """
+        if self._fd is not None:
+            return
+
+        try:
+            self._fd = os.open(self._port,
+                               os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            raise IOError('Serial port %s could not be opened: %s'
+                          % (self._port, e))
+
+        if os.isatty(self._fd):
+            tty.setraw(self._fd)
+            speed = getattr(termios, 'B%d' % self._baud_rate)
+            attributes = termios.tcgetattr(self._fd)
+            attributes[4] = attributes[5] = speed
+            termios.tcsetattr(self._fd, termios.TCSANOW, attributes)
+            termios.tcflush(self._fd, termios.TCIFLUSH)
+
+
+    def is_opened(self):
+        """
+        Checks if the serial line has been opened.
+
+        :return: True if the serial line is open, False otherwise.
+        :rtype: bool
+        """
+        return self._fd is not None
+
+
+    def release(self):
+        """Closes the serial line. It is opened again by the next detection."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+    def detect(self, img_src=None, timeout=None):
+        """
+        Gets the ARTag in the newest frame reported by the camera.
+
+        Reads everything that arrived since the last call and waits for a
+        frame if none did. Older frames that arrived since the last call are
+        skipped.
+
+        :param img_src: Not supported. Must be None.
+        :type img_src: str
+
+        :param timeout: Seconds to wait for a frame. Defaults to frame_timeout.
+        :type timeout: float
+
+        :return: The x distance, z distance, direction, decision, and yaw of
+                 the ARTag and the timestamp and sequence number of the frame,
+                 if an ARTag is detected.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the newest frame has no ARTag, or if no frame
+                 arrived.
+        :rtype: None
+
+        :raise ValueError: Thrown if img_src is given.
+        :raise IOError: Thrown if the serial line cannot be opened or read.
+        """
+        if img_src:
+            raise ValueError('The smart camera only detects its own frames')
+
+        self.open()
+        self._timer.start()
+        if timeout is None:
+            timeout = self._frame_timeout
+
+        deadline = time() + timeout
+        frames = self._read(0)
+        while not frames:
+            remaining = deadline - time()
+            if remaining <= 0:
+                # Timing a wait for a frame that never came would only
+                # record the timeout.
+                self._timer.discard()
+                return None
+            frames = self._read(remaining)
+        self._timer.mark('read')
+
+        frame = frames[-1]
+        self._frames += 1
+        self._frame_seq = (frame.number if frame.number is not None
+                           else self._frame_seq + 1)
+        self._frame_timestamp = frame.arrival - self._latency
+        if frame.camera_time is not None:
+            self._frame_timestamp = self._aligner.to_host(frame.camera_time)
+
+        if not frame.detections:
+            self._timer.finish()
+            return None
+
+        observation = self._observe(frame.detections[0])
+        self._timer.mark('pose')
+        self._timer.finish()
+
+        return observation
+
+
+    def _read(self, timeout):
+        """
+        Reads and parses what is waiting on the serial line.
+
+        :param timeout: Seconds to wait for bytes if none are waiting.
+        :type timeout: float
+
+        :return: The frames completed by the bytes read.
+        :rtype: list of SerialFrame
+        """
+        frames = []
+        while True:
+            readable = select.select([self._fd], [], [], timeout)[0]
+            if not readable:
+                return frames
+
+            try:
+                data = os.read(self._fd, self.READ_SIZE)
+            except OSError as e:
+                raise IOError('Serial port %s could not be read: %s'
+                              % (self._port, e))
+            if not data:
+                return frames
+
+            arrival = time()
+            for frame in self._parser.feed(data, arrival):
+                if frame.camera_time is not None:
+                    self._aligner.update(frame.camera_time, frame.arrival)
+                frames.append(frame)
+
+            # Keep reading while bytes are waiting, so the newest frame wins.
+            timeout = 0
+
+
+    def _observe(self, detection):
+        """
+        Converts a reported ARTag to an observation.
+
+        :param detection: The ARTag.
+        :type detection: SerialDetection
+
+        :return: The observation.
+        :rtype: tagobservation.TagObservation
+        """
+        rvec = np.zeros(3)
+        if detection.quaternion is not None:
+            rvec = quaternion_to_rvec(detection.quaternion)
+
+        object_x, object_z, direction, yaw_angle = single_tag_geometry(
+                rvec, detection.tvec)
+        observation = TagObservation(object_x, object_z, direction,
+                                     self.make_decision(direction), yaw_angle,
+                                     self._frame_timestamp, self._frame_seq,
+                                     detection.marker_id)
+        self._history.append(observation)
+
+        return observation
+
+
+    def get_frame_info(self):
+        """
+        Gets the sequence number and capture time of the last frame.
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+        """
+        return self._frame_seq, self._frame_timestamp
+
+
+    def get_stats(self):
+        """
+        Gets the message counters.
+
+        :return: Dictionary containing the number of frames returned by
+                 detect() and the number of lines that could not be used.
+        :rtype: dict
+        """
+        return {'frames': self._frames, 'ignored': self._parser.get_ignored()}
+
+
+    def get_timer(self):
+        """
+        Gets the timer of the detection stages.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._timer
+
+
+    def get_history(self):
+        """
+        Gets the most recent detections.
+
+        :return: The ring of recent detections, oldest first.
+        :rtype: tagobservation.ObservationHistory
+        """
+        return self._history
+
+
+    def get_direction(self, object_x, object_z):
+        """Same as TagRecognition.get_direction()."""
+        return self._tag.get_direction(object_x, object_z)
+
+
+    def make_decision(self, direction):
+        """Same as TagRecognition.make_decision()."""
+        return self._tag.make_decision(direction)
+
+
+class SmartCameraSimulator:
+    """
+    Stands in for a smart camera on a pseudo-terminal, for testing without the
+    hardware.
+
+    A SmartCamera opened on get_port() receives the messages sent here.
+    """
+
+    def __init__(self):
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+
+
+    def get_port(self):
+        """
+        Gets the serial device to open.
+
+        :return: The pseudo-terminal's device path.
+        :rtype: str
+        """
+        return os.ttyname(self._slave)
+
+
+    def send(self, data):
+        """
+        Sends raw bytes.
+
+        :param data: The bytes.
+        :type data: bytes
+        """
+        os.write(self._master, data)
+
+
+    @staticmethod
+    def format_detection(marker_id, rvec, tvec):
+        """
+        Formats an ARTag pose as a D3 message.
+
+        :param marker_id: The ARTag's id.
+        :type marker_id: int
+
+        :param rvec: The rotation vector, as from ar.estimatePoseSingleMarkers.
+        :type rvec: numpy.ndarray
+
+        :param tvec: The translation vector (in meters).
+        :type tvec: numpy.ndarray
+
+        :return: The message, without a line end.
+        :rtype: bytes
+        """
+        x, y, z = (np.ravel(tvec) * MessageParser.MILLIMETERS).tolist()
+        quaternion = rvec_to_quaternion(rvec)
+        return ('D3 U%d %.3f %.3f %.3f 25 25 1 %.6f %.6f %.6f %.6f'
+                % ((marker_id, x, y, z) + quaternion)).encode('ascii')
+
+
+    def send_frame(self, detections=(), number=None, camera_time=None,
+                   markers=True):
+        """
+        Sends the messages of one frame.
+
+        :param detections: The (marker_id, rvec, tvec) of each ARTag in the
+                           frame.
+        :type detections: iterable of tuple
+
+        :param number: The frame number to stamp messages with, or None.
+        :type number: int
+
+        :param camera_time: The time of day (in seconds) to stamp messages
+                            with, or None.
+        :type camera_time: float
+
+        :param markers: Send MARK START and MARK STOP around the frame.
+        :type markers: bool
+        """
+        stamp = []
+        if number is not None:
+            stamp.append('%d' % number)
+        if camera_time is not None:
+            minutes, seconds = divmod(camera_time, 60)
+            hours, minutes = divmod(int(minutes), 60)
+            stamp.append('%02d:%02d:%06.3f' % (hours, minutes, seconds))
+        prefix = ('/'.join(stamp) + ' ').encode('ascii') if stamp else b''
+
+        lines = [self.format_detection(*detection) for detection in detections]
+        if markers:
+            lines = [b'MARK START'] + lines + [b'MARK STOP']
+        self.send(b''.join(prefix + line + b'\n' for line in lines))
+
+
+    def close(self):
+        """Closes the pseudo-terminal."""
+        os.close(self._master)
+        os.close(self._slave)
@@ -0,0 +1,265 @@
+"""
+stagetimer
+
+Author: Wisam Bunni
+"""
+from bisect import bisect_right
+import logging
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    # Python 2 has no monotonic clock in the standard library.
+    from time import time as clock
+
+
+class StageTimer:
+    """
+    Times the stages of a repeated cycle, such as a detection or a control
+    cycle, into histograms.
+
+    A cycle is timed by calling start(), then mark() at the end of each stage
+    and finish() at the end of the cycle. Each stage's time is the time since
+    the previous mark. The histograms are allocated up front, so recording a
+    time never allocates. When the timer is disabled, which is the default,
+    start(), mark() and finish() return immediately.
+
+    :param stages: The names of the stages.
+    :type stages: iterable of str
+
+    :param name: The name used in summary log lines.
+    :type name: str
+
+    :param enabled: Record times from the start.
+    :type enabled: bool
+
+    :param log_interval: Log a summary line every log_interval seconds from
+                         finish(). None disables the summary line.
+    :type log_interval: float
+    """
+
+    TOTAL = 'total'
+    """The stage that finish() records the whole cycle time in."""
+    MIN_TIME = 10e-6
+    """The upper edge of the first histogram bucket (in seconds)."""
+    BUCKETS_PER_DOUBLING = 4
+    """The number of histogram buckets each time the time doubles."""
+    BUCKET_COUNT = 84
+    """The number of histogram buckets, from MIN_TIME to over 10 seconds."""
+    PERCENTILES = (50, 95, 99)
+    """The percentiles reported by snapshot()."""
+
+    def __init__(self, stages, name='stages', enabled=False,
+                 log_interval=None):
+        self._name = name
+        self._stages = list(stages) + [self.TOTAL]
+        self._indexes = dict((stage, index)
+                             for index, stage in enumerate(self._stages))
+        self._edges = [self.MIN_TIME * 2 ** (float(bucket)
+                                             / self.BUCKETS_PER_DOUBLING)
+                       for bucket in range(self.BUCKET_COUNT - 1)]
+
+        self._histograms = [[0] * self.BUCKET_COUNT for _ in self._stages]
+        self._counts = [0] * len(self._stages)
+        self._totals = [0.0] * len(self._stages)
+        self._maxima = [0.0] * len(self._stages)
+
+        self._enabled = enabled
+        self._log_interval = log_interval
+        self._logger = logging.getLogger(name)
+        self._cycle_start = 0.0
+        self._last_mark = 0.0
+        self._last_log = clock()
+
+
+    def enable(self):
+        """Starts recording times."""
+        self._enabled = True
+
+
+    def disable(self):
+        """Stops recording times. Recorded times are kept."""
+        self._enabled = False
+
+
+    def is_enabled(self):
+        """
+        Checks if times are being recorded.
+
+        :return: True if the timer is enabled, False otherwise.
+        :rtype: bool
+        """
+        return self._enabled
+
+
+    def set_log_interval(self, log_interval):
+        """
+        Sets how often finish() logs a summary line.
+
+        :param log_interval: The time between summary lines (in seconds), or
+                             None to stop logging.
+        :type log_interval: float
+        """
+        self._log_interval = log_interval
+        self._last_log = clock()
+
+
+    def start(self):
+        """Starts timing a cycle."""
+        if not self._enabled:
+            return
+
+        self._cycle_start = self._last_mark = clock()
+
+
+    def mark(self, stage):
+        """
+        Ends a stage, recording the time since the last mark or start().
+
+        :param stage: The name of the stage.
+        :type stage: str
+        """
+        if not self._enabled:
+            return
+
+        now = clock()
+        self._record(self._indexes[stage], now - self._last_mark)
+        self._last_mark = now
+
+
+    def finish(self):
+        """
+        Ends a cycle, recording the time since start(), and logs a summary line
+        if one is due.
+        """
+        if not self._enabled:
+            return
+
+        now = clock()
+        self._record(self._indexes[self.TOTAL], now - self._cycle_start)
+
+        if (self._log_interval is not None
+                and now - self._last_log >= self._log_interval):
+            self._last_log = now
+            self._logger.info(self.summary())
+
+
+    def discard(self):
+        """
+        Drops the cycle started by start(), such as one that timed out before
+        its first stage. Nothing is recorded for it, and the next cycle starts
+        with start().
+        """
+        self._cycle_start = self._last_mark = 0.0
+
+
+    def record(self, stage, elapsed):
+        """
+        Records the time of a stage that was timed elsewhere.
+
+        :param stage: The name of the stage.
+        :type stage: str
+
+        :param elapsed: The stage's time (in seconds).
+        :type elapsed: float
+        """
+        if self._enabled:
+            self._record(self._indexes[stage], elapsed)
+
+
+    def _record(self, index, elapsed):
+        self._histograms[index][bisect_right(self._edges, elapsed)] += 1
+        self._counts[index] += 1
+        self._totals[index] += elapsed
+        if elapsed > self._maxima[index]:
+            self._maxima[index] = elapsed
+
+
+    def reset(self):
+        """Clears every recorded time."""
+        for index in range(len(self._stages)):
+            histogram = self._histograms[index]
+            for bucket in range(len(histogram)):
+                histogram[bucket] = 0
+            self._counts[index] = 0
+            self._totals[index] = 0.0
+            self._maxima[index] = 0.0
+
+
+    def _percentile(self, index, percentile):
+        """
+        Estimates a percentile from a histogram.
+
+        :return: The upper edge of the bucket the percentile falls in, capped
+                 at the longest recorded time (in seconds).
+        :rtype: float
+        """
+        rank = percentile / 100.0 * self._counts[index]
+        seen = 0
+        for bucket, count in enumerate(self._histograms[index]):
+            seen += count
+            if count and seen >= rank:
+                if bucket < len(self._edges):
+                    return min(self._edges[bucket], self._maxima[index])
+                break
+
+        return self._maxima[index]
+
+
+    def get_bucket_edges(self):
+        """
+        Gets the histogram bucket edges.
+
+        Bucket i holds times in [edges[i - 1], edges[i]). The first bucket
+        starts at 0 and the last one has no upper edge.
+
+        :return: The upper edges of every bucket but the last (in seconds).
+        :rtype: list
+        """
+        return list(self._edges)
+
+
+    def snapshot(self):
+        """
+        Gets a copy of the recorded times.
+
+        :return: Dictionary of stage name to a dictionary with the count, mean,
+                 max, p50, p95 and p99 (in seconds) and the histogram counts.
+                 Stages with no recorded times are left out.
+        :rtype: dict
+        """
+        stages = {}
+        for index, stage in enumerate(self._stages):
+            count = self._counts[index]
+            if not count:
+                continue
+            stats = {
+                    'count': count,
+                    'mean': self._totals[index] / count,
+                    'max': self._maxima[index],
+                    'histogram': list(self._histograms[index])
+            }
+            for percentile in self.PERCENTILES:
+                stats['p%d' % percentile] = self._percentile(index,
+                                                             percentile)
+            stages[stage] = stats
+
+        return stages
+
+
+    def summary(self):
+        """
+        Summarizes the recorded times in one line.
+
+        :return: The p50/p99 of every stage (in milliseconds).
+        :rtype: str
+        """
+        snapshot = self.snapshot()
+        parts = ['%s p50/p99 ms:' % self._name]
+        for stage in self._stages:
+            stats = snapshot.get(stage)
+            if stats:
+                parts.append('%s=%.2f/%.2f' % (stage, stats['p50'] * 1e3,
+                                               stats['p99'] * 1e3))
+
+        return ' '.join(parts)
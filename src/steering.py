@@ -0,0 +1,121 @@
+"""
+steering
+
+Author: Wisam Bunni
+"""
+import math
+
+
+class PurePursuitSteering:
+    """
+    Steers towards the leader's ARTag along a circular arc (pure pursuit).
+
+    The arc starts at the rear axle, tangent to the car, and passes through the
+    ARTag. Its curvature is 2 * x / d^2, where x is the ARTag's offset to the
+    right of the car and d its distance from the rear axle, and the wheel angle
+    that drives along it is atan(wheelbase * curvature). The angle is
+    continuous in the ARTag's position, limited to max_steer either side of
+    center and changed by at most max_rate per second.
+
+    Wheel angles use the front wheels' scale: center_angle is straight, smaller
+    angles turn left and larger angles turn right.
+
+    The ARTag's yaw is not used, since TagRecognition reports its magnitude
+    but not its sign.
+
+    :param wheelbase: The distance between the axles (in meters).
+    :type wheelbase: float
+
+    :param camera_offset: The distance from the rear axle forward to the
+                          camera (in meters).
+    :type camera_offset: float
+
+    :param center_angle: The wheel angle that drives straight.
+    :type center_angle: float
+
+    :param max_steer: The largest wheel angle either side of center_angle.
+    :type max_steer: float
+
+    :param max_rate: The largest change in wheel angle per second (in
+                     degrees).
+    :type max_rate: float
+
+    :param stale_time: The time without a measurement (in seconds) after which
+                       the rate limit starts over from the new angle.
+    :type stale_time: float
+    """
+
+    def __init__(self, wheelbase=0.14, camera_offset=0.1, center_angle=90,
+                 max_steer=45, max_rate=360.0, stale_time=0.5):
+        self._wheelbase = wheelbase
+        self._camera_offset = camera_offset
+        self._center_angle = center_angle
+        self._max_steer = max_steer
+        self._max_rate = max_rate
+        self._stale_time = stale_time
+        self.reset()
+
+
+    def reset(self):
+        """Forgets the last wheel angle, so the next one is not rate limited."""
+        self._angle = None
+        self._last_time = None
+
+
+    def get_target_angle(self, x, z):
+        """
+        Computes the wheel angle that drives through the ARTag, without the
+        rate limit.
+
+        :param x: The ARTag's distance to the right of the camera (in meters).
+        :type x: float
+
+        :param z: The ARTag's distance in front of the camera (in meters).
+        :type z: float
+
+        :return: The wheel angle, within max_steer of center_angle.
+        :rtype: float
+        """
+        forward = z + self._camera_offset
+        distance_squared = x * x + forward * forward
+        if distance_squared <= 0:
+            return float(self._center_angle)
+
+        curvature = 2 * x / distance_squared
+        steer = math.degrees(math.atan(self._wheelbase * curvature))
+        steer = min(max(steer, -self._max_steer), self._max_steer)
+
+        return self._center_angle + steer
+
+
+    def update(self, x, z, timestamp):
+        """
+        Computes the wheel angle for a measured ARTag position.
+
+        :param x: The ARTag's distance to the right of the camera (in meters).
+        :type x: float
+
+        :param z: The ARTag's distance in front of the camera (in meters).
+        :type z: float
+
+        :param timestamp: When the position was measured (in seconds).
+        :type timestamp: float
+
+        :return: The wheel angle.
+        :rtype: float
+        """
+        target = self.get_target_angle(x, z)
+
+        if (self._angle is None
+                or timestamp - self._last_time > self._stale_time):
+            self._angle = target
+        elif timestamp > self._last_time:
+            step = self._max_rate * (timestamp - self._last_time)
+            self._angle = min(max(target, self._angle - step),
+                              self._angle + step)
+        else:
+            # Not newer than the last measurement.
+            return self._angle
+        self._last_time = timestamp
+
+        return self._angle
@@ -0,0 +1,434 @@
+"""
+tagdataset
+
+Author: Wisam Bunni
+"""
+import argparse
+import cv2
+import cv2.aruco as ar
+import math
+import numpy as np
+from timeit import default_timer
+
+import calibration
+from tagrec import TagRecognition, single_tag_geometry
+
+
+class TagRenderer:
+    """
+    Renders an ARTag into synthetic grayscale frames at a known pose.
+
+    The ARTag is projected with the camera model of the calibration file, so
+    its corners land where the real camera would see them. The inside of the
+    ARTag is mapped with a homography and is not distorted. Frames are rendered
+    at SUPERSAMPLING times the resolution and scaled down to smooth the edges.
+
+    :param resolution: One of TagRecognition.RESOLUTIONS.
+    :type resolution: int
+
+    :param marker_length: The square length of the ARTag in meters.
+    :type marker_length: float
+
+    :param marker_id: The id of the ARTag in the DICT_6X6_250 dictionary.
+    :type marker_id: int
+
+    :param calibration_file: The camera calibration file. A missing file gives
+                             an uncalibrated camera, like TagRecognition.
+    :type calibration_file: str
+
+    :raise ValueError: Thrown if resolution is not supported.
+    """
+
+    SUPERSAMPLING = 2
+    """The rendering scale relative to the frame size."""
+    MARKER_PIXELS = 240
+    """The side length of the ARTag texture, including its white margin."""
+    MARGIN = 1.0 / 6
+    """The white margin around the ARTag relative to its length."""
+
+    def __init__(self, resolution, marker_length=0.025, marker_id=2,
+                 calibration_file='calibration.xml'):
+        if resolution not in TagRecognition.RESOLUTIONS:
+            raise ValueError('Unsupported resolution %s' % resolution)
+
+        self._resolution = resolution
+        self._size = tuple(TagRecognition.RESOLUTIONS[resolution])
+        self._marker_length = marker_length
+        self._marker_id = marker_id
+
+        width, height = self._size
+        camera = calibration.get_calibration(calibration_file)
+        self._camera_matrix = camera.get_camera_matrix(width, height)
+        self._render_matrix = camera.get_camera_matrix(
+                width * self.SUPERSAMPLING, height * self.SUPERSAMPLING)
+        self._dist_coeffs = camera.dist_coeffs
+
+        # The ARTag with a white margin, as the marker is printed.
+        margin = int(round(self.MARKER_PIXELS * self.MARGIN
+                           / (1 + 2 * self.MARGIN)))
+        marker = ar.drawMarker(ar.Dictionary_get(ar.DICT_6X6_250), marker_id,
+                               self.MARKER_PIXELS - 2 * margin)
+        self._texture = cv2.copyMakeBorder(marker, margin, margin, margin,
+                                           margin, cv2.BORDER_CONSTANT,
+                                           value=255)
+        side = self._texture.shape[0]
+        self._texture_corners = np.float32([[0, 0], [side, 0], [side, side],
+                                            [0, side]])
+
+        # The corners of the printed square in the ARTag's frame, in the
+        # order ar.detectMarkers reports them.
+        half = marker_length * side / (2.0 * (side - 2 * margin))
+        self._object_corners = np.float64([[-half, half, 0], [half, half, 0],
+                                           [half, -half, 0], [-half, -half, 0]])
+
+
+    def get_camera_matrix(self):
+        """
+        Gets the camera matrix the frames are rendered with.
+
+        :return: The 3x3 camera matrix at the frame size.
+        :rtype: numpy.ndarray
+        """
+        return self._camera_matrix
+
+
+    def get_pose(self, x, y, z, yaw):
+        """
+        Gets the rotation and translation vectors of an ARTag facing the
+        camera.
+
+        :param x: The ARTag's distance to the right of the camera (in meters).
+        :type x: float
+
+        :param y: The ARTag's distance below the camera (in meters).
+        :type y: float
+
+        :param z: The ARTag's distance in front of the camera (in meters).
+        :type z: float
+
+        :param yaw: The ARTag's rotation about its vertical axis (in degrees).
+        :type yaw: float
+
+        :return: The rotation vector and translation vector, in the format of
+                 one marker from ar.estimatePoseSingleMarkers.
+        :rtype: numpy.ndarray, numpy.ndarray
+        """
+        angle = math.radians(yaw)
+        # Turn the ARTag to face the camera, then about its vertical axis.
+        facing = np.diag([1.0, -1.0, -1.0])
+        turn = np.array([[math.cos(angle), 0, math.sin(angle)],
+                         [0, 1, 0],
+                         [-math.sin(angle), 0, math.cos(angle)]])
+        rvec = cv2.Rodrigues(facing.dot(turn))[0].reshape(1, 3)
+        tvec = np.array([[x, y, z]], dtype=np.float64)
+
+        return rvec, tvec
+
+
+    def project(self, rvec, tvec, camera_matrix=None):
+        """
+        Projects the corners of the ARTag's white margin into a frame.
+
+        :return: The four corners (in pixels), or None if the ARTag is behind
+                 the camera.
+        :rtype: numpy.ndarray
+        """
+        if camera_matrix is None:
+            camera_matrix = self._camera_matrix
+
+        rotation = cv2.Rodrigues(rvec.reshape(3))[0]
+        depths = self._object_corners.dot(rotation.T)[:, 2] + tvec.reshape(3)[2]
+        if (depths <= 0).any():
+            return None
+
+        points = cv2.projectPoints(self._object_corners, rvec.reshape(3),
+                                   tvec.reshape(3), camera_matrix,
+                                   self._dist_coeffs)[0]
+        return points.reshape(4, 2).astype(np.float32)
+
+
+    def is_visible(self, rvec, tvec):
+        """
+        Checks if the whole ARTag, including its margin, is inside the frame.
+
+        :return: True if the ARTag is fully visible, False otherwise.
+        :rtype: bool
+        """
+        corners = self.project(rvec, tvec)
+        if corners is None:
+            return False
+
+        width, height = self._size
+        return bool((corners[:, 0] >= 0).all() and (corners[:, 0] < width).all()
+                    and (corners[:, 1] >= 0).all()
+                    and (corners[:, 1] < height).all())
+
+
+    def render(self, rvec, tvec, background=128, gain=1.0, gradient=0.0,
+               blur=0.0, noise=0.0, random=None):
+        """
+        Renders one frame.
+
+        :param rvec: The ARTag's rotation vector.
+        :type rvec: numpy.ndarray
+
+        :param tvec: The ARTag's translation vector (in meters).
+        :type tvec: numpy.ndarray
+
+        :param background: The gray level behind the ARTag.
+        :type background: int
+
+        :param gain: The brightness of the lighting. 1 keeps the ARTag's white
+                     at 255.
+        :type gain: float
+
+        :param gradient: The change in lighting from the left edge of the frame
+                         to the right edge, relative to gain.
+        :type gradient: float
+
+        :param blur: The standard deviation of the Gaussian blur (in pixels).
+        :type blur: float
+
+        :param noise: The standard deviation of the Gaussian sensor noise (in
+                      gray levels).
+        :type noise: float
+
+        :param random: The random number generator for the noise.
+        :type random: numpy.random.RandomState
+
+        :return: The grayscale frame.
+        :rtype: numpy.ndarray
+        """
+        width, height = self._size
+        scaled_size = (width * self.SUPERSAMPLING, height * self.SUPERSAMPLING)
+
+        frame = np.full((scaled_size[1], scaled_size[0]), background,
+                        dtype=np.uint8)
+        corners = self.project(rvec, tvec, self._render_matrix)
+        if corners is not None:
+            homography = cv2.getPerspectiveTransform(self._texture_corners,
+                                                     corners)
+            cv2.warpPerspective(self._texture, homography, scaled_size,
+                                dst=frame, flags=cv2.INTER_LINEAR,
+                                borderMode=cv2.BORDER_TRANSPARENT)
+        frame = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+
+        frame = frame.astype(np.float32)
+        if gain != 1 or gradient:
+            lighting = gain * (1 + gradient * (np.arange(width, dtype=np.float32)
+                                               / width - 0.5))
+            frame *= lighting
+        if blur > 0:
+            frame = cv2.GaussianBlur(frame, (0, 0), blur)
+        if noise > 0:
+            if random is None:
+                random = np.random
+            frame += random.normal(0, noise, frame.shape).astype(np.float32)
+
+        return np.clip(np.rint(frame), 0, 255).astype(np.uint8)
+
+
+def generate_dataset(path, resolution, count, seed=None, marker_length=0.025,
+                     marker_id=2, distance=(0.05, 0.6), max_yaw=60,
+                     max_blur=1.5, max_noise=8.0, gain=(0.5, 1.1),
+                     max_gradient=0.5, calibration_file='calibration.xml'):
+    """
+    Writes a dataset of synthetic frames with random poses and conditions.
+
+    Every frame has exactly one fully visible ARTag. The frames and their
+    labels are written to a compressed .npz file.
+
+    :param path: The dataset file.
+    :type path: str
+
+    :param resolution: One of TagRecognition.RESOLUTIONS.
+    :type resolution: int
+
+    :param count: The number of frames.
+    :type count: int
+
+    :param seed: The random seed. The same seed gives the same dataset.
+    :type seed: int
+
+    :param marker_length: The square length of the ARTag in meters.
+    :type marker_length: float
+
+    :param marker_id: The id of the ARTag in the DICT_6X6_250 dictionary.
+    :type marker_id: int
+
+    :param distance: The (nearest, farthest) z of the ARTag (in meters).
+    :type distance: tuple
+
+    :param max_yaw: The largest yaw of the ARTag (in degrees).
+    :type max_yaw: float
+
+    :param max_blur: The largest blur standard deviation (in pixels).
+    :type max_blur: float
+
+    :param max_noise: The largest noise standard deviation (in gray levels).
+    :type max_noise: float
+
+    :param gain: The (darkest, brightest) lighting gain.
+    :type gain: tuple
+
+    :param max_gradient: The largest lighting gradient across the frame.
+    :type max_gradient: float
+
+    :param calibration_file: The camera calibration file.
+    :type calibration_file: str
+
+    :return: The number of frames written.
+    :rtype: int
+    """
+    renderer = TagRenderer(resolution, marker_length, marker_id,
+                           calibration_file)
+    random = np.random.RandomState(seed)
+    width, height = TagRecognition.RESOLUTIONS[resolution]
+    camera_matrix = renderer.get_camera_matrix()
+    # The half field of view as a fraction of the distance.
+    half_width = width / (2.0 * camera_matrix[0][0])
+    half_height = height / (2.0 * camera_matrix[1][1])
+
+    frames = np.empty((count, height, width), dtype=np.uint8)
+    rvecs = np.empty((count, 3))
+    tvecs = np.empty((count, 3))
+    conditions = np.empty((count, 4), dtype=np.float32)
+
+    index = 0
+    while index < count:
+        z = random.uniform(*distance)
+        rvec, tvec = renderer.get_pose(
+                random.uniform(-1, 1) * half_width * z,
+                random.uniform(-1, 1) * half_height * z, z,
+                random.uniform(-max_yaw, max_yaw))
+        if not renderer.is_visible(rvec, tvec):
+            continue
+
+        condition = (random.uniform(*gain),
+                     random.uniform(-max_gradient, max_gradient),
+                     random.uniform(0, max_blur), random.uniform(0, max_noise))
+        frames[index] = renderer.render(rvec, tvec,
+                                        background=random.randint(0, 256),
+                                        gain=condition[0],
+                                        gradient=condition[1],
+                                        blur=condition[2],
+                                        noise=condition[3], random=random)
+        rvecs[index] = rvec
+        tvecs[index] = tvec
+        conditions[index] = condition
+        index += 1
+
+    labels = [single_tag_geometry(rvec, tvec)
+              for rvec, tvec in zip(rvecs, tvecs)]
+    object_x, object_z, direction, yaw = (np.array(values)
+                                          for values in zip(*labels))
+
+    np.savez_compressed(path, frames=frames, x=object_x, z=object_z,
+                        direction=direction, yaw=yaw, rvecs=rvecs,
+                        tvecs=tvecs, conditions=conditions,
+                        resolution=resolution, marker_length=marker_length,
+                        marker_id=marker_id, camera_matrix=camera_matrix)
+    return count
+
+
+def load_dataset(path):
+    """
+    Loads a dataset written by generate_dataset().
+
+    :param path: The dataset file.
+    :type path: str
+
+    :return: Dictionary of the frames, labels (x, z, direction, yaw, rvecs,
+             tvecs), conditions (gain, gradient, blur and noise per frame),
+             resolution, marker_length, marker_id and camera_matrix.
+    :rtype: dict
+    """
+    dataset = np.load(path)
+    try:
+        return dict((name, dataset[name]) for name in dataset.files)
+    finally:
+        dataset.close()
+
+
+def evaluate_dataset(path, **tag_args):
+    """
+    Measures detection recall, pose error and time per frame on a dataset.
+
+    :param path: The dataset file.
+    :type path: str
+
+    :param tag_args: Keyword arguments for TagRecognition. The resolution and
+                     marker length default to the dataset's.
+
+    :return: Dictionary of the frame count, recall, mean absolute x, z and yaw
+             errors of the detected ARTags, and mean detection time (in
+             seconds).
+    :rtype: dict
+    """
+    dataset = load_dataset(path)
+    tag_args.setdefault('resolution', int(dataset['resolution']))
+    tag_args.setdefault('marker_length', float(dataset['marker_length']))
+    tag = TagRecognition(**tag_args)
+
+    errors = []
+    elapsed = 0.0
+    for index, frame in enumerate(dataset['frames']):
+        start = default_timer()
+        tag_data = tag.detect_frame(frame)
+        elapsed += default_timer() - start
+        if tag_data:
+            errors.append((abs(tag_data.x - dataset['x'][index]),
+                           abs(tag_data.z - dataset['z'][index]),
+                           abs(tag_data.yaw - dataset['yaw'][index])))
+
+    count = len(dataset['frames'])
+    results = {
+            'frames': count,
+            'recall': len(errors) / float(count) if count else 0.0,
+            'x_error': None,
+            'z_error': None,
+            'yaw_error': None,
+            'time': elapsed / count if count else 0.0
+    }
+    if errors:
+        x_error, z_error, yaw_error = np.mean(errors, axis=0)
+        results.update(x_error=float(x_error), z_error=float(z_error),
+                       yaw_error=float(yaw_error))
+
+    return results
+
+
+def main():
+    """Generates a dataset at each resolution and optionally evaluates it."""
+    parser = argparse.ArgumentParser(
+            description='Generate synthetic pose-labeled ARTag datasets.')
+    parser.add_argument('-n', '--count', type=int, default=1000,
+                        help='frames per resolution')
+    parser.add_argument('-r', '--resolution', type=int, nargs='+',
+                        default=[90], choices=sorted(TagRecognition.RESOLUTIONS))
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-m', '--marker-length', type=float, default=0.025,
+                        help='ARTag length in meters')
+    parser.add_argument('-o', '--output', default='tags',
+                        help='dataset file prefix')
+    parser.add_argument('-e', '--evaluate', action='store_true',
+                        help='measure TagRecognition on each dataset')
+    args = parser.parse_args()
+
+    for resolution in args.resolution:
+        path = '%s_%dp.npz' % (args.output, resolution)
+        generate_dataset(path, resolution, args.count, seed=args.seed,
+                         marker_length=args.marker_length)
+        print('Wrote %d frames to %s' % (args.count, path))
+
+        if args.evaluate:
+            results = evaluate_dataset(path)
+            print('%dp: recall %.3f, x error %s m, z error %s m, '
+                  'yaw error %s deg, %.2f ms per frame' % (
+                      resolution, results['recall'], results['x_error'],
+                      results['z_error'], results['yaw_error'],
+                      results['time'] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+tagobservation
+
+Author: Wisam Bunni
+"""
+from collections import namedtuple
+
+_TagObservationBase = namedtuple('TagObservation',
+        ['x', 'z', 'direction', 'decision', 'yaw', 'timestamp', 'seq',
+         'marker_id', 'predicted'])
+
+
+class TagObservation(_TagObservationBase):
+    """
+    One ARTag detection. Immutable, so it can be kept and shared freely.
+
+    Fields can also be read by name, like the dictionary detect() used to
+    return: observation['z'] is observation.z.
+
+    :param x: The ARTag's distance to the right of the camera (in meters).
+    :type x: float
+
+    :param z: The ARTag's distance in front of the camera (in meters).
+    :type z: float
+
+    :param direction: The ARTag's direction from TagRecognition.get_direction().
+    :type direction: float
+
+    :param decision: Which way the ARTag is turning. -1 means left, 0 means
+                     straight, and 1 means right.
+    :type decision: int
+
+    :param yaw: The ARTag's yaw (in degrees).
+    :type yaw: float
+
+    :param timestamp: The capture time of the frame the ARTag was seen in.
+    :type timestamp: float
+
+    :param seq: The sequence number of the frame the ARTag was seen in.
+    :type seq: int
+
+    :param marker_id: The ARTag's id in its dictionary, or None if unknown.
+    :type marker_id: int
+
+    :param predicted: Whether the ARTag was predicted instead of detected.
+    :type predicted: bool
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, x=0, z=0, direction=0, decision=0, yaw=0, timestamp=0,
+                seq=0, marker_id=None, predicted=False):
+        return _TagObservationBase.__new__(cls, x, z, direction, decision, yaw,
+                                           timestamp, seq, marker_id,
+                                           predicted)
+
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+
+        return _TagObservationBase.__getitem__(self, key)
+
+
+class ObservationHistory:
+    """
+    Ring of the most recent observations.
+
+    The ring's slots are allocated up front, and the oldest observation is
+    overwritten once the ring is full.
+
+    :param capacity: The number of observations kept.
+    :type capacity: int
+    """
+
+    def __init__(self, capacity):
+        self._slots = [None] * max(int(capacity), 1)
+        self._next = 0
+        self._count = 0
+
+
+    def append(self, observation):
+        """
+        Adds an observation, dropping the oldest one if the ring is full.
+
+        :param observation: The observation.
+        :type observation: TagObservation
+        """
+        self._slots[self._next] = observation
+        self._next = (self._next + 1) % len(self._slots)
+        self._count = min(self._count + 1, len(self._slots))
+
+
+    def latest(self):
+        """
+        Gets the most recent observation.
+
+        :return: The observation, or None if the history is empty.
+        :rtype: TagObservation
+        """
+        if not self._count:
+            return None
+
+        return self._slots[self._next - 1]
+
+
+    def clear(self):
+        """Removes every observation."""
+        for index in range(len(self._slots)):
+            self._slots[index] = None
+        self._next = 0
+        self._count = 0
+
+
+    def __len__(self):
+        return self._count
+
+
+    def __iter__(self):
+        """Iterates over the observations from the oldest to the newest."""
+        start = self._next - self._count
+        for index in range(start, self._next):
+            yield self._slots[index % len(self._slots)]
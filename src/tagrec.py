@@ -5,9 +5,21 @@ Author: Wisam Bunni
 """
 import cv2
 import cv2.aruco as ar
+import math
 import numpy as np
 import sys
-import os
+from time import time
+
+from framegrabber import FrameGrabber
+from framesource import DeviceSource
+from stagetimer import StageTimer
+from tagobservation import ObservationHistory, TagObservation
+import calibration
+import detectorprofile
+import imagecache
+
+SMALL_ANGLE = 1e-8
+"""Rotations smaller than this (in radians) are treated as no rotation."""
 
 
 class TagRecognition():
@@ -34,6 +46,71 @@ class TagRecognition():
 
     :param brightness: The brightness value in (-127, 127).
     :type brightness: int
+
+    :param threaded: Capture frames on a background thread. detect() then
+                     processes the freshest captured frame instead of waiting
+                     for the camera. Each frame is processed once: detect()
+                     returns None if no new frame arrives within
+                     FRAME_TIMEOUT. Disabled by default.
+    :type threaded: bool
+
+    :param tracking: Search a padded region around the last detected ARTag
+                     before searching the whole frame. Disabled by default.
+    :type tracking: bool
+
+    :param roi_padding: The padding added to each side of the tracked region,
+                        as a fraction of the ARTag's size in pixels.
+    :type roi_padding: float
+
+    :param search_rows: The (top, bottom) band of rows, as fractions of the
+                        frame height, that an ARTag can appear in. Rows outside
+                        of the band are never searched. Searches the whole
+                        frame by default.
+    :type search_rows: tuple
+
+    :param image_cache: The cache of decoded images used by detect() when it
+                        reads from img_src. Uses a cache shared by every
+                        TagRecognition object by default.
+    :type image_cache: imagecache.ImageCache
+
+    :param source: Where detect() reads frames from when no img_src is given.
+                   Defaults to camera 0. The source is opened on the first
+                   detection, not at construction.
+    :type source: framesource.FrameSource
+
+    :param detect_interval: Run a full ARTag detection every detect_interval
+                            frames and track the corners of the last detected
+                            ARTag with optical flow in between. Tracking falls
+                            back to a full detection as soon as it becomes
+                            unreliable. 1 detects in every frame (default).
+    :type detect_interval: int
+
+    :param resolution_scheduler: Switches the resolution at runtime based on
+                                 the ARTag's size in pixels, its distance and
+                                 the time taken to process each frame. The
+                                 resolution is fixed by default.
+    :type resolution_scheduler: resolutionscheduler.ResolutionScheduler
+
+    :param timing: Time each stage of a detection from the start. Timing can
+                   also be switched on and off through get_timer(). Disabled by
+                   default.
+    :type timing: bool
+
+    :param detector_profile: ARTag detector parameters, as a dictionary or the
+                             path to a profile saved by detectortuner. Uses
+                             OpenCV's defaults by default.
+    :type detector_profile: dict or str
+
+    :param history_size: The number of recent detections kept by
+                         get_history().
+    :type history_size: int
+
+    :param recorder: Records every frame detect() reads from the source, with
+                     its capture time and sequence number, so the frames can be
+                     replayed with framerecording.RecordingSource. Frames read
+                     from img_src are not recorded. The resolution must not
+                     change while recording. Nothing is recorded by default.
+    :type recorder: framerecording.FrameRecorder
     """
 
     RESOLUTIONS = {
@@ -48,11 +125,36 @@ class TagRecognition():
     }
     """Pre-set resolutions."""
 
-    _cap = cv2.VideoCapture(0)
+    TIMED_STAGES = ('capture', 'gray', 'contrast', 'markers', 'pose', 'yaw')
+    """The stages of a detection timed by the stage timer."""
+    MIN_ROI_PADDING = 8
+    """The minimum padding around the tracked region (in pixels)."""
+    FLOW_WINDOW = (15, 15)
+    """The optical flow search window size at each pyramid level."""
+    FLOW_LEVELS = 2
+    """The number of optical flow pyramid levels above the full picture."""
+    FLOW_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+    """The optical flow termination criteria."""
+    MAX_FLOW_ERROR = 1.0
+    """
+    The largest distance (in pixels) between a corner and the same corner
+    tracked forward and back again.
+    """
+    MAX_FLOW_SCALE_CHANGE = 1.5
+    """The largest change in ARTag area between two tracked frames."""
+    FRAME_TIMEOUT = 0.1
+    """
+    The longest time detect() waits for a new frame from the background
+    capture thread (in seconds).
+    """
 
 
     def __init__(self, resolution=90, dead_zone=1.45, marker_length=0.06,
-            contrast=1, brightness=0):
+            contrast=1, brightness=0, threaded=False, tracking=False,
+            roi_padding=0.5, search_rows=None, image_cache=None,
+            source=None, detect_interval=1, resolution_scheduler=None,
+            timing=False, detector_profile=None, history_size=32,
+            recorder=None):
         self._RESOLUTION = resolution if resolution in self.RESOLUTIONS else 90
         """The resolution of the camera feed."""
         self._MARKER_LENGTH = np.clip(marker_length, 0.01905, 0.0381)
@@ -61,6 +163,8 @@ class TagRecognition():
         """The camera feed contrast multiplier."""
         self._BRIGHTNESS = np.clip(brightness, -127, 127)
         """The camera feed brightness."""
+        self._LUT = self._make_lut(self._CONTRAST, self._BRIGHTNESS)
+        """The contrast and brightness lookup table. None if it is a no-op."""
 
         # Handle a special case where the user requests to have no dead zones.
         if dead_zone <= 0:
@@ -70,43 +174,231 @@ class TagRecognition():
             self._DEADZONE_RIGHT = abs(dead_zone)
             self._DEADZONE_LEFT = -self._DEADZONE_RIGHT
 
-        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH,
-                self.RESOLUTIONS[self._RESOLUTION][0])
-        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT,
-                self.RESOLUTIONS[self._RESOLUTION][1])
+        self._source = source if source is not None else DeviceSource(0)
+        self._source.set_size(self.RESOLUTIONS[self._RESOLUTION][0],
+                              self.RESOLUTIONS[self._RESOLUTION][1])
 
         self._corners = np.array([[0,0]] * 4)
 
+        self._TRACKING = tracking
+        """Whether to search around the last detected ARTag first."""
+        self._ROI_PADDING = max(roi_padding, 0)
+        """The padding of the tracked region relative to the ARTag size."""
+        if search_rows:
+            top, bottom = np.clip(search_rows, 0, 1)
+            self._SEARCH_ROWS = (min(top, bottom), max(top, bottom))
+        else:
+            self._SEARCH_ROWS = (0, 1)
+        """The band of rows (as fractions) that an ARTag can appear in."""
+        self._roi = None
+
+        self._DETECT_INTERVAL = max(int(detect_interval), 1)
+        """The number of frames between full ARTag detections."""
+        self._flow_corners = None
+        self._frames_since_detection = 0
+
+        self._scheduler = resolution_scheduler
+        self._timer = StageTimer(self.TIMED_STAGES, name='tagrec',
+                                 enabled=timing)
+        self._last_z = None
+
+        self._image_cache = (image_cache if image_cache is not None
+                             else imagecache.DEFAULT_CACHE)
+
         self._AR_DICT = ar.Dictionary_get(ar.DICT_6X6_250)
-        self._PARAMETERS = ar.DetectorParameters_create()
+        if isinstance(detector_profile, dict) or detector_profile is None:
+            self._PARAMETERS = detectorprofile.make_parameters(detector_profile)
+        else:
+            self._PARAMETERS = detectorprofile.make_parameters(
+                    detectorprofile.load_profile(detector_profile))
 
         self._CALIBRATION_FILE = 'calibration.xml'
-        self._CALIBRATION_PARAMS = cv2.FileStorage(self._CALIBRATION_FILE,
-            cv2.FILE_STORAGE_READ)
+        self._CALIBRATION = calibration.get_calibration(self._CALIBRATION_FILE,
+                self.RESOLUTIONS.values())
+        """The camera calibration, shared with other TagRecognition objects."""
+
+        self._DIST_COEFFS = self._CALIBRATION.dist_coeffs
+
+        self._ret = False
+        self._frame = None
+
+        # Buffers reused across frames to avoid per-frame allocations.
+        self._capture_buffer = None
+        self._buffers = {}
+
+        self._THREADED = threaded
+        """Whether frames are captured on a background thread."""
+        self._frame_seq = 0
+        self._frame_timestamp = 0
+        self._grabber = None
+        self._grabbed_seq = 0
+
+        # Assume frames come in at the set resolution until the first frame
+        # says otherwise.
+        self._set_frame_size(self.RESOLUTIONS[self._RESOLUTION][0],
+                             self.RESOLUTIONS[self._RESOLUTION][1])
 
-        self._DIST_COEFFS = self._CALIBRATION_PARAMS.getNode('distCoeffs').mat()
+        self._marker_id = None
+        self._history = ObservationHistory(history_size)
+        self._recorder = recorder
 
-        self._ret, self._frame = self._cap.read()
-        self._size = self._frame.shape
 
-        self._FOCAL_LENGTH = self._size[1]
-        self._CENTER = (self._size[1]/2, self._size[0]/2)
+    def _set_frame_size(self, width, height):
+        """
+        Sets up the camera matrix for a frame size.
+
+        :param width: The frame width in pixels.
+        :type width: int
+
+        :param height: The frame height in pixels.
+        :type height: int
+        """
+        self._size = (height, width)
 
         # Set up a camera matrix. This will allow to estimate the pose of the
         # ARTag.
-        self._CAMERA_MATRIX = np.array(
-            [[self._FOCAL_LENGTH, 0, self._CENTER[0]],
-             [0, self._FOCAL_LENGTH, self._CENTER[1]],
-             [0, 0, 1]], dtype='double'
-        )
+        self._CAMERA_MATRIX = self._CALIBRATION.get_camera_matrix(width, height)
+
+        self._FOCAL_LENGTH = self._CAMERA_MATRIX[0][0]
+        self._CENTER = (self._CAMERA_MATRIX[0][2], self._CAMERA_MATRIX[1][2])
+
+
+    @staticmethod
+    def _make_lut(contrast, brightness):
+        """
+        Builds a lookup table that applies contrast and brightness to a pixel.
+
+        Gives the same result as cv2.addWeighted(picture, contrast, picture, 0,
+        brightness) in a single pass over the picture.
+
+        :param contrast: The contrast multiplier.
+        :type contrast: float
+
+        :param brightness: The brightness value.
+        :type brightness: int
+
+        :return: A 256 entry lookup table, or None if the table would not
+                 change the picture.
+        :rtype: numpy.ndarray
+        """
+        if contrast == 1 and brightness == 0:
+            return None
+
+        # Match OpenCV's single precision weights and rounding.
+        values = np.arange(256) * np.float32(contrast) + np.float32(brightness)
+        values = np.rint(values.astype(np.float32))
+        return np.clip(values, 0, 255).astype(np.uint8)
+
+
+    def _get_buffer(self, name, shape):
+        """
+        Gets a reusable picture buffer, reallocating it if the shape changed.
+
+        :param name: The name of the buffer.
+        :type name: str
+
+        :param shape: The shape of the picture.
+        :type shape: tuple
+
+        :return: The buffer.
+        :rtype: numpy.ndarray
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buffer
+
+        return buffer
+
+
+    def get_timer(self):
+        """
+        Gets the timer of the detection stages.
+
+        :return: The stage timer.
+        :rtype: stagetimer.StageTimer
+        """
+        return self._timer
+
+
+    def get_history(self):
+        """
+        Gets the most recent detections.
 
-        self._tag_data = {
-                'x': 0,
-                'z': 0,
-                'direction': 0,
-                'decision': 0,
-                'yaw': 0
-        }
+        :return: The ring of recent detections, oldest first.
+        :rtype: tagobservation.ObservationHistory
+        """
+        return self._history
+
+
+    def get_frame_info(self):
+        """
+        Gets the sequence number and capture time of the last frame.
+
+        Frames from a source that records their sequence number and capture
+        time, such as a framerecording.RecordingSource, keep them. Other frames
+        read by the background capture thread are numbered and stamped by it,
+        and the rest are numbered in the order they are processed and stamped
+        when they are read.
+
+        :return: The frame sequence number and capture timestamp.
+        :rtype: int, float
+        """
+        return self._frame_seq, self._frame_timestamp
+
+
+    def release(self):
+        """
+        Stops the background capture thread and closes the frame source.
+
+        The source is opened again by the next detection.
+        """
+        if self._grabber:
+            self._grabber.stop()
+            self._grabber = None
+        self._source.release()
+
+
+    def get_resolution(self):
+        """
+        Gets the resolution frames are captured and processed at.
+
+        :return: The resolution.
+        :rtype: int
+        """
+        return self._RESOLUTION
+
+
+    def set_resolution(self, resolution):
+        """
+        Changes the resolution frames are captured and processed at.
+
+        The camera matrix is rescaled to the new resolution. Tracking state
+        from the old resolution is dropped, so the next frame gets a full
+        detection.
+
+        :param resolution: One of RESOLUTIONS. Unknown resolutions are
+                           ignored.
+        :type resolution: int
+        """
+        if resolution not in self.RESOLUTIONS or resolution == self._RESOLUTION:
+            return
+
+        self._RESOLUTION = resolution
+        width, height = self.RESOLUTIONS[resolution]
+
+        # The capture thread must not read while the camera is reconfigured.
+        # It is restarted by the next detection.
+        if self._grabber:
+            self._grabber.stop()
+            self._grabber = None
+        self._source.set_size(width, height)
+        self._capture_buffer = None
+
+        self._set_frame_size(width, height)
+        self._roi = None
+        self._flow_corners = None
+        self._frames_since_detection = 0
 
 
     def get_direction(self, object_x, object_z):
@@ -151,6 +443,159 @@ class TagRecognition():
         return decision
 
 
+    def _update_roi(self, corners, width, height, top, bottom):
+        """
+        Updates the region to search first in the next frame.
+
+        :param corners: The corners of the detected ARTag in frame coordinates.
+        :type corners: numpy.ndarray
+
+        :param width: The frame width.
+        :type width: int
+
+        :param height: The frame height.
+        :type height: int
+
+        :param top: The first row that can be searched.
+        :type top: int
+
+        :param bottom: The last row (exclusive) that can be searched.
+        :type bottom: int
+        """
+        points = corners.reshape(-1, 2)
+        x_min, y_min = points.min(axis=0)
+        x_max, y_max = points.max(axis=0)
+
+        padding = max(self._ROI_PADDING * max(x_max - x_min, y_max - y_min),
+                      self.MIN_ROI_PADDING)
+
+        x0 = int(max(x_min - padding, 0))
+        y0 = int(max(y_min - padding, top))
+        x1 = int(min(x_max + padding + 1, width))
+        y1 = int(min(y_max + padding + 1, bottom))
+
+        self._roi = (x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
+
+
+    def _get_search_band(self, height):
+        """
+        Gets the rows of the picture that can contain an ARTag.
+
+        :param height: The picture height.
+        :type height: int
+
+        :return: The first row and the last row (exclusive) to search.
+        :rtype: int, int
+        """
+        return (int(self._SEARCH_ROWS[0] * height),
+                int(np.ceil(self._SEARCH_ROWS[1] * height)))
+
+
+    def _track_markers(self):
+        """
+        Tracks the corners of the last found ARTag into the current picture.
+
+        The corners are tracked with pyramidal Lucas-Kanade optical flow and
+        checked by tracking them back to the previous picture. The result is
+        rejected if any corner is lost or drifts, or if the ARTag's shape
+        changes more than a moving ARTag can between two frames.
+
+        :return: The tracked corners, in the same format as ar.detectMarkers,
+                 or None if the ARTag could not be tracked reliably.
+        :rtype: list
+        """
+        previous = self._buffers['previous']
+        if previous.shape != self._picture.shape:
+            return None
+
+        corners, status, error = cv2.calcOpticalFlowPyrLK(
+            previous, self._picture, self._flow_corners, None,
+            winSize=self.FLOW_WINDOW, maxLevel=self.FLOW_LEVELS,
+            criteria=self.FLOW_CRITERIA)
+        if corners is None or not status.all():
+            return None
+
+        back, status, error = cv2.calcOpticalFlowPyrLK(
+            self._picture, previous, corners, None,
+            winSize=self.FLOW_WINDOW, maxLevel=self.FLOW_LEVELS,
+            criteria=self.FLOW_CRITERIA)
+        if back is None or not status.all():
+            return None
+
+        drift = np.abs(back - self._flow_corners).max()
+        if drift > self.MAX_FLOW_ERROR:
+            return None
+
+        height, width = self._picture.shape[:2]
+        top, bottom = self._get_search_band(height)
+        points = corners.reshape(4, 2)
+        if (points[:, 0].min() < 0 or points[:, 0].max() >= width
+                or points[:, 1].min() < top or points[:, 1].max() >= bottom):
+            return None
+
+        # The corners must still form a convex quadrilateral of about the same
+        # size.
+        if not cv2.isContourConvex(points):
+            return None
+        area = cv2.contourArea(points)
+        previous_area = cv2.contourArea(self._flow_corners.reshape(4, 2))
+        if not (previous_area / self.MAX_FLOW_SCALE_CHANGE < area
+                < previous_area * self.MAX_FLOW_SCALE_CHANGE):
+            return None
+
+        if self._TRACKING:
+            self._update_roi(points, width, height, top, bottom)
+
+        return [corners.reshape(1, 4, 2)]
+
+
+    def _find_markers(self):
+        """
+        Finds the ARTag corners in the current picture.
+
+        In tracking mode, the region around the last detected ARTag is
+        searched first and the rest of the search band is only searched if the
+        ARTag is not found there. The corners are always reported in full
+        frame coordinates.
+
+        :return: The corners and ids of every detected ARTag.
+        :rtype: list, numpy.ndarray
+        """
+        height, width = self._picture.shape[:2]
+        top, bottom = self._get_search_band(height)
+
+        corners = []
+        ids = None
+        if self._TRACKING and self._roi:
+            x0, y0, x1, y1 = self._roi
+            corners, ids, rejected_img_points = ar.detectMarkers(
+                self._picture[y0:y1, x0:x1], self._AR_DICT,
+                parameters=self._PARAMETERS)
+            offset = (x0, y0)
+
+        if len(corners) == 0:
+            if (top, bottom) == (0, height):
+                search_area = self._picture
+            else:
+                search_area = self._picture[top:bottom]
+            corners, ids, rejected_img_points = ar.detectMarkers(
+                search_area, self._AR_DICT, parameters=self._PARAMETERS)
+            offset = (0, top)
+
+        if offset != (0, 0):
+            offset = np.array(offset, dtype=np.float32)
+            for marker_corners in corners:
+                marker_corners += offset
+
+        if self._TRACKING:
+            if len(corners) == 0:
+                self._roi = None
+            else:
+                self._update_roi(corners[0], width, height, top, bottom)
+
+        return corners, ids
+
+
     def detect(self, img_src=None):
         """
         Detect an ARTag.
@@ -160,34 +605,196 @@ class TagRecognition():
                         testing purposes. Disabled by default.
         :type img_src: str
 
-        :return: Dictionary containing the x distance, z distance, direction,
-                 decision, and yaw if an ARTag is detected.
-        :rtype: float, float, float, int, float
+        :return: The x distance, z distance, direction, decision, and yaw of
+                 the ARTag and the timestamp and sequence number of the frame,
+                 if an ARTag is detected.
+        :rtype: tagobservation.TagObservation
 
         :return: None if a camera does not recognize an ARTag.
         :rtype: None
 
         :raise IOError: Thrown if img_src contains an invalid path.
         """
+        self._timer.start()
         if not img_src:
-            self._ret, self._frame = self._cap.read()
-        else:
-            file_exists = os.path.isfile(img_src)
-            if file_exists:
-                self._frame = cv2.imread(img_src)
-                self._frame = cv2.resize(self._frame,
-                        (self.RESOLUTIONS[self._RESOLUTION][0],
-                         self.RESOLUTIONS[self._RESOLUTION][1]))
+            if self._THREADED:
+                if not self._grabber:
+                    # Open the source here so errors reach the caller instead
+                    # of the capture thread.
+                    self._source.open()
+                    self._grabber = FrameGrabber(self._source)
+                    self._grabbed_seq = 0
+                if not self._grabber.is_running():
+                    # A failed read ends the capture thread. Start it again,
+                    # so one bad read does not end capture for good.
+                    self._grabber.start()
+                ret, frame, seq, timestamp = self._grabber.read(
+                        self._grabbed_seq, self.FRAME_TIMEOUT)
+                if seq == self._grabbed_seq:
+                    # No new frame yet. Detecting the last frame again would
+                    # repeat its observation.
+                    return None
+                self._grabbed_seq = seq
+                self._ret, self._frame = ret, frame
+                self._frame_seq, self._frame_timestamp = (
+                        self._grabber.get_frame_info() or (seq, timestamp))
             else:
-                raise IOError('File does not exist')
+                self._ret, self._frame = self._source.read(
+                        self._capture_buffer)
+                self._capture_buffer = self._frame
+                self._next_frame(self._source.get_frame_info())
+
+            if not self._ret or self._frame is None:
+                return None
+            if self._recorder:
+                self._recorder.write(self._frame, self._frame_timestamp,
+                                     self._frame_seq)
+        else:
+            self._frame = self._image_cache.get(img_src,
+                    (self.RESOLUTIONS[self._RESOLUTION][0],
+                     self.RESOLUTIONS[self._RESOLUTION][1]))
+            self._next_frame()
+        self._timer.mark('capture')
+
+        return self._process_frame()
+
+
+    def _next_frame(self, frame_info=None):
+        """
+        Numbers and stamps a frame that was not read by the grabber.
+
+        :param frame_info: The sequence number and capture time the source
+                           recorded for the frame, if any.
+        :type frame_info: tuple
+        """
+        if frame_info:
+            self._frame_seq, self._frame_timestamp = frame_info
+        else:
+            self._frame_seq += 1
+            self._frame_timestamp = time()
+
+
+    def detect_frame(self, frame):
+        """
+        Detect an ARTag in an image that is already in memory.
+
+        Frames that do not match the set resolution are resized to it.
+
+        :param frame: A BGR or grayscale image.
+        :type frame: numpy.ndarray
 
-        self._picture = cv2.cvtColor(self._frame, cv2.COLOR_BGR2GRAY)
+        :return: The x distance, z distance, direction, decision, and yaw of
+                 the ARTag and the timestamp and sequence number of the frame,
+                 if an ARTag is detected.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the image does not contain an ARTag.
+        :rtype: None
+        """
+        self._timer.start()
+        size = (self.RESOLUTIONS[self._RESOLUTION][0],
+                self.RESOLUTIONS[self._RESOLUTION][1])
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size)
+        self._frame = frame
+        self._next_frame()
+        self._timer.mark('capture')
+
+        return self._process_frame()
+
+
+    def _process_frame(self):
+        """
+        Looks for an ARTag in the current frame, then lets the resolution
+        scheduler pick the resolution of the next frame.
+
+        :return: The x distance, z distance, direction, decision, and yaw of
+                 the ARTag and the timestamp and sequence number of the frame,
+                 if an ARTag is detected.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the frame does not contain an ARTag.
+        :rtype: None
+        """
+        if self._scheduler is None:
+            tag_data = self._find_tag()
+            self._timer.finish()
+            return tag_data
 
-        self._picture = cv2.addWeighted(self._picture, self._CONTRAST,
-                self._picture, 0, self._BRIGHTNESS)
+        start = time()
+        tag_data = self._find_tag()
+        latency = time() - start
+        self._timer.finish()
 
-        self._corners, ids, rejected_img_points = ar.detectMarkers(
-            self._picture, self._AR_DICT, parameters=self._PARAMETERS)
+        tag_pixels = None
+        if tag_data:
+            self._last_z = tag_data.z
+            points = self._corners[0].reshape(4, 2)
+            tag_pixels = float(np.mean(np.linalg.norm(
+                    points - np.roll(points, 1, axis=0), axis=1)))
+            # The camera may not deliver the requested size.
+            tag_pixels *= (float(self.RESOLUTIONS[self._RESOLUTION][0])
+                           / self._size[1])
+
+        self.set_resolution(self._scheduler.update(
+                self._RESOLUTION, tag_pixels, self._last_z, latency))
+
+        return tag_data
+
+
+    def _find_tag(self):
+        """
+        Looks for an ARTag in the current frame.
+
+        :return: The x distance, z distance, direction, decision, and yaw of
+                 the ARTag and the timestamp and sequence number of the frame,
+                 if an ARTag is detected.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the frame does not contain an ARTag.
+        :rtype: None
+        """
+        if self._frame.shape[:2] != self._size:
+            self._set_frame_size(self._frame.shape[1], self._frame.shape[0])
+
+        if self._frame.ndim == 2:
+            gray = self._frame
+        else:
+            gray = cv2.cvtColor(self._frame, cv2.COLOR_BGR2GRAY,
+                    dst=self._get_buffer('gray', self._frame.shape[:2]))
+        self._timer.mark('gray')
+
+        # Never write into gray here. It may be a cached image.
+        if self._LUT is None:
+            self._picture = gray
+        else:
+            self._picture = cv2.LUT(gray, self._LUT,
+                    dst=self._get_buffer('picture', gray.shape))
+        self._timer.mark('contrast')
+
+        corners = None
+        if (self._flow_corners is not None
+                and self._frames_since_detection < self._DETECT_INTERVAL - 1):
+            corners = self._track_markers()
+
+        if corners is None:
+            corners, ids = self._find_markers()
+            self._frames_since_detection = 0
+            # A tracked ARTag keeps the id it was detected with.
+            self._marker_id = int(ids[0][0]) if len(corners) else None
+        else:
+            self._frames_since_detection += 1
+        self._corners = corners
+        self._timer.mark('markers')
+
+        if self._DETECT_INTERVAL > 1:
+            # Keep what is needed to track the ARTag into the next frame.
+            if len(self._corners) == 0:
+                self._flow_corners = None
+            else:
+                self._flow_corners = self._corners[0].reshape(4, 1, 2)
+                np.copyto(self._get_buffer('previous', self._picture.shape),
+                          self._picture)
 
         # If no corners found, return an empty object.
         if len(self._corners) == 0:
@@ -197,39 +804,122 @@ class TagRecognition():
                                                      self._MARKER_LENGTH,
                                                      self._CAMERA_MATRIX,
                                                      self._DIST_COEFFS)
+        self._timer.mark('pose')
 
-        object_x = tvec[0][0][0]
-        object_z = tvec[0][0][2]
-        direction = self.get_direction(object_x, object_z)
+        object_x, object_z, direction, yaw_angle = single_tag_geometry(
+                rvec[0], tvec[0])
+        self._timer.mark('yaw')
 
         decision = self.make_decision(direction)
 
-        # Get the rotation matrix of the tag. This will help find the yaw angle.
-        rotation_matrix = np.zeros(shape=(3,3))
-        cv2.Rodrigues(rvec[0][0], rotation_matrix, jacobian=0)
-
-        # Decompose the rotation matrix into three rotation matrices for pitch,
-        # yaw, and roll.
-        pyr = cv2.RQDecomp3x3(rotation_matrix)
-
-        # The rotation matrix of the yaw is as follows:
-        # [cos(th)  0 sin(th)]
-        # [   0     1    0   ]
-        # [-sin(th) 0 cos(th)]
-        #
-        # We take the first cos result and feed it into the arccos function to
-        # get the yaw angle.
-        yaw_matrix = pyr[4]
-        yaw_angle = np.arccos(yaw_matrix[0][0])
-        yaw_angle = np.degrees(yaw_angle)
-
-        self._tag_data['x'] = object_x
-        self._tag_data['z'] = object_z
-        self._tag_data['direction'] = direction
-        self._tag_data['decision'] = decision
-        self._tag_data['yaw'] = yaw_angle
-
-        return self._tag_data
+        observation = TagObservation(object_x, object_z, direction, decision,
+                                     yaw_angle, self._frame_timestamp,
+                                     self._frame_seq, self._marker_id)
+        self._history.append(observation)
+
+        return observation
+
+
+def tag_direction(object_x, object_z):
+    """
+    Computes the direction of an ARTag the way detections do.
+
+    Unlike TagRecognition.get_direction(), an x of 0 gives +/-90 degrees in
+    radians.
+
+    :param object_x: The ARTag's location on the x-axis.
+    :type object_x: float
+
+    :param object_z: The ARTag's location on the z-axis.
+    :type object_z: float
+
+    :return: The direction of the ARTag (in radians).
+    :rtype: float
+    """
+    if object_x == 0:
+        return math.copysign(math.pi / 2, object_z)
+
+    return math.atan(object_z / object_x)
+
+
+def tag_geometry(rvecs, tvecs):
+    """
+    Computes the position, direction and yaw of any number of ARTags at once.
+
+    Gives the same yaw as decomposing each tag's rotation matrix with
+    cv2.Rodrigues and cv2.RQDecomp3x3, using the closed form of the one matrix
+    entry the yaw depends on.
+
+    :param rvecs: The rotation vectors from ar.estimatePoseSingleMarkers.
+    :type rvecs: numpy.ndarray
+
+    :param tvecs: The translation vectors from ar.estimatePoseSingleMarkers.
+    :type tvecs: numpy.ndarray
+
+    :return: The x distances, z distances, directions (in radians) and yaws (in
+             degrees) of the ARTags.
+    :rtype: numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray
+    """
+    rvecs = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+    tvecs = np.asarray(tvecs, dtype=np.float64).reshape(-1, 3)
+
+    object_x = tvecs[:, 0]
+    object_z = tvecs[:, 2]
+
+    # arctan(z / x) without dividing, so an x of 0 gives +/-90 degrees.
+    directions = np.arctan2(np.where(object_x < 0, -object_z, object_z),
+                            np.abs(object_x))
+
+    # The yaw only depends on the bottom-left entry of the rotation matrix:
+    #   R[2][0] = (1 - cos(th)) / th^2 * rx * rz - sin(th) / th * ry
+    # where th is the length of the rotation vector. The coefficients tend to
+    # 1/2 and 1 as th goes to 0.
+    theta = np.sqrt(np.einsum('ij,ij->i', rvecs, rvecs))
+    small = theta < SMALL_ANGLE
+    safe_theta = np.where(small, 1.0, theta)
+    cos_coeff = np.where(small, 0.5,
+                         (1 - np.cos(theta)) / (safe_theta * safe_theta))
+    sin_coeff = np.where(small, 1.0, np.sin(theta) / safe_theta)
+    r20 = cos_coeff * rvecs[:, 0] * rvecs[:, 2] - sin_coeff * rvecs[:, 1]
+
+    # RQDecomp3x3's yaw rotation has cos(yaw) = sqrt(1 - R[2][0]^2), so
+    # yaw = arcsin(|R[2][0]|).
+    yaws = np.degrees(np.arcsin(np.minimum(np.abs(r20), 1)))
+
+    return object_x, object_z, directions, yaws
+
+
+def single_tag_geometry(rvec, tvec):
+    """
+    Computes the position, direction and yaw of one ARTag.
+
+    Same as tag_geometry() for a single tag, but with scalar math, which is
+    several times faster than NumPy for one tag.
+
+    :param rvec: The rotation vector from ar.estimatePoseSingleMarkers.
+    :type rvec: numpy.ndarray
+
+    :param tvec: The translation vector from ar.estimatePoseSingleMarkers.
+    :type tvec: numpy.ndarray
+
+    :return: The x distance, z distance, direction (in radians) and yaw (in
+             degrees) of the ARTag.
+    :rtype: float, float, float, float
+    """
+    rx, ry, rz = np.ravel(rvec).tolist()
+    object_x, _, object_z = np.ravel(tvec).tolist()
+
+    direction = tag_direction(object_x, object_z)
+
+    theta = math.sqrt(rx * rx + ry * ry + rz * rz)
+    if theta < SMALL_ANGLE:
+        r20 = 0.5 * rx * rz - ry
+    else:
+        r20 = ((1 - math.cos(theta)) / (theta * theta) * rx * rz
+               - math.sin(theta) / theta * ry)
+    yaw = math.degrees(math.asin(min(abs(r20), 1)))
+
+    return object_x, object_z, direction, yaw
 
 
 def main():
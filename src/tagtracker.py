@@ -0,0 +1,314 @@
+"""
+tagtracker
+
+Author: Wisam Bunni
+"""
+from time import time
+
+from tagobservation import TagObservation
+from tagrec import tag_direction
+
+
+class AxisFilter:
+    """
+    Constant velocity Kalman filter for one coordinate.
+
+    :param process_noise: The spectral density of the unmodeled acceleration.
+    :type process_noise: float
+
+    :param measurement_noise: The variance of a measurement.
+    :type measurement_noise: float
+
+    :param initial_velocity_variance: The variance of the velocity when the
+                                      filter is reset.
+    :type initial_velocity_variance: float
+    """
+
+    def __init__(self, process_noise, measurement_noise,
+                 initial_velocity_variance):
+        self._q = float(process_noise)
+        self._r = float(measurement_noise)
+        self._initial_velocity_variance = float(initial_velocity_variance)
+
+        self.position = 0.0
+        """The estimated position."""
+        self.velocity = 0.0
+        """The estimated velocity (per second)."""
+
+        # Covariance matrix [[p00, p01], [p01, p11]].
+        self._p00 = 0.0
+        self._p01 = 0.0
+        self._p11 = 0.0
+
+
+    def reset(self, measurement):
+        """
+        Restarts the filter at a measurement with no velocity.
+
+        :param measurement: The measured position.
+        :type measurement: float
+        """
+        self.position = float(measurement)
+        self.velocity = 0.0
+        self._p00 = self._r
+        self._p01 = 0.0
+        self._p11 = self._initial_velocity_variance
+
+
+    def predict(self, dt):
+        """
+        Moves the estimate forward in time.
+
+        :param dt: The elapsed time (in seconds).
+        :type dt: float
+        """
+        if dt <= 0:
+            return
+
+        q = self._q
+        self.position += self.velocity * dt
+        self._p00 += (2 * dt * self._p01 + dt * dt * self._p11
+                      + q * dt * dt * dt / 3)
+        self._p01 += dt * self._p11 + q * dt * dt / 2
+        self._p11 += q * dt
+
+
+    def update(self, measurement):
+        """
+        Corrects the estimate with a measurement.
+
+        :param measurement: The measured position.
+        :type measurement: float
+        """
+        innovation = float(measurement) - self.position
+        s = self._p00 + self._r
+        k0 = self._p00 / s
+        k1 = self._p01 / s
+
+        self.position += k0 * innovation
+        self.velocity += k1 * innovation
+
+        self._p11 -= k1 * self._p01
+        self._p00 *= 1 - k0
+        self._p01 *= 1 - k0
+
+
+class TagTracker:
+    """
+    Smooths ARTag detections and predicts the ARTag through short dropouts.
+
+    Wraps a TagRecognition object and has the same detect() interface. Each of
+    x, z and yaw is tracked by a constant velocity Kalman filter. When a frame
+    misses the ARTag, the ARTag's position is predicted for up to
+    max_missed_frames frames before detect() reports it as lost.
+
+    :param tag: The TagRecognition object to track ARTags from.
+    :type tag: tagrec.TagRecognition
+
+    :param max_missed_frames: The number of frames in a row to predict the
+                              ARTag for when it is not detected.
+    :type max_missed_frames: int
+
+    :param position_noise: Standard deviation of a measured x or z (in meters).
+    :type position_noise: float
+
+    :param yaw_noise: Standard deviation of a measured yaw (in degrees).
+    :type yaw_noise: float
+
+    :param acceleration: Typical unmodeled acceleration of the ARTag (in
+                         meters per second squared).
+    :type acceleration: float
+
+    :param yaw_acceleration: Typical unmodeled angular acceleration of the
+                             ARTag (in degrees per second squared).
+    :type yaw_acceleration: float
+    """
+
+    MAX_SPEED = 1.0
+    """The largest expected ARTag speed (in meters per second)."""
+    MAX_YAW_RATE = 90.0
+    """The largest expected ARTag yaw rate (in degrees per second)."""
+
+    def __init__(self, tag, max_missed_frames=3, position_noise=0.01,
+                 yaw_noise=2.0, acceleration=1.0, yaw_acceleration=90.0):
+        self._tag = tag
+        self._MAX_MISSED_FRAMES = max(int(max_missed_frames), 0)
+        """The number of missed frames to predict the ARTag through."""
+
+        self._x = AxisFilter(acceleration ** 2, position_noise ** 2,
+                             self.MAX_SPEED ** 2)
+        self._z = AxisFilter(acceleration ** 2, position_noise ** 2,
+                             self.MAX_SPEED ** 2)
+        self._yaw = AxisFilter(yaw_acceleration ** 2, yaw_noise ** 2,
+                               self.MAX_YAW_RATE ** 2)
+
+        self._tracking = False
+        self._missed_frames = 0
+        self._timestamp = 0
+        self._marker_id = None
+        self._frame_seq = None
+        self._result = None
+
+
+    def is_tracking(self):
+        """
+        Checks if an ARTag is being tracked.
+
+        :return: True if an ARTag was detected within the last
+                 max_missed_frames frames, False otherwise.
+        :rtype: bool
+        """
+        return self._tracking
+
+
+    def get_velocity(self):
+        """
+        Gets the estimated velocity of the tracked ARTag.
+
+        :return: The x velocity and z velocity (in meters per second) and the
+                 yaw rate (in degrees per second).
+        :rtype: float, float, float
+        """
+        return self._x.velocity, self._z.velocity, self._yaw.velocity
+
+
+    def release(self):
+        """Releases the wrapped TagRecognition object's frame source."""
+        self._tag.release()
+
+
+    def _frame_time(self):
+        """
+        Gets the capture time of the frame that was just processed.
+
+        :return: The frame's capture timestamp, or the current time if the
+                 frame has none.
+        :rtype: float
+        """
+        timestamp = self._tag.get_frame_info()[1]
+        return timestamp if timestamp else time()
+
+
+    def _observe(self, predicted):
+        """
+        Creates an observation from the filter estimates. It carries the
+        sequence number of the last frame processed.
+
+        :param predicted: Whether the estimate is a prediction.
+        :type predicted: bool
+
+        :return: The observation.
+        :rtype: tagobservation.TagObservation
+        """
+        # Computed like a detection's direction, so predicted and detected
+        # directions agree when x is 0.
+        direction = tag_direction(self._x.position, self._z.position)
+
+        return TagObservation(self._x.position, self._z.position, direction,
+                              self._tag.make_decision(direction),
+                              self._yaw.position, self._timestamp,
+                              self._tag.get_frame_info()[0], self._marker_id,
+                              predicted)
+
+
+    def predict(self, timestamp=None):
+        """
+        Predicts where the tracked ARTag is without detecting it.
+
+        :param timestamp: The time to predict for. Defaults to now.
+        :type timestamp: float
+
+        :return: The predicted x distance, z distance, direction, decision,
+                 and yaw, with predicted set to True.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if no ARTag is being tracked.
+        :rtype: None
+        """
+        if not self._tracking:
+            return None
+
+        if timestamp is None:
+            timestamp = time()
+
+        dt = timestamp - self._timestamp
+        for axis in (self._x, self._z, self._yaw):
+            axis.predict(dt)
+        self._timestamp = max(timestamp, self._timestamp)
+
+        return self._observe(True)
+
+
+    def detect(self, img_src=None):
+        """
+        Detects and tracks an ARTag.
+
+        A frame that was already processed, such as when detect() is called
+        faster than frames arrive, is not fused again: the result of the first
+        call is returned. A call that gets no new frame, such as when the
+        frame source times out, counts as a missed frame, so the ARTag is
+        predicted and eventually reported as lost.
+
+        :param img_src: Path to an image. Passed to TagRecognition.detect().
+        :type img_src: str
+
+        :return: The filtered x distance, z distance, direction, decision,
+                 and yaw, and whether they were predicted because the ARTag was
+                 not detected in this frame.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the ARTag is not detected and cannot be predicted.
+        :rtype: None
+        """
+        tag_data = self._tag.detect(img_src)
+        frame_seq = self._tag.get_frame_info()[0]
+        if frame_seq != self._frame_seq:
+            self._frame_seq = frame_seq
+            self._result = self._track(tag_data, self._frame_time())
+        elif not tag_data:
+            # No new frame arrived. Predict up to now instead of repeating
+            # the last frame's result.
+            self._result = self._track(None, time())
+
+        return self._result
+
+
+    def _track(self, tag_data, timestamp):
+        """
+        Fuses a detection into the filters.
+
+        :param tag_data: The detection, or None if the ARTag was not detected.
+        :type tag_data: tagobservation.TagObservation
+
+        :param timestamp: The frame's capture timestamp.
+        :type timestamp: float
+
+        :return: The filtered or predicted observation.
+        :rtype: tagobservation.TagObservation
+
+        :return: None if the ARTag is not detected and cannot be predicted.
+        :rtype: None
+        """
+        if not tag_data:
+            self._missed_frames += 1
+            if self._missed_frames > self._MAX_MISSED_FRAMES:
+                self._tracking = False
+            return self.predict(timestamp)
+
+        self._missed_frames = 0
+        self._marker_id = tag_data.marker_id
+        measurements = ((self._x, tag_data.x), (self._z, tag_data.z),
+                        (self._yaw, tag_data.yaw))
+
+        if self._tracking:
+            dt = timestamp - self._timestamp
+            for axis, measurement in measurements:
+                axis.predict(dt)
+                axis.update(measurement)
+        else:
+            for axis, measurement in measurements:
+                axis.reset(measurement)
+            self._tracking = True
+        self._timestamp = timestamp
+
+        return self._observe(False)
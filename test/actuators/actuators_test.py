@@ -0,0 +1,344 @@
+from os import path
+
+import sys
+import threading
+import time
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from actuators import (ActuatorWorker, CachedBackWheels, CachedFrontWheels,
+                       CachedServo)
+
+class FakeServo:
+    def __init__(self):
+        self.writes = []
+
+
+    def write(self, angle):
+        self.writes.append(angle)
+
+
+class FakeFrontWheels:
+    def __init__(self):
+        self.turning_max = 45
+        self.calls = []
+
+
+    def turn(self, angle):
+        self.calls.append(angle)
+
+
+    def ready(self):
+        self.calls.append('ready')
+
+
+    def calibration(self):
+        self.calls.append('calibration')
+
+
+    def turn_straight(self):
+        self.calls.append('straight')
+
+
+class FakeBackWheels:
+    def __init__(self):
+        self.calls = []
+
+
+    def __setattr__(self, name, value):
+        if name == 'speed':
+            self.calls.append(value)
+        self.__dict__[name] = value
+
+
+    def forward(self):
+        self.calls.append('forward')
+
+
+    def backward(self):
+        self.calls.append('backward')
+
+
+    def stop(self):
+        self.calls.append('stop')
+
+
+    def ready(self):
+        self.calls.append('ready')
+
+
+    def cali_ok(self):
+        self.calls.append('cali_ok')
+
+
+class GatedBackWheels(FakeBackWheels):
+    """Back wheels whose speed writes wait until the gate is opened."""
+    def __init__(self):
+        FakeBackWheels.__init__(self)
+        self.__dict__['gate'] = threading.Event()
+        self.__dict__['writing'] = threading.Event()
+
+
+    def __setattr__(self, name, value):
+        if name == 'speed':
+            self.writing.set()
+            self.gate.wait(1)
+        FakeBackWheels.__setattr__(self, name, value)
+
+
+class CachedServoTest(unittest.TestCase):
+    def setUp(self):
+        self._servo = FakeServo()
+
+
+    def test_repeated_angle(self):
+        servo = CachedServo(self._servo)
+        servo.write(90)
+        servo.write(90)
+        servo.write(100)
+        self.assertEqual(self._servo.writes, [90, 100])
+        self.assertEqual(servo.get_write_counts(),
+                         {'issued': 2, 'suppressed': 1})
+
+
+    def test_deadband(self):
+        servo = CachedServo(self._servo, deadband=2)
+        servo.write(90)
+        servo.write(92)
+        servo.write(93)
+        servo.write(91)
+        self.assertEqual(self._servo.writes, [90, 93])
+
+
+    def test_invalidate(self):
+        servo = CachedServo(self._servo)
+        servo.write(90)
+        servo.invalidate()
+        servo.write(90)
+        self.assertEqual(self._servo.writes, [90, 90])
+
+
+class CachedFrontWheelsTest(unittest.TestCase):
+    def setUp(self):
+        self._wheels = FakeFrontWheels()
+
+
+    def test_repeated_angle(self):
+        wheels = CachedFrontWheels(self._wheels)
+        wheels.turn(60)
+        wheels.turn(60)
+        self.assertEqual(self._wheels.calls, [60])
+        self.assertEqual(wheels.get_write_counts(),
+                         {'issued': 1, 'suppressed': 1})
+
+
+    def test_straight_always_written(self):
+        wheels = CachedFrontWheels(self._wheels, deadband=5)
+        wheels.turn(93)
+        wheels.turn(90)
+        wheels.turn(91)
+        self.assertEqual(self._wheels.calls, [93, 90])
+
+
+    def test_ready_invalidates(self):
+        wheels = CachedFrontWheels(self._wheels)
+        wheels.turn(90)
+        wheels.ready()
+        wheels.turn(90)
+        self.assertEqual(self._wheels.calls, [90, 'ready', 90])
+
+
+    def test_attributes(self):
+        wheels = CachedFrontWheels(self._wheels)
+        self.assertEqual(wheels.turning_max, 45)
+
+
+    def test_other_writes_invalidate(self):
+        wheels = CachedFrontWheels(self._wheels)
+        wheels.turn(90)
+        wheels.turn_straight()
+        wheels.turn(90)
+        wheels.turning_max = 30
+        wheels.turn(90)
+        self.assertEqual(self._wheels.calls, [90, 'straight', 90, 90])
+        self.assertEqual(self._wheels.turning_max, 30)
+
+
+class CachedBackWheelsTest(unittest.TestCase):
+    def setUp(self):
+        self._wheels = FakeBackWheels()
+
+
+    def test_repeated_drive(self):
+        wheels = CachedBackWheels(self._wheels)
+        for _ in range(3):
+            wheels.set_speed(40)
+            wheels.forward()
+        self.assertEqual(self._wheels.calls, [40, 'forward'])
+        self.assertEqual(wheels.get_write_counts(),
+                         {'issued': 2, 'suppressed': 4})
+
+
+    def test_direction_change(self):
+        wheels = CachedBackWheels(self._wheels)
+        wheels.forward()
+        wheels.backward()
+        wheels.backward()
+        wheels.forward()
+        self.assertEqual(self._wheels.calls, ['forward', 'backward', 'forward'])
+
+
+    def test_zero_always_written(self):
+        wheels = CachedBackWheels(self._wheels, deadband=5)
+        wheels.set_speed(3)
+        wheels.set_speed(0)
+        wheels.set_speed(2)
+        self.assertEqual(self._wheels.calls, [3, 0])
+        self.assertEqual(wheels.get_speed(), 0)
+
+
+    def test_stop(self):
+        wheels = CachedBackWheels(self._wheels)
+        wheels.set_speed(40)
+        wheels.stop()
+        wheels.set_speed(0)
+        wheels.set_speed(40)
+        self.assertEqual(self._wheels.calls, [40, 'stop', 40])
+
+
+    def test_ready_resets_direction(self):
+        wheels = CachedBackWheels(self._wheels)
+        wheels.forward()
+        wheels.ready()
+        wheels.forward()
+        self.assertEqual(self._wheels.calls, ['forward', 'ready', 'forward'])
+
+
+    def test_speed_attribute(self):
+        wheels = CachedBackWheels(self._wheels)
+        wheels.speed = 40
+        wheels.speed = 40
+        self.assertEqual(self._wheels.calls, [40])
+        self.assertEqual(wheels.get_speed(), 40)
+
+
+    def test_other_writes_invalidate(self):
+        wheels = CachedBackWheels(self._wheels)
+        wheels.set_speed(40)
+        wheels.forward()
+        wheels.cali_ok()
+        wheels.set_speed(40)
+        wheels.forward()
+        self.assertEqual(self._wheels.calls,
+                         [40, 'forward', 'cali_ok', 40, 'forward'])
+
+
+class ActuatorWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self._front = FakeFrontWheels()
+        self._back = GatedBackWheels()
+        self._worker = ActuatorWorker(CachedFrontWheels(self._front),
+                                      CachedBackWheels(self._back))
+
+
+    def tearDown(self):
+        self._back.gate.set()
+        self._worker.release()
+
+
+    def wait_for_written(self, written):
+        deadline = time.time() + 1
+        while (self._worker.get_stats()['written'] < written
+               and time.time() < deadline):
+            time.sleep(0.001)
+
+
+    def test_not_started(self):
+        self._back.gate.set()
+        self._worker.set_speed(40)
+        self._worker.forward()
+        self._worker.turn(60)
+        self.assertEqual(self._back.calls, [40, 'forward'])
+        self.assertEqual(self._front.calls, [60])
+
+
+    def test_latest_value_wins(self):
+        self._worker.start()
+        self._worker.set_speed(10)
+        self.assertTrue(self._back.writing.wait(1))
+
+        # The worker is blocked writing 10, so only the last of these remains.
+        self._worker.set_speed(20)
+        self._worker.set_speed(30)
+        self._worker.turn(60)
+        self._back.gate.set()
+        self.wait_for_written(3)
+
+        self.assertEqual(self._back.calls, [10, 30])
+        self.assertEqual(self._front.calls, [60])
+        stats = self._worker.get_stats()
+        self.assertEqual(stats['posted'], 4)
+        self.assertEqual(stats['written'], 3)
+        self.assertEqual(stats['dropped'], 1)
+
+
+    def test_post_does_not_block(self):
+        self._worker.start()
+        self._worker.set_speed(10)
+        self.assertTrue(self._back.writing.wait(1))
+
+        start = time.time()
+        self._worker.set_speed(20)
+        self._worker.forward()
+        self.assertTrue(time.time() - start < 0.5)
+
+
+    def test_stop(self):
+        self._worker.start()
+        self._worker.set_speed(10)
+        self.assertTrue(self._back.writing.wait(1))
+        self._worker.set_speed(20)
+        self._worker.forward()
+
+        stopper = threading.Thread(target=self._worker.stop)
+        stopper.start()
+        deadline = time.time() + 1
+        while (self._worker.get_stats()['stops'] < 1
+               and time.time() < deadline):
+            time.sleep(0.001)
+        self._back.gate.set()
+        stopper.join(1)
+
+        # The pending speed and direction are dropped, not written after the
+        # stop.
+        time.sleep(0.05)
+        self.assertEqual(self._back.calls, [10, 'stop'])
+        self.assertEqual(self._worker.get_stats()['dropped'], 2)
+
+
+    def test_timer(self):
+        self._back.gate.set()
+        self._worker.start()
+        self._worker.turn(60)
+        self.wait_for_written(1)
+
+        snapshot = self._worker.get_timer().snapshot()
+        self.assertEqual(snapshot['write']['count'], 1)
+        self.assertEqual(snapshot['wait']['count'], 1)
+
+
+    def test_release(self):
+        self._back.gate.set()
+        self._worker.start()
+        self.assertTrue(self._worker.is_running())
+        self._worker.release()
+        self.assertFalse(self._worker.is_running())
+
+        self._worker.set_speed(40)
+        self.assertEqual(self._back.calls, [40])
+
+
+if __name__ == '__main__':
+    unittest.main()
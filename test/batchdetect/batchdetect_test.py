@@ -0,0 +1,83 @@
+from os import path
+
+import cv2
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from batchdetect import detect_many, find_images
+
+class BatchDetectTest(unittest.TestCase):
+    def setUp(self):
+        self._pictures_dir = FILE_PATH + "/../res/tag_pictures/"
+        self._images = [self._pictures_dir + "straight_no_turn_5in.jpg",
+                        self._pictures_dir + "no_tag.jpg",
+                        self._pictures_dir + "left_no_turn_5in.jpg",
+                        self._pictures_dir + "right_no_turn_5in.jpg"]
+
+
+    def test_results_in_input_order(self):
+        records = list(detect_many(self._images, workers=2,
+                                   marker_length=0.025))
+
+        self.assertEqual([record.index for record in records], [0, 1, 2, 3])
+        self.assertEqual([record.source for record in records], self._images)
+
+
+    def test_tag_detected(self):
+        records = list(detect_many(self._images, workers=2,
+                                   marker_length=0.025))
+
+        self.assertEqual([record.detected for record in records],
+                         [True, False, True, True])
+
+
+    def test_tag_not_detected_fields(self):
+        record = list(detect_many(self._images[1:2], workers=1))[0]
+
+        self.assertEqual(record.z, None)
+        self.assertEqual(record.yaw, None)
+
+
+    def test_pool_matches_single_process(self):
+        serial = list(detect_many(self._images, workers=1,
+                                  marker_length=0.025))
+        pooled = list(detect_many(self._images, workers=2,
+                                  marker_length=0.025))
+
+        self.assertEqual(serial, pooled)
+
+
+    def test_array_input(self):
+        image = cv2.imread(self._images[0])
+
+        record = list(detect_many([image], workers=1, marker_length=0.025))[0]
+
+        self.assertTrue(record.detected)
+        self.assertEqual(record.source, None)
+
+
+    def test_generator_stops_early(self):
+        records = detect_many(self._images, workers=2, marker_length=0.025)
+
+        self.assertEqual(next(records).index, 0)
+        records.close()
+
+
+    def test_invalid_path(self):
+        with self.assertRaises(IOError):
+            list(detect_many([self._pictures_dir + "missing.jpg"], workers=1))
+
+
+    def test_find_images_directory(self):
+        images = find_images([self._pictures_dir])
+
+        self.assertTrue(len(images) > 0)
+        self.assertEqual(images, sorted(images))
+        self.assertTrue(all(image.endswith(".jpg") for image in images))
+
+
+if __name__ == '__main__':
+    unittest.main()
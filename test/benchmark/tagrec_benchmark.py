@@ -0,0 +1,334 @@
+"""
+Benchmarks TagRecognition over the ARTag pictures at every resolution.
+
+Times decoding and resizing each picture and, with the stage timer
+TagRecognition reports at runtime, each stage of detecting it, over several
+runs, and records what was detected in each picture. Results can be saved as a
+JSON baseline and later runs compared against it to catch slower stages or
+changed detections.
+"""
+from os import path
+import argparse
+import glob
+import json
+import platform
+
+import cv2
+import numpy
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has no allocation tracing.
+    tracemalloc = None
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from stagetimer import StageTimer
+from tagrec import TagRecognition
+
+PICTURES_DIR = FILE_PATH + "/../res/tag_pictures"
+"""The default pictures to benchmark."""
+PICTURE_STAGES = ('decode', 'resize')
+"""The stages of preparing a picture, timed by the benchmark."""
+STAGES = PICTURE_STAGES + TagRecognition.TIMED_STAGES + (StageTimer.TOTAL,)
+"""
+The timed stages. The detection stages and total, a whole detect_frame() call,
+are timed by TagRecognition's stage timer.
+"""
+MAX_SLOWDOWN = 1.25
+"""
+The largest ratio between a stage's p50 in any run and its baseline median
+p50. Stage timer p50s are histogram bucket edges about 19% apart, so a stage
+must be two buckets slower to be reported.
+"""
+RUNS = 5
+"""The default number of runs, each with its own p50 per stage."""
+MIN_STAGE_TIME = 20e-6
+"""Stages faster than this (in seconds) are too noisy to compare."""
+MAX_POSITION_CHANGE = 0.005
+"""The largest change in a detected x or z from the baseline (in meters)."""
+MAX_YAW_CHANGE = 1.0
+"""The largest change in a detected yaw from the baseline (in degrees)."""
+
+
+def benchmark_picture(tag, timer, img_src, size):
+    """
+    Decodes, resizes and detects one picture.
+
+    :param tag: The TagRecognition object to detect with. Its stage timer
+                records the detection stages.
+    :type tag: tagrec.TagRecognition
+
+    :param timer: The timer to record the decode and resize stages in.
+    :type timer: stagetimer.StageTimer
+
+    :param img_src: Path to the picture.
+    :type img_src: str
+
+    :param size: The (width, height) of the resolution.
+    :type size: tuple
+
+    :return: The detection, as a dictionary with x, z and yaw, or None.
+    :rtype: dict
+    """
+    timer.start()
+    image = cv2.imread(img_src)
+    timer.mark('decode')
+    frame = cv2.resize(image, size)
+    timer.mark('resize')
+    timer.finish()
+
+    tag_data = tag.detect_frame(frame)
+    if not tag_data:
+        return None
+
+    return {'x': tag_data.x, 'z': tag_data.z, 'yaw': tag_data.yaw}
+
+
+def measure_allocations(tag, frames):
+    """
+    Measures the memory allocated by detect_frame().
+
+    :return: The mean and peak bytes allocated per call, or None if
+             allocations cannot be traced.
+    :rtype: dict
+    """
+    if tracemalloc is None:
+        return None
+
+    # Let buffers be allocated before measuring.
+    for frame in frames:
+        tag.detect_frame(frame)
+
+    # Without reset_peak() (before Python 3.9) the peak covers every call.
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    tracemalloc.start()
+    try:
+        total = 0
+        peak = 0
+        for frame in frames:
+            if reset_peak:
+                reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            tag.detect_frame(frame)
+            current, frame_peak = tracemalloc.get_traced_memory()
+            total += max(current - before, 0)
+            peak = max(peak, frame_peak - before)
+    finally:
+        tracemalloc.stop()
+
+    return {'mean_retained_bytes': total / float(len(frames)),
+            'peak_bytes': peak}
+
+
+def summarize(snapshots):
+    """
+    Summarizes the times of one stage.
+
+    :param snapshots: The stage's stage timer snapshot in each run, or None
+                      for runs it was not timed in.
+    :type snapshots: list
+
+    :return: The number of samples, the mean, the median over the runs of
+             each percentile (in seconds) and the p50 of each run.
+    :rtype: dict
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    if not snapshots:
+        return {'count': 0}
+
+    count = sum(snapshot['count'] for snapshot in snapshots)
+    summary = {
+            'count': count,
+            'mean': sum(snapshot['mean'] * snapshot['count']
+                        for snapshot in snapshots) / count,
+            'run_p50s': [snapshot['p50'] for snapshot in snapshots]
+    }
+    for percentile in StageTimer.PERCENTILES:
+        key = 'p%d' % percentile
+        summary[key] = float(numpy.median([snapshot[key]
+                                           for snapshot in snapshots]))
+
+    return summary
+
+
+def benchmark_resolution(resolution, pictures, repeat, contrast, runs=RUNS):
+    """
+    Benchmarks one resolution.
+
+    :return: The stage timings, allocations and detections.
+    :rtype: dict
+    """
+    tag = TagRecognition(resolution=resolution, marker_length=0.025,
+                         contrast=contrast, timing=True)
+    tag_timer = tag.get_timer()
+    picture_timer = StageTimer(PICTURE_STAGES, name='pictures', enabled=True)
+    size = tuple(TagRecognition.RESOLUTIONS[resolution])
+    run_snapshots = []
+
+    detections = {}
+    for _ in range(runs):
+        tag_timer.reset()
+        picture_timer.reset()
+        for _ in range(repeat):
+            for img_src in pictures:
+                detections[path.basename(img_src)] = benchmark_picture(
+                        tag, picture_timer, img_src, size)
+        snapshot = picture_timer.snapshot()
+        # The picture timer's total is not a stage.
+        snapshot.pop(StageTimer.TOTAL, None)
+        snapshot.update(tag_timer.snapshot())
+        run_snapshots.append(snapshot)
+
+    frames = [cv2.resize(cv2.imread(img_src), size) for img_src in pictures]
+
+    return {
+            'stages': dict((stage, summarize([snapshot.get(stage)
+                                              for snapshot in run_snapshots]))
+                           for stage in STAGES),
+            'allocations': measure_allocations(tag, frames),
+            'detected': sum(1 for detection in detections.values()
+                            if detection),
+            'detections': detections
+    }
+
+
+def compare(results, baseline, max_slowdown=MAX_SLOWDOWN):
+    """
+    Compares results with a baseline.
+
+    A stage is slower only if its p50 is over max_slowdown times the
+    baseline's median p50 in every run, so one noisy run is not reported.
+
+    :return: A description of every regression.
+    :rtype: list
+    """
+    regressions = []
+    for resolution, result in sorted(results['resolutions'].items()):
+        old = baseline['resolutions'].get(resolution)
+        if old is None:
+            continue
+
+        for stage in STAGES:
+            summary = result['stages'][stage]
+            old_summary = old['stages'].get(stage, {})
+            new_times = summary.get('run_p50s')
+            # Older baselines kept the median p50 apart from the p50.
+            old_time = old_summary.get('median_p50', old_summary.get('p50'))
+            if (not new_times or old_time is None
+                    or max(summary['p50'], old_time) < MIN_STAGE_TIME):
+                continue
+            if min(new_times) > old_time * max_slowdown:
+                regressions.append(
+                        '%sp %s: p50 %.3f ms -> %.3f ms in all %d runs' % (
+                                resolution, stage, old_time * 1e3,
+                                summary['p50'] * 1e3,
+                                len(new_times)))
+
+        for name, detection in sorted(result['detections'].items()):
+            if name not in old['detections']:
+                continue
+            old_detection = old['detections'][name]
+            if bool(detection) != bool(old_detection):
+                regressions.append('%sp %s: %s' % (
+                        resolution, name,
+                        'lost ARTag' if old_detection else 'new ARTag'))
+            elif detection and (
+                    abs(detection['x'] - old_detection['x'])
+                    > MAX_POSITION_CHANGE
+                    or abs(detection['z'] - old_detection['z'])
+                    > MAX_POSITION_CHANGE
+                    or abs(detection['yaw'] - old_detection['yaw'])
+                    > MAX_YAW_CHANGE):
+                regressions.append('%sp %s: pose changed' % (resolution,
+                                                              name))
+
+    return regressions
+
+
+def print_results(results):
+    """Prints the p50/p95/p99 of every stage at every resolution."""
+    print("%6s %-15s %10s %10s %10s %14s" % ("res", "stage", "p50 (ms)",
+                                             "p95 (ms)", "p99 (ms)",
+                                             "alloc (KiB)"))
+    for resolution, result in sorted(results['resolutions'].items(),
+                                     key=lambda item: int(item[0])):
+        for stage in STAGES:
+            summary = result['stages'][stage]
+            if not summary['count']:
+                continue
+            allocated = ''
+            if stage == StageTimer.TOTAL and result['allocations']:
+                allocated = '%.1f' % (result['allocations']['peak_bytes']
+                                      / 1024.0)
+            print("%6s %-15s %10.3f %10.3f %10.3f %14s" % (
+                    resolution, stage, summary['p50'] * 1e3,
+                    summary['p95'] * 1e3, summary['p99'] * 1e3, allocated))
+        print("%6s %d/%d pictures detected" % (
+                resolution, result['detected'], len(result['detections'])))
+
+
+def main():
+    """Runs the benchmark and saves or compares the results."""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--pictures', default=PICTURES_DIR,
+                        help='directory of ARTag pictures')
+    parser.add_argument('--resolutions', type=int, nargs='+',
+                        default=sorted(TagRecognition.RESOLUTIONS),
+                        help='resolutions to benchmark')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of passes over the pictures per run')
+    parser.add_argument('--runs', type=int, default=RUNS,
+                        help='number of runs, each with its own p50')
+    parser.add_argument('--contrast', type=float, default=2,
+                        help='contrast multiplier')
+    parser.add_argument('--save', metavar='PATH',
+                        help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results with a JSON baseline')
+    parser.add_argument('--max-slowdown', type=float, default=MAX_SLOWDOWN,
+                        help='largest allowed p50 ratio to the baseline')
+    args = parser.parse_args()
+
+    pictures = sorted(glob.glob(path.join(args.pictures, '*.jpg')))
+    if not pictures:
+        parser.error('no pictures in %s' % args.pictures)
+
+    results = {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': numpy.__version__,
+            'machine': platform.machine(),
+            'pictures': len(pictures),
+            'repeat': args.repeat,
+            'runs': args.runs,
+            'contrast': args.contrast,
+            # JSON object keys are strings.
+            'resolutions': dict(
+                    (str(resolution),
+                     benchmark_resolution(resolution, pictures, args.repeat,
+                                          args.contrast, args.runs))
+                    for resolution in args.resolutions)
+    }
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.max_slowdown)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against " + args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the closed form yaw in tag_geometry() and single_tag_geometry() with
+decomposing the rotation matrix using cv2.Rodrigues and cv2.RQDecomp3x3.
+"""
+from os import path
+import timeit
+
+import cv2
+import numpy
+import sys
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from tagrec import single_tag_geometry, tag_geometry
+
+REPEAT = 5
+"""The number of timing runs. The fastest run is reported."""
+MARKER_COUNTS = (1, 4, 32)
+"""The number of markers processed per call."""
+
+
+def rq_decomposition(rvecs, tvecs):
+    """Computes x, z, direction and yaw the way detect() used to."""
+    results = []
+    for rvec, tvec in zip(rvecs, tvecs):
+        object_x = tvec[0][0]
+        object_z = tvec[0][2]
+        direction = numpy.arctan(object_z / object_x)
+
+        rotation_matrix = numpy.zeros(shape=(3,3))
+        cv2.Rodrigues(rvec[0], rotation_matrix, jacobian=0)
+        yaw_matrix = cv2.RQDecomp3x3(rotation_matrix)[4]
+        yaw = numpy.degrees(numpy.arccos(yaw_matrix[0][0]))
+
+        results.append((object_x, object_z, direction, yaw))
+
+    return results
+
+
+def main():
+    """Prints the time per call of both yaw computations."""
+    random = numpy.random.RandomState(0)
+
+    calls = 2000
+
+    rvec = random.normal(size=(1, 3))
+    tvec = random.normal(size=(1, 3))
+    old = min(timeit.repeat(lambda: rq_decomposition([rvec], [tvec]),
+                            number=calls, repeat=REPEAT)) / calls
+    new = min(timeit.repeat(lambda: single_tag_geometry(rvec, tvec),
+                            number=calls, repeat=REPEAT)) / calls
+    print("single_tag_geometry: %.2f us vs %.2f us (%.1fx)"
+          % (new * 1e6, old * 1e6, old / new))
+
+    print("%8s %18s %18s %8s" % ("markers", "rqdecomp3x3 (us)",
+                                 "tag_geometry (us)", "speedup"))
+    for count in MARKER_COUNTS:
+        rvecs = random.normal(size=(count, 1, 3))
+        tvecs = random.normal(size=(count, 1, 3))
+
+        old = min(timeit.repeat(lambda: rq_decomposition(rvecs, tvecs),
+                                number=calls, repeat=REPEAT)) / calls
+        new = min(timeit.repeat(lambda: tag_geometry(rvecs, tvecs),
+                                number=calls, repeat=REPEAT)) / calls
+
+        print("%8d %18.2f %18.2f %7.1fx" % (count, old * 1e6, new * 1e6,
+                                            old / new))
+
+if __name__ == '__main__':
+    main()
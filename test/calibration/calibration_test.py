@@ -0,0 +1,163 @@
+from os import path
+
+import cv2
+import numpy
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from calibration import Calibration, get_calibration
+
+class CalibrationTest(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._calibration_file = path.join(self._temp_dir, "calibration.xml")
+        self._camera_matrix = numpy.array([[600.0, 0, 320.0],
+                                           [0, 610.0, 240.0],
+                                           [0, 0, 1]])
+        self._dist_coeffs = numpy.array([[0.1, -0.2, 0.0, 0.0, 0.05]])
+        self._write_calibration(self._calibration_file)
+
+
+    def tearDown(self):
+        shutil.rmtree(self._temp_dir)
+
+
+    def _write_calibration(self, calibration_file, image_size=True):
+        storage = cv2.FileStorage(calibration_file, cv2.FILE_STORAGE_WRITE)
+        if image_size:
+            storage.write("image_width", 640)
+            storage.write("image_height", 480)
+        storage.write("cameraMatrix", self._camera_matrix)
+        storage.write("distCoeffs", self._dist_coeffs)
+        storage.release()
+
+
+    def test_distortion_coefficients(self):
+        calibration = get_calibration(self._calibration_file)
+
+        self.assertTrue(numpy.allclose(calibration.dist_coeffs,
+                                       self._dist_coeffs))
+
+
+    def test_image_size(self):
+        calibration = get_calibration(self._calibration_file)
+
+        self.assertEqual(calibration.image_size, (640, 480))
+
+
+    def test_camera_matrix_calibrated_size(self):
+        calibration = get_calibration(self._calibration_file)
+
+        self.assertTrue(numpy.allclose(
+            calibration.get_camera_matrix(640, 480), self._camera_matrix))
+
+
+    def test_camera_matrix_scaled(self):
+        calibration = get_calibration(self._calibration_file)
+
+        matrix = calibration.get_camera_matrix(160, 120)
+
+        self.assertAlmostEqual(matrix[0][0], 150.0)
+        self.assertAlmostEqual(matrix[0][2], 80.0)
+        self.assertAlmostEqual(matrix[1][1], 152.5)
+        self.assertAlmostEqual(matrix[1][2], 60.0)
+        self.assertEqual(matrix[2][2], 1)
+
+
+    def test_camera_matrix_other_aspect_ratio(self):
+        calibration = get_calibration(self._calibration_file)
+
+        matrix = calibration.get_camera_matrix(160, 90)
+
+        # A cropped sensor mode gets the approximation, not a stretched
+        # calibration.
+        self.assertTrue(numpy.array_equal(
+            matrix, Calibration().get_camera_matrix(160, 90)))
+
+
+    def test_without_image_size(self):
+        self._write_calibration(self._calibration_file, image_size=False)
+        os.utime(self._calibration_file, (0, 0))
+
+        calibration = get_calibration(self._calibration_file)
+
+        # The camera matrix cannot be scaled, so it is approximated, but the
+        # distortion coefficients are still used.
+        self.assertEqual(calibration.camera_matrix, None)
+        self.assertTrue(numpy.allclose(calibration.dist_coeffs,
+                                       self._dist_coeffs))
+        self.assertTrue(numpy.array_equal(
+            calibration.get_camera_matrix(640, 480),
+            Calibration().get_camera_matrix(640, 480)))
+
+
+    def test_image_size_required(self):
+        self.assertRaises(ValueError, Calibration, self._camera_matrix)
+
+
+    def test_loaded_once(self):
+        first = get_calibration(self._calibration_file)
+        second = get_calibration(self._calibration_file)
+
+        self.assertTrue(first is second)
+
+
+    def test_binary_cache_not_written_by_default(self):
+        get_calibration(self._calibration_file)
+
+        self.assertFalse(path.isfile(path.join(self._temp_dir,
+                                               "calibration.npz")))
+
+
+    def test_binary_cache_written(self):
+        get_calibration(self._calibration_file, cache=True)
+
+        self.assertTrue(path.isfile(path.join(self._temp_dir,
+                                              "calibration.npz")))
+
+
+    def test_modified_file_loaded_again(self):
+        first = get_calibration(self._calibration_file)
+        self._camera_matrix[0][0] = 500.0
+        self._write_calibration(self._calibration_file)
+        os.utime(self._calibration_file, (1, 1))
+
+        second = get_calibration(self._calibration_file)
+
+        self.assertFalse(first is second)
+        self.assertAlmostEqual(second.get_camera_matrix(640, 480)[0][0],
+                               500.0)
+
+
+    def test_precomputed_sizes(self):
+        calibration = get_calibration(self._calibration_file,
+                                      [(160, 90), (176, 144)])
+
+        self.assertTrue(calibration.get_camera_matrix(176, 144) is
+                        calibration.get_camera_matrix(176, 144))
+
+
+    def test_missing_file(self):
+        calibration = get_calibration(path.join(self._temp_dir, "missing.xml"))
+
+        self.assertEqual(calibration.dist_coeffs, None)
+        self.assertEqual(calibration.camera_matrix, None)
+
+
+    def test_uncalibrated_camera_matrix(self):
+        matrix = Calibration().get_camera_matrix(160, 90)
+
+        self.assertEqual(matrix[0][0], 160)
+        self.assertEqual(matrix[1][1], 160)
+        self.assertEqual(matrix[0][2], 80)
+        self.assertEqual(matrix[1][2], 45)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+from os import path
+
+import cv2.aruco as ar
+import shutil
+import sys
+import tempfile
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from detectorprofile import load_profile, make_parameters, save_profile
+
+class DetectorProfileTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = path.join(self._dir, 'profile.json')
+
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+
+    def test_defaults(self):
+        parameters = make_parameters()
+        defaults = ar.DetectorParameters_create()
+
+        self.assertEqual(parameters.adaptiveThreshWinSizeMax,
+                         defaults.adaptiveThreshWinSizeMax)
+
+
+    def test_make_parameters(self):
+        parameters = make_parameters({'adaptiveThreshWinSizeMax': 9,
+                                      'minMarkerPerimeterRate': 0.05})
+
+        self.assertEqual(parameters.adaptiveThreshWinSizeMax, 9)
+        self.assertAlmostEqual(parameters.minMarkerPerimeterRate, 0.05)
+
+
+    def test_make_parameters_float_for_int(self):
+        parameters = make_parameters({'adaptiveThreshWinSizeMax': 9.0})
+
+        self.assertEqual(parameters.adaptiveThreshWinSizeMax, 9)
+
+
+    def test_unknown_parameter(self):
+        self.assertRaises(ValueError, make_parameters, {'notAParameter': 1})
+
+
+    def test_save_load(self):
+        profile = {'adaptiveThreshWinSizeStep': 20,
+                   'cornerRefinementMethod': ar.CORNER_REFINE_SUBPIX}
+
+        save_profile(self._path, profile, {'recall': 1.0})
+
+        self.assertEqual(load_profile(self._path), profile)
+
+
+    def test_load_missing(self):
+        self.assertRaises(IOError, load_profile, self._path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from os import path
+
+import shutil
+import sys
+import tempfile
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from detectortuner import SEARCH_SPACE, _score, random_profiles, tune
+from tagdataset import generate_dataset
+
+class DetectorTunerTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = path.join(self._dir, 'tags.npz')
+        generate_dataset(self._path, 144, 10, seed=1, distance=(0.1, 0.3))
+
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+
+    def test_random_profiles(self):
+        for profile in random_profiles(50, seed=1):
+            self.assertEqual(sorted(profile), sorted(SEARCH_SPACE))
+            self.assertTrue(profile['adaptiveThreshWinSizeMin']
+                            <= profile['adaptiveThreshWinSizeMax'])
+
+
+    def test_random_profiles_seed(self):
+        self.assertEqual(list(random_profiles(5, seed=1)),
+                         list(random_profiles(5, seed=1)))
+
+
+    def test_score_without_z_error_last(self):
+        detected = {'time': 0.01, 'z_error': 0.05}
+        missed = {'time': 0.01, 'z_error': None}
+
+        self.assertTrue(_score(detected) < _score(missed))
+        self.assertTrue(_score({'time': 0.005, 'z_error': None})
+                        < _score(detected))
+
+
+    def test_tune_keeps_recall(self):
+        profile, metrics, default_metrics = tune([self._path], trials=5,
+                                                 workers=1, seed=1)
+
+        self.assertTrue(metrics['recall'] >= default_metrics['recall'] - 0.01)
+        self.assertTrue(metrics['time'] <= default_metrics['time'])
+
+
+    def test_tune_parallel(self):
+        profile, metrics, default_metrics = tune([self._path], trials=3,
+                                                 workers=2, seed=1)
+
+        self.assertEqual(default_metrics['recall'],
+                         tune([self._path], trials=0, workers=1)[2]['recall'])
+
+
+if __name__ == '__main__':
+    unittest.main()
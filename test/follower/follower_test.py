@@ -1,5 +1,4 @@
 from os import path
-from time import sleep
 
 import numpy
 import sys
@@ -9,6 +8,9 @@ FILE_PATH = path.dirname(path.realpath(__file__))
 sys.path.append(FILE_PATH + "/../../src")
 
 from follower import Follower
+from gapcontroller import PIGapController
+from steering import PurePursuitSteering
+from tagobservation import TagObservation
 
 from leader import MAX_SPEED as LEADER_MAX_SPEED
 
@@ -16,13 +18,7 @@ class FollowerTest(unittest.TestCase):
     def setUp(self):
         self._pictures_dir = FILE_PATH + "/../res/tag_pictures/"
 
-        self._default_tag_data = {
-                'x': 0,
-                'z': 0,
-                'direction': 0,
-                'decision': 0,
-                'yaw': 0
-       }
+        self._default_tag_data = TagObservation()
 
 
     def test_detect_tag_found(self):
@@ -70,6 +66,72 @@ class FollowerTest(unittest.TestCase):
         self.assertEqual(follower._speed, LEADER_MAX_SPEED)
 
 
+    def make_pi_follower(self):
+        img_src = self._pictures_dir + "straight_no_turn_12in.jpg"
+        controller = PIGapController(Follower.MIN_DISTANCE,
+                                     Follower.FOLLOWER_MAX_SPEED,
+                                     target_gap=0.14, kp=300, ki=100,
+                                     max_accel=1000)
+
+        return Follower(test_img_src=img_src, gap_controller=controller)
+
+
+    def test_drive_gap_controller(self):
+        follower = self.make_pi_follower()
+
+        follower._tag_data = TagObservation(z=0.2, timestamp=1.0)
+        follower.drive()
+        follower._tag_data = TagObservation(z=0.2, timestamp=1.1)
+        follower.drive()
+
+        # 300 * 0.06 + 100 * 0.06 * 0.1 = 18.6, with no feed-forward since
+        # the gap is steady and the vehicle was standing.
+        self.assertEqual(follower._speed, 19)
+
+
+    def test_stop_resets_gap_controller(self):
+        follower = self.make_pi_follower()
+
+        for timestamp in (1.0, 1.1):
+            follower._tag_data = TagObservation(z=0.2, timestamp=timestamp)
+            follower.drive()
+        follower.stop()
+        follower._tag_data = TagObservation(z=0.2, timestamp=1.2)
+        follower.drive()
+
+        # The first gap after a start sets no speed.
+        self.assertEqual(follower._speed, 0)
+
+
+    def test_turn_steering(self):
+        img_src = self._pictures_dir + "right_no_turn_12in.jpg"
+
+        steering = PurePursuitSteering(wheelbase=0.14, camera_offset=0.1)
+        follower = Follower(test_img_src=img_src, steering=steering)
+        follower._tag_data = TagObservation(x=0.05, z=0.3, timestamp=1.0)
+
+        # atan(0.14 * 2 * 0.05 / (0.05^2 + 0.4^2)), to the right.
+        self.assertAlmostEqual(follower.turn(), 94.924, places=3)
+
+
+    def test_turn_steering_rate_limited(self):
+        img_src = self._pictures_dir + "right_no_turn_12in.jpg"
+
+        steering = PurePursuitSteering(max_rate=100)
+        follower = Follower(test_img_src=img_src, steering=steering)
+        follower._tag_data = TagObservation(x=0, z=0.3, timestamp=1.0)
+        angles = [follower.turn()]
+        for timestamp in (1.1, 1.2, 1.3):
+            follower._tag_data = TagObservation(x=0.1, z=0,
+                                                timestamp=timestamp)
+            angles.append(follower.turn())
+
+        # The target is the rightmost angle, 135, reached at 10 degrees per
+        # 0.1 seconds.
+        for angle, expected in zip(angles, [90, 100, 110, 120]):
+            self.assertAlmostEqual(angle, expected)
+
+
     def test_opencv_to_wheels_straight_decision(self):
         img_src = self._pictures_dir + "no_tag.jpg"
 
@@ -119,5 +181,28 @@ class FollowerTest(unittest.TestCase):
         self.assertEqual(90, follower.opencv_to_wheels(None, None))
 
 
+    def test_timing(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+
+        follower = Follower(test_img_src=img_src, timing=True)
+        follower.follow()
+
+        follow_timer, tag_timer = follower.get_timers()
+        self.assertEqual(follow_timer.snapshot()['detect']['count'], 1)
+        self.assertEqual(tag_timer.snapshot()['total']['count'], 1)
+
+
+
+    def test_release_stops_actuators(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+
+        follower = Follower(test_img_src=img_src, async_actuators=True)
+        follower.follow()
+        follower.release()
+
+        self.assertEqual(follower._speed, 0)
+        self.assertFalse(follower._actuators.is_running())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+from os import path
+from time import sleep
+
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from framegrabber import FrameGrabber
+
+class CountingCapture:
+    def __init__(self, delay=0.001):
+        self.count = 0
+        self._delay = delay
+
+
+    def read(self, image=None):
+        sleep(self._delay)
+        self.count += 1
+        return True, self.count
+
+
+class StampedCapture(CountingCapture):
+    def get_frame_info(self):
+        return self.count * 10, self.count * 0.5
+
+
+class BufferCapture:
+    def __init__(self):
+        self.count = 0
+        self.allocations = 0
+
+
+    def read(self, image=None):
+        sleep(0.001)
+        if image is None:
+            image = [0]
+            self.allocations += 1
+        self.count += 1
+        image[0] = self.count
+        return True, image
+
+
+class FrameGrabberTest(unittest.TestCase):
+    def setUp(self):
+        self._capture = CountingCapture()
+        self._grabber = FrameGrabber(self._capture)
+
+
+    def tearDown(self):
+        self._grabber.stop()
+
+
+    def test_not_running_by_default(self):
+        self.assertFalse(self._grabber.is_running())
+
+
+    def test_start(self):
+        self._grabber.start()
+
+        self.assertTrue(self._grabber.is_running())
+
+
+    def test_stop(self):
+        self._grabber.start()
+        self._grabber.stop()
+
+        self.assertFalse(self._grabber.is_running())
+
+
+    def test_read_waits_for_first_frame(self):
+        self._grabber.start()
+
+        ret, frame, seq, timestamp = self._grabber.read()
+
+        self.assertTrue(ret)
+        self.assertTrue(seq >= 1)
+        self.assertTrue(timestamp > 0)
+
+
+    def test_read_returns_latest_frame(self):
+        self._grabber.start()
+        sleep(0.05)
+
+        ret, frame, seq, timestamp = self._grabber.read()
+
+        self.assertTrue(frame > 1)
+        self.assertEqual(frame, seq)
+
+
+    def test_read_newer_than_last_seq(self):
+        self._grabber.start()
+
+        first = self._grabber.read()[2]
+        second = self._grabber.read(last_seq=first)[2]
+
+        self.assertTrue(second > first)
+
+
+    def test_frame_info_without_capture_info(self):
+        self._grabber.start()
+        self._grabber.read()
+
+        self.assertEqual(self._grabber.get_frame_info(), None)
+
+
+    def test_frame_info_kept_with_frame(self):
+        grabber = FrameGrabber(StampedCapture())
+        grabber.start()
+        frame = grabber.read()[1]
+        sleep(0.02)
+        info = grabber.get_frame_info()
+        grabber.stop()
+
+        self.assertEqual(info, (frame * 10, frame * 0.5))
+
+
+    def test_read_timeout_when_stopped(self):
+        ret, frame, seq, timestamp = self._grabber.read(timeout=0.01)
+
+        self.assertFalse(ret)
+        self.assertEqual(frame, None)
+        self.assertEqual(seq, 0)
+
+
+    def test_held_frame_not_reused(self):
+        capture = BufferCapture()
+        grabber = FrameGrabber(capture)
+        grabber.start()
+
+        frame = grabber.read()[1]
+        value = frame[0]
+        sleep(0.05)
+        grabber.stop()
+
+        self.assertEqual(frame[0], value)
+        self.assertTrue(capture.count > grabber.BUFFERS)
+
+
+    def test_buffers_reused(self):
+        capture = BufferCapture()
+        grabber = FrameGrabber(capture)
+        grabber.start()
+        sleep(0.05)
+        grabber.stop()
+
+        self.assertTrue(capture.allocations <= grabber.BUFFERS)
+
+
+if __name__ == '__main__':
+    unittest.main()
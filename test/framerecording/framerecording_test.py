@@ -0,0 +1,226 @@
+from os import path
+
+import cv2
+import numpy as np
+import shutil
+import sys
+import tempfile
+import unittest
+from time import time
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from framerecording import (FrameRecorder, HEADER_SIZE, RecordingSource,
+                            load_recording)
+from framesource import ArraySource, open_source
+from tagrec import TagRecognition
+
+class FrameRecordingTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = path.join(self._dir, "run.frames")
+        self._frames = [np.full((4, 6, 3), value, np.uint8)
+                        for value in range(5)]
+
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+
+    def record(self, frames, start=0):
+        recorder = FrameRecorder(self._path)
+        for index, frame in enumerate(frames):
+            recorder.write(frame, (start + index) * 0.1, start + index + 1)
+        recorder.close()
+        return recorder
+
+
+    def test_load(self):
+        self.record(self._frames)
+
+        records = load_recording(self._path)
+
+        self.assertEqual(len(records), 5)
+        self.assertEqual(list(records['seq']), [1, 2, 3, 4, 5])
+        self.assertAlmostEqual(records['timestamp'][2], 0.2)
+        self.assertTrue(np.array_equal(records['frame'][3], self._frames[3]))
+
+
+    def test_append(self):
+        self.record(self._frames[:2])
+        recorder = self.record(self._frames[2:], start=2)
+
+        self.assertEqual(recorder.get_count(), 5)
+        self.assertEqual(list(load_recording(self._path)['seq']),
+                         [1, 2, 3, 4, 5])
+
+
+    def test_partial_record(self):
+        self.record(self._frames)
+        with open(self._path, 'ab') as recording_file:
+            recording_file.write(b'\0' * 10)
+
+        self.assertEqual(len(load_recording(self._path)), 5)
+
+        recorder = self.record(self._frames[:1], start=5)
+        self.assertEqual(recorder.get_count(), 6)
+        self.assertEqual(load_recording(self._path)['seq'][-1], 6)
+
+
+    def test_grayscale(self):
+        frame = np.arange(24, dtype=np.uint8).reshape((4, 6))
+        self.record([frame])
+
+        self.assertTrue(np.array_equal(load_recording(self._path)['frame'][0],
+                                       frame))
+
+
+    def test_shape_mismatch(self):
+        recorder = FrameRecorder(self._path)
+        recorder.write(self._frames[0], 0, 1)
+
+        with self.assertRaises(ValueError):
+            recorder.write(np.zeros((2, 2, 3), np.uint8), 0.1, 2)
+        recorder.close()
+
+
+    def test_append_shape_mismatch(self):
+        self.record(self._frames)
+
+        with self.assertRaises(ValueError):
+            FrameRecorder(self._path).write(np.zeros((2, 2, 3), np.uint8),
+                                            0, 1)
+
+
+    def test_not_a_recording(self):
+        with open(self._path, 'wb') as recording_file:
+            recording_file.write(b'\0' * HEADER_SIZE)
+
+        with self.assertRaises(IOError):
+            load_recording(self._path)
+
+
+    def test_missing(self):
+        with self.assertRaises(IOError):
+            RecordingSource(self._path).read()
+
+
+    def test_empty(self):
+        recorder = FrameRecorder(self._path)
+        recorder.close()
+
+        self.assertFalse(path.exists(self._path))
+
+
+    def test_replay(self):
+        self.record(self._frames)
+        source = RecordingSource(self._path)
+
+        frames = []
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame)
+
+        self.assertEqual(len(frames), 5)
+        self.assertTrue(np.array_equal(frames[4], self._frames[4]))
+        self.assertEqual(source.get_frame_info(), (5, 0.4))
+
+
+    def test_replay_read_only(self):
+        self.record(self._frames)
+        frame = RecordingSource(self._path).read()[1]
+
+        self.assertFalse(frame.flags.writeable)
+
+
+    def test_replay_loop(self):
+        self.record(self._frames[:2])
+        source = RecordingSource(self._path, loop=True)
+
+        seqs = [source.read() and source.get_frame_info()[0]
+                for _ in range(3)]
+
+        self.assertEqual(seqs, [1, 2, 1])
+
+
+    def test_replay_realtime(self):
+        self.record(self._frames[:3])
+        source = RecordingSource(self._path, realtime=True)
+
+        source.read()
+        start = time()
+        source.read()
+        source.read()
+
+        # The last frame was captured 0.2 seconds after the first.
+        self.assertTrue(time() - start >= 0.19)
+
+
+    def test_replay_resized(self):
+        self.record(self._frames)
+        source = RecordingSource(self._path)
+        source.set_size(3, 2)
+
+        self.assertEqual(source.read()[1].shape, (2, 3, 3))
+
+
+    def test_open_source(self):
+        self.assertTrue(isinstance(open_source(self._path), RecordingSource))
+
+
+    def test_record_detections(self):
+        img_src = FILE_PATH + "/../res/tag_pictures/straight_no_turn_5in.jpg"
+        frame = cv2.resize(cv2.imread(img_src), (720, 480))
+        recorder = FrameRecorder(self._path)
+        tag = TagRecognition(resolution=480, marker_length=0.025,
+                             source=ArraySource([frame] * 3),
+                             recorder=recorder)
+        live = [tag.detect() for _ in range(3)]
+        recorder.close()
+
+        replay = TagRecognition(resolution=480, marker_length=0.025,
+                                source=RecordingSource(self._path))
+        replayed = [replay.detect() for _ in range(3)]
+
+        self.assertEqual(recorder.get_count(), 3)
+        self.assertEqual(list(load_recording(self._path)['seq']), [1, 2, 3])
+        for live_data, replayed_data in zip(live, replayed):
+            self.assertAlmostEqual(live_data.z, replayed_data.z)
+            self.assertEqual(live_data.timestamp, replayed_data.timestamp)
+            self.assertEqual(live_data.seq, replayed_data.seq)
+        self.assertEqual(replay.detect(), None)
+
+
+    def test_replay_keeps_frame_info(self):
+        img_src = FILE_PATH + "/../res/tag_pictures/straight_no_turn_5in.jpg"
+        frame = cv2.resize(cv2.imread(img_src), (720, 480))
+        recorder = FrameRecorder(self._path)
+        for seq in (7, 8):
+            recorder.write(frame, seq * 0.5, seq)
+        recorder.close()
+
+        replay = TagRecognition(resolution=480, marker_length=0.025,
+                                source=RecordingSource(self._path))
+        replayed = [replay.detect() for _ in range(2)]
+
+        self.assertEqual([tag_data.seq for tag_data in replayed], [7, 8])
+        self.assertEqual([tag_data.timestamp for tag_data in replayed],
+                         [3.5, 4.0])
+
+        # The capture thread skips frames, but each frame keeps its own
+        # sequence number and capture time.
+        replay = TagRecognition(resolution=480, marker_length=0.025,
+                                threaded=True,
+                                source=RecordingSource(self._path, loop=True))
+        tag_data = replay.detect()
+        replay.release()
+
+        self.assertTrue(tag_data.seq in (7, 8))
+        self.assertEqual(tag_data.timestamp, tag_data.seq * 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,238 @@
+from os import path
+
+import cv2
+import numpy
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from framesource import (ArraySource, DeviceSource, ImageDirectorySource,
+                         VideoFileSource, open_source)
+
+class FakeCapture:
+    """A camera that delivers a fixed BGR frame in the supported formats."""
+
+    FRAME = numpy.dstack([numpy.full((90, 160), value, dtype=numpy.uint8)
+                          for value in (10, 20, 30)])
+    FORMATS = ()
+
+    def __init__(self, index):
+        self._properties = {cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*'MJPG'),
+                            cv2.CAP_PROP_CONVERT_RGB: 1,
+                            cv2.CAP_PROP_FRAME_WIDTH: 160,
+                            cv2.CAP_PROP_FRAME_HEIGHT: 90}
+
+
+    def isOpened(self):
+        return True
+
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FOURCC and value not in [
+                cv2.VideoWriter_fourcc(*name) for name in self.FORMATS]:
+            return False
+        self._properties[prop] = value
+        return True
+
+
+    def get(self, prop):
+        return self._properties[prop]
+
+
+    def read(self, image=None):
+        gray = cv2.cvtColor(self.FRAME, cv2.COLOR_BGR2GRAY)
+        fourcc = self._properties[cv2.CAP_PROP_FOURCC]
+        if self._properties[cv2.CAP_PROP_CONVERT_RGB]:
+            return True, self.FRAME.copy()
+        if fourcc == cv2.VideoWriter_fourcc(*'GREY'):
+            return True, gray.reshape((1, -1))
+        if fourcc == cv2.VideoWriter_fourcc(*'YUYV'):
+            chroma = numpy.full(gray.shape, 128, dtype=numpy.uint8)
+            return True, numpy.dstack((gray, chroma))
+        return True, self.FRAME.copy()
+
+
+    def release(self):
+        pass
+
+VIDEO_CAPTURE = cv2.VideoCapture
+
+class FrameSourceTest(unittest.TestCase):
+    def setUp(self):
+        self._pictures_dir = FILE_PATH + "/../res/tag_pictures/"
+        self._frames = [numpy.full((90, 160, 3), i, dtype=numpy.uint8)
+                        for i in range(3)]
+
+
+    def tearDown(self):
+        cv2.VideoCapture = VIDEO_CAPTURE
+
+
+    def fake_camera(self, formats):
+        FakeCapture.FORMATS = formats
+        cv2.VideoCapture = FakeCapture
+
+
+    def test_not_opened_on_creation(self):
+        source = DeviceSource(99)
+
+        self.assertFalse(source.is_opened())
+
+
+    def test_opened_on_first_read(self):
+        source = ArraySource(self._frames)
+        source.read()
+
+        self.assertTrue(source.is_opened())
+
+
+    def test_release(self):
+        source = ArraySource(self._frames)
+        source.read()
+        source.release()
+
+        self.assertFalse(source.is_opened())
+
+
+    def test_missing_device(self):
+        source = DeviceSource(99)
+
+        with self.assertRaises(IOError):
+            source.read()
+
+
+    def test_array_frames_in_order(self):
+        source = ArraySource(self._frames)
+
+        values = [source.read()[1][0][0][0] for i in range(3)]
+
+        self.assertEqual(values, [0, 1, 2])
+
+
+    def test_array_end_of_frames(self):
+        source = ArraySource(self._frames[:1])
+        source.read()
+
+        self.assertEqual(source.read(), (False, None))
+
+
+    def test_array_loop(self):
+        source = ArraySource(iter(self._frames[:2]), loop=True)
+
+        values = [source.read()[1][0][0][0] for i in range(4)]
+
+        self.assertEqual(values, [0, 1, 0, 1])
+
+
+    def test_array_generator(self):
+        source = ArraySource(frame for frame in self._frames)
+
+        self.assertTrue(source.read()[0])
+
+
+    def test_array_resized(self):
+        source = ArraySource(self._frames)
+        source.set_size(176, 144)
+
+        self.assertEqual(source.read()[1].shape, (144, 176, 3))
+
+
+    def test_image_directory(self):
+        source = ImageDirectorySource(self._pictures_dir)
+        source.set_size(160, 90)
+
+        ret, frame = source.read()
+
+        self.assertTrue(ret)
+        self.assertEqual(frame.shape, (90, 160, 3))
+
+
+    def test_image_directory_missing(self):
+        source = ImageDirectorySource(self._pictures_dir + "missing")
+
+        with self.assertRaises(IOError):
+            source.read()
+
+
+    def test_video_file_missing(self):
+        source = VideoFileSource(self._pictures_dir + "missing.avi")
+
+        with self.assertRaises(IOError):
+            source.read()
+
+
+    def test_open_source_device(self):
+        self.assertTrue(isinstance(open_source(0), DeviceSource))
+        self.assertTrue(isinstance(open_source("1"), DeviceSource))
+
+
+    def test_open_source_directory(self):
+        self.assertTrue(isinstance(open_source(self._pictures_dir),
+                                   ImageDirectorySource))
+
+
+    def test_open_source_video(self):
+        self.assertTrue(isinstance(open_source("run.avi"), VideoFileSource))
+
+
+    def test_device_bgr(self):
+        self.fake_camera(('GREY', 'YUYV'))
+        source = DeviceSource(0)
+
+        frame = source.read()[1]
+
+        self.assertEqual(source.get_pixel_format(), 'BGR')
+        self.assertEqual(frame.shape, (90, 160, 3))
+
+
+    def test_device_grey(self):
+        self.fake_camera(('GREY',))
+        source = DeviceSource(0, pixel_format='GREY')
+
+        frame = source.read()[1]
+
+        self.assertEqual(source.get_pixel_format(), 'GREY')
+        self.assertTrue(numpy.array_equal(
+                frame, cv2.cvtColor(FakeCapture.FRAME, cv2.COLOR_BGR2GRAY)))
+
+
+    def test_device_yuyv(self):
+        self.fake_camera(('YUYV',))
+        source = DeviceSource(0, pixel_format='yuyv')
+
+        frame = source.read()[1]
+
+        self.assertEqual(source.get_pixel_format(), 'YUYV')
+        self.assertTrue(numpy.array_equal(
+                frame, cv2.cvtColor(FakeCapture.FRAME, cv2.COLOR_BGR2GRAY)))
+
+
+    def test_device_luma_into_image(self):
+        self.fake_camera(('YUYV',))
+        source = DeviceSource(0, pixel_format='YUYV')
+        image = numpy.zeros((90, 160), dtype=numpy.uint8)
+
+        frame = source.read(image)[1]
+
+        self.assertTrue(frame is image)
+
+
+    def test_device_format_fallback(self):
+        self.fake_camera(())
+        source = DeviceSource(0, pixel_format='GREY')
+
+        frame = source.read()[1]
+
+        self.assertEqual(source.get_pixel_format(), 'BGR')
+        self.assertEqual(frame.shape, (90, 160, 3))
+
+
+    def test_device_unknown_format(self):
+        with self.assertRaises(ValueError):
+            DeviceSource(0, pixel_format='NV12')
+
+
+if __name__ == '__main__':
+    unittest.main()
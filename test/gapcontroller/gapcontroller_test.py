@@ -0,0 +1,134 @@
+from os import path
+
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from gapcontroller import BandGapController, PIGapController
+
+class BandGapControllerTest(unittest.TestCase):
+    def setUp(self):
+        self._controller = BandGapController(0.1, 45, 55, 0.1)
+
+
+    def test_stop(self):
+        self.assertEqual(self._controller.update(0.1, 0), 0)
+
+
+    def test_match(self):
+        self.assertEqual(self._controller.update(0.15, 0), 45)
+
+
+    def test_ramp(self):
+        speeds = [self._controller.update(0.5, index * 0.11)
+                  for index in range(4)]
+
+        self.assertEqual(speeds, [0, 1, 2, 3])
+
+
+    def test_ramp_waits(self):
+        self._controller.update(0.5, 0)
+
+        self.assertEqual(self._controller.update(0.5, 0.05), 0)
+
+
+    def test_ramp_limit(self):
+        self._controller.update(0.15, 0)
+        speeds = [self._controller.update(0.5, index * 0.11)
+                  for index in range(1, 15)]
+
+        self.assertEqual(max(speeds), 55)
+
+
+    def test_reset(self):
+        self._controller.update(0.15, 0)
+        self._controller.reset()
+
+        self.assertEqual(self._controller.update(0.5, 1), 0)
+
+
+class PIGapControllerTest(unittest.TestCase):
+    def setUp(self):
+        self._controller = PIGapController(target_gap=0.14, min_gap=0.09,
+                                           max_speed=55, max_accel=100)
+
+
+    def drive(self, gaps, dt=0.05, start=0):
+        return [self._controller.update(gap, start + index * dt)
+                for index, gap in enumerate(gaps)]
+
+
+    def test_first_measurement(self):
+        self.assertEqual(self._controller.update(0.5, 0), 0)
+
+
+    def test_catch_up(self):
+        speeds = self.drive([0.5] * 20)
+
+        # The band controller would take 5.5 seconds to get here.
+        self.assertEqual(speeds[-1], 55)
+        self.assertTrue(speeds.index(55) * 0.05 < 1)
+
+
+    def test_accel_limit(self):
+        speeds = self.drive([0.5] * 3)
+
+        self.assertEqual(speeds, [0, 5, 10])
+
+
+    def test_stop_within_min_gap(self):
+        self.drive([0.5] * 10)
+
+        self.assertEqual(self._controller.update(0.08, 0.5), 0)
+
+
+    def test_hold_gap(self):
+        speeds = self.drive([0.14] * 20)
+
+        self.assertEqual(speeds[-1], 0)
+
+
+    def test_feed_forward(self):
+        # The gap stays at the target while opening: the leader is driving
+        # away, so the follower should still speed up.
+        gaps = [0.14 + 0.002 * index for index in range(10)]
+        self.drive(gaps)
+
+        self.assertTrue(self._controller.get_gap_rate() > 0.03)
+        self.assertTrue(self._controller.update(0.16, 0.5) > 0)
+
+
+    def test_no_band_oscillation(self):
+        speeds = self.drive([0.18, 0.19] * 20)
+
+        # Within the band, speed changes smoothly rather than snapping.
+        changes = [abs(b - a) for a, b in zip(speeds, speeds[1:])]
+        self.assertTrue(max(changes) <= 5)
+
+
+    def test_no_windup(self):
+        self.drive([1.0] * 100)
+        speeds = self.drive([0.14] * 40, start=10)
+
+        # Without the limit on the integral, the speed would stay high for
+        # seconds after reaching the target.
+        self.assertTrue(speeds[-1] < 5)
+
+
+    def test_repeated_measurement(self):
+        self.drive([0.5] * 5)
+        speed = self._controller.update(0.5, 0.2)
+
+        self.assertEqual(self._controller.update(0.4, 0.2), speed)
+
+
+    def test_stale(self):
+        self.drive([0.5] * 20)
+
+        self.assertEqual(self._controller.update(0.5, 5), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from os import path
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from imagecache import ImageCache
+
+class ImageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._pictures_dir = FILE_PATH + "/../res/tag_pictures/"
+        self._img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        self._size = (160, 90)
+
+
+    def test_decoded_image(self):
+        cache = ImageCache()
+
+        image = cache.get(self._img_src, self._size)
+
+        self.assertEqual(image.shape, (90, 160))
+
+
+    def test_miss_then_hit(self):
+        cache = ImageCache()
+
+        first = cache.get(self._img_src, self._size)
+        second = cache.get(self._img_src, self._size)
+
+        self.assertTrue(first is second)
+        self.assertEqual(cache.get_stats()['misses'], 1)
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+
+    def test_size_is_part_of_key(self):
+        cache = ImageCache()
+
+        cache.get(self._img_src, self._size)
+        image = cache.get(self._img_src, (176, 144))
+
+        self.assertEqual(image.shape, (144, 176))
+        self.assertEqual(cache.get_stats()['misses'], 2)
+
+
+    def test_modified_file_decoded_again(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            img_src = path.join(temp_dir, "tag.jpg")
+            shutil.copy(self._img_src, img_src)
+            cache = ImageCache()
+
+            cache.get(img_src, self._size)
+            os.utime(img_src, (0, 0))
+            cache.get(img_src, self._size)
+
+            self.assertEqual(cache.get_stats()['misses'], 2)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        cache = ImageCache(max_bytes=160 * 90 * 2)
+        other_src = self._pictures_dir + "no_tag.jpg"
+        third_src = self._pictures_dir + "tag_center.jpg"
+
+        cache.get(self._img_src, self._size)
+        cache.get(other_src, self._size)
+        cache.get(self._img_src, self._size)
+        cache.get(third_src, self._size)
+        cache.get(self._img_src, self._size)
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['hits'], 2)
+        self.assertTrue(stats['bytes'] <= 160 * 90 * 2)
+
+
+    def test_zero_memory_cap(self):
+        cache = ImageCache(max_bytes=0)
+
+        cache.get(self._img_src, self._size)
+        cache.get(self._img_src, self._size)
+
+        self.assertEqual(cache.get_stats()['entries'], 0)
+        self.assertEqual(cache.get_stats()['misses'], 2)
+
+
+    def test_clear(self):
+        cache = ImageCache()
+
+        cache.get(self._img_src, self._size)
+        cache.clear()
+
+        self.assertEqual(cache.get_stats()['entries'], 0)
+        self.assertEqual(cache.get_stats()['bytes'], 0)
+
+
+    def test_invalid_path(self):
+        cache = ImageCache()
+
+        with self.assertRaises(IOError):
+            cache.get(self._pictures_dir + "missing.jpg", self._size)
+
+
+    def test_directory_path(self):
+        cache = ImageCache()
+
+        with self.assertRaises(IOError):
+            cache.get(self._pictures_dir, self._size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from os import path
+
+import sys
+import unittest
+from time import sleep, time
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from loopscheduler import LoopScheduler
+
+class LoopSchedulerTest(unittest.TestCase):
+    def test_period(self):
+        self.assertAlmostEqual(LoopScheduler(20).get_period(), 0.05)
+
+
+    def test_invalid_frequency(self):
+        with self.assertRaises(ValueError):
+            LoopScheduler(0)
+
+
+    def test_rate(self):
+        scheduler = LoopScheduler(100)
+
+        start = time()
+        scheduler.run(lambda: None, cycles=10)
+        elapsed = time() - start
+
+        self.assertTrue(elapsed >= 0.099)
+        self.assertEqual(scheduler.get_stats()['cycles'], 10)
+
+
+    def test_sleeps_between_cycles(self):
+        scheduler = LoopScheduler(100)
+        scheduler.run(lambda: None, cycles=5)
+
+        snapshot = scheduler.get_timer().snapshot()
+        self.assertEqual(snapshot['sleep']['count'], 5)
+        self.assertTrue(snapshot['sleep']['mean'] > 0.005)
+        self.assertTrue(snapshot['total']['mean'] >= 0.0099)
+
+
+    def test_overrun(self):
+        scheduler = LoopScheduler(100)
+        scheduler.run(lambda: sleep(0.025), cycles=3)
+
+        stats = scheduler.get_stats()
+        self.assertEqual(stats['overruns'], 3)
+        self.assertTrue(stats['missed'] >= 6)
+
+
+    def test_no_catch_up(self):
+        cycles = []
+        scheduler = LoopScheduler(100)
+
+        def cycle():
+            cycles.append(time())
+            if len(cycles) == 1:
+                sleep(0.05)
+
+        scheduler.run(cycle, cycles=3)
+
+        # The cycles after the overrun are still a period apart.
+        self.assertTrue(cycles[2] - cycles[1] >= 0.009)
+
+
+    def test_lateness(self):
+        scheduler = LoopScheduler(100)
+        scheduler.run(lambda: None, cycles=5)
+
+        snapshot = scheduler.get_timer().snapshot()
+        self.assertEqual(snapshot['lateness']['count'], 5)
+        self.assertTrue(snapshot['lateness']['max'] >= 0)
+
+
+    def test_stop(self):
+        scheduler = LoopScheduler(1000)
+        scheduler.run(scheduler.stop)
+
+        self.assertEqual(scheduler.get_stats()['cycles'], 1)
+
+
+    def test_wait(self):
+        scheduler = LoopScheduler(100)
+        scheduler.wait()
+        start = time()
+        scheduler.wait()
+
+        self.assertTrue(time() - start >= 0.009)
+        self.assertEqual(scheduler.get_stats()['cycles'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
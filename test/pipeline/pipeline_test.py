@@ -0,0 +1,171 @@
+from os import path
+
+import cv2
+import numpy as np
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from framesource import ArraySource
+from pipeline import FrameRing, PerceptionPipeline
+from tagrec import TagRecognition
+
+class FrameRingTest(unittest.TestCase):
+    def setUp(self):
+        self._ring = FrameRing(3, (4, 6, 3))
+
+
+    def publish(self, seq):
+        index = self._ring.acquire_write()
+        self._ring.get_frame(index)[:] = seq
+        self._ring.publish(index, seq, seq * 0.1)
+        return index
+
+
+    def test_read_in_place(self):
+        index = self.publish(1)
+
+        read_index, seq, timestamp = self._ring.acquire_read()
+        frame = self._ring.get_frame(read_index)
+
+        self.assertEqual(read_index, index)
+        self.assertEqual(seq, 1)
+        self.assertAlmostEqual(timestamp, 0.1)
+        self.assertTrue(np.all(frame == 1))
+        self.assertTrue(np.may_share_memory(frame,
+                                            self._ring.get_frame(index)))
+
+
+    def test_read_newest(self):
+        self.publish(1)
+        self.publish(2)
+
+        self.assertEqual(self._ring.acquire_read()[1], 2)
+        self.assertEqual(self._ring.get_counts(), (2, 1))
+
+
+    def test_write_drops_oldest(self):
+        first = self.publish(1)
+        self.publish(2)
+        self.publish(3)
+
+        self.assertEqual(self._ring.acquire_write(), first)
+        self.assertEqual(self._ring.get_counts(), (3, 1))
+
+
+    def test_write_skips_read_slot(self):
+        self.publish(1)
+        index = self._ring.acquire_read()[0]
+        self.publish(2)
+        self.publish(3)
+
+        self.assertNotEqual(self._ring.acquire_write(), index)
+
+
+    def test_write_all_slots_used(self):
+        for _ in range(3):
+            self._ring.acquire_write()
+
+        self.assertEqual(self._ring.acquire_write(), None)
+
+
+    def test_release(self):
+        self.publish(1)
+        index = self._ring.acquire_read()[0]
+        self._ring.release(index)
+
+        self.assertEqual(self._ring.acquire_write(), index)
+
+
+    def test_read_stopped(self):
+        self._ring.stop()
+
+        self.assertFalse(self._ring.is_running())
+        self.assertEqual(self._ring.acquire_read(), None)
+
+
+class PerceptionPipelineTest(unittest.TestCase):
+    def setUp(self):
+        img_src = FILE_PATH + "/../res/tag_pictures/straight_no_turn_5in.jpg"
+        self._frame = cv2.resize(cv2.imread(img_src), (720, 480))
+
+
+    def test_detect(self):
+        pipeline = PerceptionPipeline(ArraySource([self._frame], loop=True),
+                                      marker_length=0.025)
+        tag_data = pipeline.detect(timeout=10)
+        pipeline.stop()
+
+        expected = TagRecognition(marker_length=0.025).detect_frame(
+                self._frame)
+        self.assertNotEqual(tag_data, None)
+        self.assertAlmostEqual(tag_data.z, expected.z, delta=0.001)
+        self.assertEqual(tag_data.seq, pipeline.get_frame_info()[0])
+        self.assertEqual(tag_data.timestamp, pipeline.get_frame_info()[1])
+
+
+    def test_newest_result(self):
+        pipeline = PerceptionPipeline(ArraySource([self._frame], loop=True),
+                                      marker_length=0.025)
+        first = pipeline.detect(timeout=10)
+        second = pipeline.detect(timeout=10)
+        pipeline.stop()
+
+        self.assertTrue(second.seq > first.seq)
+
+
+    def test_frame_age(self):
+        pipeline = PerceptionPipeline(ArraySource([self._frame], loop=True),
+                                      marker_length=0.025)
+        pipeline.detect(timeout=10)
+        pipeline.stop()
+
+        snapshot = pipeline.get_timer().snapshot()
+        self.assertEqual(snapshot['detected']['count'], 1)
+        self.assertTrue(snapshot['consumed']['max']
+                        >= snapshot['detected']['max'] > 0)
+
+
+    def test_drops_stale_frames(self):
+        pipeline = PerceptionPipeline(ArraySource([self._frame], loop=True),
+                                      marker_length=0.025)
+        pipeline.detect(timeout=10)
+        pipeline.detect(timeout=10)
+        pipeline.stop()
+
+        stats = pipeline.get_stats()
+        # Capturing from memory is much faster than detecting.
+        self.assertTrue(stats['dropped'] > 0)
+        self.assertTrue(stats['captured'] > stats['detected'])
+
+
+    def test_no_tag(self):
+        pipeline = PerceptionPipeline(
+                ArraySource([np.zeros((480, 720, 3), np.uint8)], loop=True))
+
+        self.assertEqual(pipeline.detect(timeout=10), None)
+        self.assertTrue(pipeline.get_frame_info()[0] > 0)
+        pipeline.stop()
+
+
+    def test_source_out_of_frames(self):
+        pipeline = PerceptionPipeline(ArraySource([]))
+
+        self.assertEqual(pipeline.detect(), None)
+        self.assertFalse(pipeline.is_running())
+
+
+    def test_source_not_opened_on_creation(self):
+        source = ArraySource([self._frame])
+        PerceptionPipeline(source)
+
+        self.assertFalse(source.is_opened())
+
+
+    def test_img_src(self):
+        pipeline = PerceptionPipeline(ArraySource([]))
+
+        with self.assertRaises(ValueError):
+            pipeline.detect(img_src="tag.jpg")
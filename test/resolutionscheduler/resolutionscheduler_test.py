@@ -0,0 +1,111 @@
+from os import path
+
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from resolutionscheduler import ResolutionScheduler
+
+RESOLUTIONS = {
+        480: [720, 480],
+        240: [426, 240],
+        144: [176, 144]
+}
+
+class ResolutionSchedulerTest(unittest.TestCase):
+    def update(self, scheduler, resolution, tag_pixels, frames, distance=0.3,
+               latency=0.01):
+        for _ in range(frames):
+            resolution = scheduler.update(resolution, tag_pixels, distance,
+                                          latency)
+        return resolution
+
+
+    def test_keeps_resolution_in_band(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1)
+
+        self.assertEqual(self.update(scheduler, 240, 40, 10), 240)
+
+
+    def test_lowers_resolution_for_large_tag(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1)
+
+        # 100 pixels at 720 wide is about 24 pixels at 176 wide.
+        self.assertEqual(self.update(scheduler, 480, 100, 1), 144)
+
+
+    def test_raises_resolution_for_small_tag(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1)
+
+        self.assertEqual(self.update(scheduler, 144, 8, 1), 480)
+
+
+    def test_tag_too_small_everywhere(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1)
+
+        self.assertEqual(self.update(scheduler, 144, 1, 1), 480)
+
+
+    def test_switch_hysteresis(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=3)
+
+        self.assertEqual(self.update(scheduler, 480, 100, 2), 480)
+        self.assertEqual(self.update(scheduler, 480, 100, 1), 144)
+
+
+    def test_switch_hysteresis_reset(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=3)
+
+        self.update(scheduler, 480, 100, 2)
+        self.update(scheduler, 480, 40, 1)
+
+        self.assertEqual(self.update(scheduler, 480, 100, 2), 480)
+
+
+    def test_latency_budget(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, latency_budget=0.02,
+                                        switch_frames=1)
+
+        # 144p takes 10ms, so 480p is expected to take about 136ms.
+        self.assertEqual(self.update(scheduler, 144, 12, 1), 144)
+
+
+    def test_latency_over_budget(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, latency_budget=0.02,
+                                        switch_frames=1)
+
+        self.assertEqual(self.update(scheduler, 480, 40, 1, latency=0.05),
+                         240)
+
+
+    def test_get_latency(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS)
+
+        self.assertEqual(scheduler.get_latency(480), None)
+        scheduler.update(240, 40, 0.3, 0.01)
+
+        self.assertAlmostEqual(scheduler.get_latency(240), 0.01)
+        self.assertAlmostEqual(scheduler.get_latency(480),
+                               0.01 * 720 * 480 / (426 * 240))
+
+
+    def test_lost_tag_raises_resolution(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1,
+                                        lost_frames=3)
+
+        self.assertEqual(self.update(scheduler, 144, None, 2), 144)
+        self.assertEqual(self.update(scheduler, 144, None, 1), 240)
+
+
+    def test_lost_close_tag_keeps_resolution(self):
+        scheduler = ResolutionScheduler(RESOLUTIONS, switch_frames=1,
+                                        lost_frames=1)
+
+        self.assertEqual(self.update(scheduler, 144, None, 5, distance=0.05),
+                         144)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,74 @@
+echo "Running Actuators tests"
+python -m unittest discover -s actuators -p '*_test.py'
+
+echo "Running Batch Detection tests"
+python -m unittest discover -s batchdetect -p '*_test.py'
+
+echo "Running Calibration tests"
+python -m unittest discover -s calibration -p '*_test.py'
+
 echo "Running Camera tests"
 python -m unittest discover -s camera -p '*_test.py'
 
+echo "Running Detector Profile tests"
+python -m unittest discover -s detectorprofile -p '*_test.py'
+
+echo "Running Detector Tuner tests"
+python -m unittest discover -s detectortuner -p '*_test.py'
+
 echo "Running Follower tests"
 python -m unittest discover -s follower -p '*_test.py'
 
+echo "Running FrameGrabber tests"
+python -m unittest discover -s framegrabber -p '*_test.py'
+
+echo "Running FrameRecording tests"
+python -m unittest discover -s framerecording -p '*_test.py'
+
+echo "Running FrameSource tests"
+python -m unittest discover -s framesource -p '*_test.py'
+
+echo "Running GapController tests"
+python -m unittest discover -s gapcontroller -p '*_test.py'
+
+echo "Running ImageCache tests"
+python -m unittest discover -s imagecache -p '*_test.py'
+
 echo "Running InputController tests"
 python -m unittest discover -s inputcontroller -p '*_test.py'
 
 echo "Running Leader tests"
 python -m unittest discover -s leader -p '*_test.py'
 
+echo "Running LoopScheduler tests"
+python -m unittest discover -s loopscheduler -p '*_test.py'
+
 echo "Running Main tests"
 python -m unittest discover -s main -p '*_test.py'
 
+echo "Running PerceptionPipeline tests"
+python -m unittest discover -s pipeline -p '*_test.py'
+
+echo "Running ResolutionScheduler tests"
+python -m unittest discover -s resolutionscheduler -p '*_test.py'
+
+echo "Running SmartCamera tests"
+python -m unittest discover -s smartcamera -p '*_test.py'
+
+echo "Running StageTimer tests"
+python -m unittest discover -s stagetimer -p '*_test.py'
+
+echo "Running Steering tests"
+python -m unittest discover -s steering -p '*_test.py'
+
+echo "Running Synthetic Dataset tests"
+python -m unittest discover -s tagdataset -p '*_test.py'
+
+echo "Running TagObservation tests"
+python -m unittest discover -s tagobservation -p '*_test.py'
+
 echo "Running TagRecognition tests"
 python -m unittest discover -s tagrec -p '*_test.py'
+
+echo "Running TagTracker tests"
+python -m unittest discover -s tagtracker -p '*_test.py'
@@ -0,0 +1,250 @@
+from os import path
+
+import numpy as np
+import sys
+import unittest
+from time import sleep
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from smartcamera import (ClockAligner, MessageParser, SmartCamera,
+                         SmartCameraSimulator, parse_stamp,
+                         quaternion_to_rvec, rvec_to_quaternion)
+from stagetimer import StageTimer
+from tagrec import TagRecognition, single_tag_geometry
+
+RVEC = np.array([0.3, -0.4, 0.1])
+TVEC = np.array([0.02, -0.01, 0.15])
+
+class MessageParserTest(unittest.TestCase):
+    def setUp(self):
+        self._parser = MessageParser()
+
+
+    def test_detail(self):
+        frames = self._parser.feed(
+                b'D3 U42 20.0 -10.0 150.0 25 25 1 1 0 0 0 extra\n', 5.0)
+
+        self.assertEqual(len(frames), 1)
+        detection = frames[0].detections[0]
+        self.assertEqual(detection.marker_id, 42)
+        self.assertEqual(detection.tvec, (0.02, -0.01, 0.15))
+        self.assertEqual(detection.quaternion, (1, 0, 0, 0))
+        self.assertEqual(frames[0].arrival, 5.0)
+
+
+    def test_normal(self):
+        frames = self._parser.feed(b'N3 7 0 0 100 25 25 1\n', 0)
+
+        self.assertEqual(frames[0].detections[0].quaternion, None)
+
+
+    def test_split_line(self):
+        message = b'D3 U2 20 -10 150 25 25 1 1 0 0 0\n'
+
+        self.assertEqual(self._parser.feed(message[:9], 0), [])
+        self.assertEqual(len(self._parser.feed(message[9:], 0)), 1)
+
+
+    def test_marked_frame(self):
+        frames = self._parser.feed(b'MARK START\n'
+                                   b'N3 U1 0 0 100 25 25 1\n'
+                                   b'N3 U2 0 0 200 25 25 1\n', 0)
+        self.assertEqual(frames, [])
+
+        frames = self._parser.feed(b'MARK STOP\n', 0)
+        self.assertEqual([detection.marker_id
+                          for detection in frames[0].detections], [1, 2])
+
+
+    def test_empty_marked_frame(self):
+        frames = self._parser.feed(b'MARK START\nMARK STOP\n', 0)
+
+        self.assertEqual(frames[0].detections, [])
+
+
+    def test_stamp(self):
+        frames = self._parser.feed(
+                b'12/01:02:03.500 N3 U1 0 0 100 25 25 1\n', 0)
+
+        self.assertEqual(frames[0].number, 12)
+        self.assertAlmostEqual(frames[0].camera_time, 3723.5)
+
+
+    def test_parse_stamp(self):
+        self.assertEqual(parse_stamp(b'12'), (12, None))
+        self.assertEqual(parse_stamp(b'00:00:01.250'), (None, 1.25))
+
+
+    def test_ignored(self):
+        frames = self._parser.feed(b'OK\nD3 U1 0 0\nINF ready\n', 0)
+
+        self.assertEqual(frames, [])
+        self.assertEqual(self._parser.get_ignored(), 3)
+
+
+    def test_long_line(self):
+        self._parser.feed(b'x' * (MessageParser.MAX_LINE + 1), 0)
+        frames = self._parser.feed(b'N3 U1 0 0 100 25 25 1\n', 0)
+
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(self._parser.get_ignored(), 1)
+
+
+class ClockAlignerTest(unittest.TestCase):
+    def test_least_delayed(self):
+        aligner = ClockAligner()
+        aligner.update(10.0, 110.05)
+        aligner.update(11.0, 111.01)
+        aligner.update(12.0, 112.03)
+
+        self.assertAlmostEqual(aligner.to_host(13.0), 113.01)
+
+
+    def test_window(self):
+        aligner = ClockAligner(window=2)
+        aligner.update(10.0, 110.0)
+        aligner.update(11.0, 111.1)
+        aligner.update(12.0, 112.1)
+
+        self.assertAlmostEqual(aligner.to_host(13.0), 113.1)
+
+
+    def test_jump(self):
+        aligner = ClockAligner()
+        aligner.update(10.0, 110.0)
+        aligner.update(0.0, 111.0)
+
+        self.assertAlmostEqual(aligner.to_host(1.0), 112.0)
+
+
+    def test_no_update(self):
+        self.assertEqual(ClockAligner().to_host(1.0), None)
+
+
+class QuaternionTest(unittest.TestCase):
+    def test_round_trip(self):
+        rvec = quaternion_to_rvec(rvec_to_quaternion(RVEC))
+
+        self.assertTrue(np.allclose(rvec, RVEC))
+
+
+    def test_negated(self):
+        quaternion = tuple(-value for value in rvec_to_quaternion(RVEC))
+
+        self.assertTrue(np.allclose(quaternion_to_rvec(quaternion), RVEC))
+
+
+    def test_identity(self):
+        self.assertTrue(np.allclose(quaternion_to_rvec((1, 0, 0, 0)), 0))
+
+
+class SmartCameraTest(unittest.TestCase):
+    def setUp(self):
+        self._simulator = SmartCameraSimulator()
+        self._camera = SmartCamera(self._simulator.get_port())
+        self._camera.open()
+
+
+    def tearDown(self):
+        self._camera.release()
+        self._simulator.close()
+
+
+    def test_same_as_local(self):
+        self._simulator.send_frame([(2, RVEC, TVEC)])
+
+        tag_data = self._camera.detect(timeout=1)
+        object_x, object_z, direction, yaw = single_tag_geometry(RVEC, TVEC)
+
+        self.assertAlmostEqual(tag_data.x, object_x, places=5)
+        self.assertAlmostEqual(tag_data.z, object_z, places=5)
+        self.assertAlmostEqual(tag_data.direction, direction, places=4)
+        self.assertAlmostEqual(tag_data.yaw, yaw, places=3)
+        self.assertEqual(tag_data.decision,
+                         TagRecognition().make_decision(direction))
+        self.assertEqual(tag_data.marker_id, 2)
+        self.assertEqual(self._camera.get_history().latest(), tag_data)
+
+
+    def test_newest_frame(self):
+        self._simulator.send_frame([(1, RVEC, TVEC)], number=1)
+        self._simulator.send_frame([(2, RVEC, TVEC)], number=2)
+
+        tag_data = self._camera.detect(timeout=1)
+
+        self.assertEqual(tag_data.marker_id, 2)
+        self.assertEqual(tag_data.seq, 2)
+
+
+    def test_frame_without_tag(self):
+        self._simulator.send_frame([], number=5)
+
+        self.assertEqual(self._camera.detect(timeout=1), None)
+        self.assertEqual(self._camera.get_frame_info()[0], 5)
+
+
+    def test_timeout(self):
+        self.assertEqual(self._camera.detect(timeout=0.01), None)
+        self.assertEqual(self._camera.get_stats()['frames'], 0)
+
+
+    def test_timeout_not_timed(self):
+        camera = SmartCamera(self._simulator.get_port(), timing=True)
+        camera.open()
+        self.assertEqual(camera.detect(timeout=0.01), None)
+        self.assertEqual(camera.get_timer().snapshot(), {})
+
+        self._simulator.send_frame([(2, RVEC, TVEC)])
+        camera.detect(timeout=1)
+        camera.release()
+
+        snapshot = camera.get_timer().snapshot()
+        self.assertEqual(snapshot['read']['count'], 1)
+        self.assertEqual(snapshot[StageTimer.TOTAL]['count'], 1)
+
+
+    def test_unmarked(self):
+        self._simulator.send_frame([(3, RVEC, TVEC)], markers=False)
+
+        self.assertEqual(self._camera.detect(timeout=1).marker_id, 3)
+
+
+    def test_camera_time(self):
+        self._simulator.send_frame([(2, RVEC, TVEC)], camera_time=100.0)
+        first = self._camera.detect(timeout=1)
+        # The second frame was captured 0.05 seconds after the first, but its
+        # messages were held up.
+        sleep(0.1)
+        self._simulator.send_frame([(2, RVEC, TVEC)], camera_time=100.05)
+        second = self._camera.detect(timeout=1)
+
+        self.assertAlmostEqual(second.timestamp - first.timestamp, 0.05,
+                               places=3)
+
+
+    def test_latency(self):
+        camera = SmartCamera(self._simulator.get_port(), latency=10)
+        camera.open()
+        self._simulator.send_frame([(2, RVEC, TVEC)])
+        tag_data = camera.detect(timeout=1)
+        camera.release()
+
+        self._simulator.send_frame([(2, RVEC, TVEC)])
+        self.assertTrue(self._camera.detect(timeout=1).timestamp
+                        - tag_data.timestamp >= 10)
+
+
+    def test_img_src(self):
+        with self.assertRaises(ValueError):
+            self._camera.detect(img_src="tag.jpg")
+
+
+    def test_missing_port(self):
+        with self.assertRaises(IOError):
+            SmartCamera("/dev/missing").detect()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+from os import path
+
+import logging
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from stagetimer import StageTimer
+
+class StageTimerTest(unittest.TestCase):
+    def test_disabled_by_default(self):
+        timer = StageTimer(('a',))
+
+        timer.start()
+        timer.mark('a')
+        timer.finish()
+
+        self.assertFalse(timer.is_enabled())
+        self.assertEqual(timer.snapshot(), {})
+
+
+    def test_mark(self):
+        timer = StageTimer(('a', 'b'), enabled=True)
+
+        timer.start()
+        timer.mark('a')
+        timer.mark('b')
+        timer.finish()
+
+        snapshot = timer.snapshot()
+        self.assertEqual(snapshot['a']['count'], 1)
+        self.assertEqual(snapshot['b']['count'], 1)
+        self.assertEqual(snapshot[StageTimer.TOTAL]['count'], 1)
+
+
+    def test_unknown_stage(self):
+        timer = StageTimer(('a',), enabled=True)
+
+        timer.start()
+
+        self.assertRaises(KeyError, timer.mark, 'b')
+
+
+    def test_record(self):
+        timer = StageTimer(('a',), enabled=True)
+
+        for elapsed in (0.001, 0.002, 0.003):
+            timer.record('a', elapsed)
+
+        stats = timer.snapshot()['a']
+        self.assertEqual(stats['count'], 3)
+        self.assertAlmostEqual(stats['mean'], 0.002)
+        self.assertAlmostEqual(stats['max'], 0.003)
+        self.assertEqual(sum(stats['histogram']), 3)
+
+
+    def test_percentiles(self):
+        timer = StageTimer(('a',), enabled=True)
+
+        for _ in range(99):
+            timer.record('a', 0.001)
+        timer.record('a', 0.1)
+
+        stats = timer.snapshot()['a']
+        # Percentiles are accurate to one histogram bucket.
+        bucket = 2 ** (1.0 / StageTimer.BUCKETS_PER_DOUBLING)
+        self.assertTrue(0.001 <= stats['p50'] <= 0.001 * bucket)
+        self.assertTrue(0.001 <= stats['p95'] <= 0.001 * bucket)
+        self.assertAlmostEqual(stats['max'], 0.1)
+
+
+    def test_percentile_over_last_edge(self):
+        timer = StageTimer(('a',), enabled=True)
+
+        timer.record('a', 100.0)
+
+        self.assertEqual(timer.snapshot()['a']['p99'], 100.0)
+
+
+    def test_disable_keeps_times(self):
+        timer = StageTimer(('a',), enabled=True)
+        timer.record('a', 0.001)
+
+        timer.disable()
+        timer.record('a', 0.001)
+
+        self.assertEqual(timer.snapshot()['a']['count'], 1)
+
+
+    def test_reset(self):
+        timer = StageTimer(('a',), enabled=True)
+        timer.record('a', 0.001)
+
+        timer.reset()
+
+        self.assertEqual(timer.snapshot(), {})
+
+
+    def test_summary(self):
+        timer = StageTimer(('a',), name='test', enabled=True)
+        timer.record('a', 0.001)
+
+        self.assertTrue(timer.summary().startswith('test p50/p99 ms: a='))
+
+
+    def test_log_interval(self):
+        timer = StageTimer(('a',), name='stagetimer_test', enabled=True,
+                           log_interval=0)
+        lines = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                lines.append(record.getMessage())
+
+        logger = logging.getLogger('stagetimer_test')
+        logger.addHandler(Handler())
+        logger.setLevel(logging.INFO)
+
+        timer.start()
+        timer.finish()
+
+        self.assertEqual(len(lines), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+from os import path
+
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from steering import PurePursuitSteering
+
+class PurePursuitSteeringTest(unittest.TestCase):
+    def setUp(self):
+        self._steering = PurePursuitSteering(wheelbase=0.14, camera_offset=0.1,
+                                             max_rate=100)
+
+
+    def test_straight(self):
+        self.assertEqual(self._steering.get_target_angle(0, 0.3), 90)
+
+
+    def test_right(self):
+        self.assertTrue(self._steering.get_target_angle(0.05, 0.3) > 90)
+
+
+    def test_left(self):
+        self.assertTrue(self._steering.get_target_angle(-0.05, 0.3) < 90)
+
+
+    def test_symmetric(self):
+        right = self._steering.get_target_angle(0.05, 0.3)
+        left = self._steering.get_target_angle(-0.05, 0.3)
+
+        self.assertAlmostEqual(right - 90, 90 - left)
+
+
+    def test_continuous(self):
+        angles = [self._steering.get_target_angle(x / 1000.0, 0.3)
+                  for x in range(0, 50)]
+
+        self.assertTrue(all(b > a for a, b in zip(angles, angles[1:])))
+
+
+    def test_closer_steers_harder(self):
+        self.assertTrue(self._steering.get_target_angle(0.05, 0.1)
+                        > self._steering.get_target_angle(0.05, 0.5))
+
+
+    def test_range(self):
+        self.assertEqual(self._steering.get_target_angle(0.1, 0), 135)
+        self.assertEqual(self._steering.get_target_angle(-0.1, 0), 45)
+
+
+    def test_first_update(self):
+        target = self._steering.get_target_angle(0.1, 0.2)
+
+        self.assertEqual(self._steering.update(0.1, 0.2, 0), target)
+
+
+    def test_rate_limit(self):
+        self._steering.update(0, 0.3, 0)
+
+        self.assertAlmostEqual(self._steering.update(1, 0, 0.1), 100)
+
+
+    def test_repeated_measurement(self):
+        self._steering.update(0, 0.3, 0)
+
+        self.assertEqual(self._steering.update(1, 0, 0), 90)
+
+
+    def test_stale(self):
+        self._steering.update(0, 0.3, 0)
+
+        self.assertEqual(self._steering.update(0.1, 0, 1), 135)
+
+
+    def test_reset(self):
+        self._steering.update(0, 0.3, 0)
+        self._steering.reset()
+
+        self.assertEqual(self._steering.update(0.1, 0, 0.1), 135)
+
+
+if __name__ == '__main__':
+    unittest.main()
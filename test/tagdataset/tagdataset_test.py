@@ -0,0 +1,108 @@
+from os import path
+
+import numpy
+import shutil
+import sys
+import tempfile
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from tagdataset import (TagRenderer, evaluate_dataset, generate_dataset,
+                        load_dataset)
+from tagrec import TagRecognition, single_tag_geometry
+
+class TagRendererTest(unittest.TestCase):
+    def test_unsupported_resolution(self):
+        self.assertRaises(ValueError, TagRenderer, 100)
+
+
+    def test_render_size(self):
+        renderer = TagRenderer(144)
+        rvec, tvec = renderer.get_pose(0, 0, 0.2, 0)
+
+        frame = renderer.render(rvec, tvec)
+
+        self.assertEqual(frame.shape, (144, 176))
+        self.assertEqual(frame.dtype, numpy.uint8)
+
+
+    def test_pose_yaw(self):
+        renderer = TagRenderer(144)
+
+        rvec, tvec = renderer.get_pose(0.01, 0, 0.2, -30)
+
+        self.assertAlmostEqual(single_tag_geometry(rvec, tvec)[3], 30)
+
+
+    def test_render_detected(self):
+        renderer = TagRenderer(480)
+        tag = TagRecognition(resolution=480, marker_length=0.025)
+        rvec, tvec = renderer.get_pose(0.02, 0.01, 0.15, 20)
+
+        tag_data = tag.detect_frame(renderer.render(rvec, tvec))
+
+        self.assertAlmostEqual(tag_data['x'], 0.02, delta=0.002)
+        self.assertAlmostEqual(tag_data['z'], 0.15, delta=0.005)
+        self.assertAlmostEqual(tag_data['yaw'], 20, delta=2)
+
+
+    def test_behind_camera(self):
+        renderer = TagRenderer(144)
+        rvec, tvec = renderer.get_pose(0, 0, -0.2, 0)
+
+        self.assertFalse(renderer.is_visible(rvec, tvec))
+        self.assertTrue((renderer.render(rvec, tvec, background=7) == 7).all())
+
+
+    def test_out_of_frame(self):
+        renderer = TagRenderer(144)
+        rvec, tvec = renderer.get_pose(1, 0, 0.2, 0)
+
+        self.assertFalse(renderer.is_visible(rvec, tvec))
+
+
+class DatasetTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = path.join(self._dir, 'tags.npz')
+
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+
+    def test_generate(self):
+        generate_dataset(self._path, 144, 5, seed=1)
+
+        dataset = load_dataset(self._path)
+        self.assertEqual(dataset['frames'].shape, (5, 144, 176))
+        self.assertEqual(len(dataset['z']), 5)
+        self.assertEqual(int(dataset['resolution']), 144)
+
+
+    def test_seed(self):
+        other = path.join(self._dir, 'other.npz')
+
+        generate_dataset(self._path, 90, 3, seed=1)
+        generate_dataset(other, 90, 3, seed=1)
+
+        self.assertTrue((load_dataset(self._path)['frames']
+                         == load_dataset(other)['frames']).all())
+
+
+    def test_evaluate(self):
+        generate_dataset(self._path, 480, 5, seed=1, distance=(0.1, 0.2),
+                         max_blur=0, max_noise=0, gain=(1, 1),
+                         max_gradient=0)
+
+        results = evaluate_dataset(self._path)
+
+        self.assertEqual(results['frames'], 5)
+        self.assertEqual(results['recall'], 1)
+        self.assertTrue(results['z_error'] < 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+from os import path
+
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from tagobservation import ObservationHistory, TagObservation
+
+class TagObservationTest(unittest.TestCase):
+    def test_defaults(self):
+        observation = TagObservation()
+
+        self.assertEqual(observation.z, 0)
+        self.assertEqual(observation.marker_id, None)
+        self.assertFalse(observation.predicted)
+
+
+    def test_read_by_name(self):
+        observation = TagObservation(x=0.1, z=0.2)
+
+        self.assertEqual(observation['x'], 0.1)
+        self.assertEqual(observation['z'], 0.2)
+        self.assertEqual(observation[1], 0.2)
+
+
+    def test_unknown_name(self):
+        self.assertRaises(KeyError, lambda: TagObservation()['speed'])
+
+
+    def test_immutable(self):
+        observation = TagObservation()
+
+        def set_z():
+            observation.z = 1
+
+        self.assertRaises(AttributeError, set_z)
+
+
+    def test_slots(self):
+        observation = TagObservation()
+
+        def set_speed():
+            observation.speed = 1
+
+        self.assertRaises(AttributeError, set_speed)
+
+
+    def test_replace(self):
+        observation = TagObservation(direction=1, seq=3)
+
+        converted = observation._replace(direction=2)
+
+        self.assertEqual(observation.direction, 1)
+        self.assertEqual(converted.direction, 2)
+        self.assertEqual(converted.seq, 3)
+        self.assertTrue(isinstance(converted, TagObservation))
+
+
+class ObservationHistoryTest(unittest.TestCase):
+    def test_empty(self):
+        history = ObservationHistory(3)
+
+        self.assertEqual(len(history), 0)
+        self.assertEqual(history.latest(), None)
+        self.assertEqual(list(history), [])
+
+
+    def test_append(self):
+        history = ObservationHistory(3)
+        observations = [TagObservation(seq=seq) for seq in range(2)]
+
+        for observation in observations:
+            history.append(observation)
+
+        self.assertEqual(list(history), observations)
+        self.assertEqual(history.latest(), observations[-1])
+
+
+    def test_overwrites_oldest(self):
+        history = ObservationHistory(3)
+        observations = [TagObservation(seq=seq) for seq in range(5)]
+
+        for observation in observations:
+            history.append(observation)
+
+        self.assertEqual(len(history), 3)
+        self.assertEqual(list(history), observations[2:])
+        self.assertEqual(history.latest(), observations[-1])
+
+
+    def test_clear(self):
+        history = ObservationHistory(3)
+        history.append(TagObservation())
+
+        history.clear()
+
+        self.assertEqual(len(history), 0)
+        self.assertEqual(history.latest(), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
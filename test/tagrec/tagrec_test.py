@@ -1,12 +1,70 @@
 from os import path
 
+import cv2
+import cv2.aruco as ar
+import glob
+import numpy
+import shutil
 import sys
+import tempfile
+import threading
+import time
 import unittest
 
 FILE_PATH = path.dirname(path.realpath(__file__))
 sys.path.append(FILE_PATH + "/../../src")
 
-from tagrec import TagRecognition
+from detectorprofile import save_profile
+from framesource import ArraySource, FrameSource
+from imagecache import ImageCache
+from resolutionscheduler import ResolutionScheduler
+from tagrec import TagRecognition, single_tag_geometry, tag_geometry
+
+def rq_decomposition_yaw(rvec):
+    rotation_matrix = numpy.zeros(shape=(3,3))
+    cv2.Rodrigues(rvec, rotation_matrix, jacobian=0)
+    yaw_matrix = cv2.RQDecomp3x3(rotation_matrix)[4]
+    return numpy.degrees(numpy.arccos(yaw_matrix[0][0]))
+
+
+class FlakySource(FrameSource):
+    """Fails the first read, then returns the same frame forever."""
+    def __init__(self, frame):
+        FrameSource.__init__(self)
+        self._frame = frame
+        self.reads = 0
+
+
+    def _open(self):
+        pass
+
+
+    def _read(self, image):
+        self.reads += 1
+        if self.reads == 1:
+            return False, None
+        return True, self._frame
+
+
+class GatedSource(FrameSource):
+    """Returns a frame at once, then waits for the gate before each frame."""
+    def __init__(self, frame):
+        FrameSource.__init__(self)
+        self._frame = frame
+        self.gate = threading.Event()
+        self.reads = 0
+
+
+    def _open(self):
+        pass
+
+
+    def _read(self, image):
+        if self.reads:
+            self.gate.wait()
+        self.reads += 1
+        return True, self._frame
+
 
 class MainTest(unittest.TestCase):
     def setUp(self):
@@ -185,6 +243,46 @@ class MainTest(unittest.TestCase):
         self.assertEqual(tag._BRIGHTNESS, 0)
 
 
+    def test_lut_default(self):
+        tag = TagRecognition()
+
+        self.assertEqual(tag._LUT, None)
+
+
+    def test_lut_matches_add_weighted(self):
+        picture = numpy.arange(256, dtype=numpy.uint8).reshape(16, 16)
+
+        for contrast, brightness in [(0.33, -50), (2, 0), (3.7, -127),
+                                     (0.5, 127), (1, 20)]:
+            tag = TagRecognition(contrast=contrast, brightness=brightness)
+
+            self.assertTrue(numpy.array_equal(
+                cv2.LUT(picture, tag._LUT),
+                cv2.addWeighted(picture, contrast, picture, 0, brightness)))
+
+
+    def test_picture_buffer_reused(self):
+        tag = TagRecognition(contrast=2)
+
+        tag.detect(img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+        picture = tag._picture
+        tag.detect(img_src=self._pictures_dir + "no_tag.jpg")
+
+        self.assertTrue(tag._picture is picture)
+
+
+    def test_cached_image_not_modified(self):
+        cache = ImageCache()
+        tag = TagRecognition(contrast=2, brightness=50, image_cache=cache)
+
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        image = cache.get(img_src, tag.RESOLUTIONS[90]).copy()
+        tag.detect(img_src=img_src)
+
+        self.assertTrue(numpy.array_equal(
+            cache.get(img_src, tag.RESOLUTIONS[90]), image))
+
+
     def test_tag_present(self):
         tag = TagRecognition()
 
@@ -361,5 +459,381 @@ class MainTest(unittest.TestCase):
         self.assertAlmostEqual(tag.detect(img_src=img_src)['yaw'], 5, delta=5)
 
 
+    def test_detect_frame(self):
+        tag = TagRecognition(marker_length=0.025)
+
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+
+        self.assertAlmostEqual(tag.detect_frame(cv2.imread(img_src))['z'],
+                               tag.detect(img_src=img_src)['z'], delta=0.001)
+
+
+    def test_detect_frame_grayscale(self):
+        tag = TagRecognition(marker_length=0.025)
+
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        frame = cv2.imread(img_src, cv2.IMREAD_GRAYSCALE)
+
+        self.assertNotEqual(tag.detect_frame(frame), None)
+
+
+    def test_source_not_opened_on_creation(self):
+        source = ArraySource([])
+        tag = TagRecognition(source=source)
+
+        self.assertFalse(source.is_opened())
+
+
+    def test_source_frame(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        tag = TagRecognition(marker_length=0.025,
+                             source=ArraySource([cv2.imread(img_src)]))
+
+        self.assertNotEqual(tag.detect(), None)
+
+
+    def test_source_out_of_frames(self):
+        tag = TagRecognition(source=ArraySource([]))
+
+        self.assertEqual(tag.detect(), None)
+
+
+    def test_threaded_source_frame(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        tag = TagRecognition(marker_length=0.025, threaded=True,
+                             source=ArraySource([cv2.imread(img_src)],
+                                                loop=True))
+
+        tag_data = tag.detect()
+        tag.release()
+
+        self.assertNotEqual(tag_data, None)
+        self.assertTrue(tag.get_frame_info()[0] > 0)
+
+
+    def test_threaded_frame_detected_once(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        source = GatedSource(cv2.imread(img_src))
+        tag = TagRecognition(marker_length=0.025, threaded=True, source=source)
+
+        first = tag.detect()
+        second = tag.detect()
+        source.gate.set()
+        tag.release()
+
+        self.assertNotEqual(first, None)
+        self.assertEqual(second, None)
+        self.assertEqual(tag.get_frame_info()[0], first.seq)
+
+
+    def test_threaded_source_read_failure(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        tag = TagRecognition(marker_length=0.025, threaded=True,
+                             source=FlakySource(cv2.imread(img_src)))
+
+        self.assertEqual(tag.detect(), None)
+        tag_data = tag.detect()
+        tag.release()
+
+        self.assertNotEqual(tag_data, None)
+
+
+    def test_tracking_default(self):
+        tag = TagRecognition()
+
+        self.assertFalse(tag._TRACKING)
+
+
+    def test_tracking_region_set_after_detection(self):
+        tag = TagRecognition(marker_length=0.025, tracking=True)
+
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        tag.detect(img_src=img_src)
+
+        self.assertNotEqual(tag._roi, None)
+
+
+    def test_tracking_region_cleared_after_miss(self):
+        tag = TagRecognition(marker_length=0.025, tracking=True)
+
+        tag.detect(img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+        tag.detect(img_src=self._pictures_dir + "no_tag.jpg")
+
+        self.assertEqual(tag._roi, None)
+
+
+    def test_tracking_same_result_as_full_frame(self):
+        tag = TagRecognition(marker_length=0.025)
+        tracking_tag = TagRecognition(marker_length=0.025, tracking=True)
+
+        img_src = self._pictures_dir + "right_no_turn_5in.jpg"
+        tracking_tag.detect(img_src=img_src)
+
+        self.assertAlmostEqual(tracking_tag.detect(img_src=img_src)['z'],
+                               tag.detect(img_src=img_src)['z'], delta=0.001)
+
+
+    def _shifted_frames(self, img_src, count):
+        image = cv2.resize(cv2.imread(img_src), (720, 480))
+        return [cv2.warpAffine(image, numpy.float32([[1, 0, i], [0, 1, 0]]),
+                               (720, 480)) for i in range(count)]
+
+
+    def test_detect_interval_default(self):
+        tag = TagRecognition()
+
+        self.assertEqual(tag._DETECT_INTERVAL, 1)
+
+
+    def test_detect_interval_tracks_between_detections(self):
+        tag = TagRecognition(resolution=480, marker_length=0.025,
+                             detect_interval=3)
+        frames = self._shifted_frames(
+            self._pictures_dir + "straight_no_turn_5in.jpg", 3)
+
+        tag.detect_frame(frames[0])
+        tag.detect_frame(frames[1])
+
+        self.assertEqual(tag._frames_since_detection, 1)
+        tag.detect_frame(frames[2])
+        self.assertEqual(tag._frames_since_detection, 2)
+
+
+    def test_detect_interval_same_result_as_detection(self):
+        tag = TagRecognition(resolution=480, marker_length=0.025)
+        flow_tag = TagRecognition(resolution=480, marker_length=0.025,
+                                  detect_interval=4)
+        frames = self._shifted_frames(
+            self._pictures_dir + "straight_no_turn_5in.jpg", 4)
+
+        for frame in frames:
+            tag_data = tag.detect_frame(frame)
+            flow_tag_data = flow_tag.detect_frame(frame)
+
+            self.assertAlmostEqual(flow_tag_data['x'], tag_data['x'],
+                                   delta=0.002)
+            self.assertAlmostEqual(flow_tag_data['z'], tag_data['z'],
+                                   delta=0.005)
+
+
+    def test_detect_interval_redetects_lost_tag(self):
+        tag = TagRecognition(resolution=480, marker_length=0.025,
+                             detect_interval=5)
+
+        tag.detect(img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+
+        self.assertEqual(
+            tag.detect(img_src=self._pictures_dir + "no_tag.jpg"), None)
+        self.assertEqual(tag._flow_corners, None)
+
+
+    def test_search_rows_default(self):
+        tag = TagRecognition()
+
+        self.assertEqual(tag._SEARCH_ROWS, (0, 1))
+
+
+    def test_search_rows_clamped(self):
+        tag = TagRecognition(search_rows=(1.5, -0.5))
+
+        self.assertEqual(tag._SEARCH_ROWS, (0, 1))
+
+
+    def test_search_rows_excludes_tag(self):
+        tag = TagRecognition(marker_length=0.025, search_rows=(0, 0.1))
+
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+
+        self.assertEqual(tag.detect(img_src=img_src), None)
+
+
+    def test_tag_geometry_matches_rq_decomposition(self):
+        random = numpy.random.RandomState(0)
+        rvecs = (random.normal(size=(500, 1, 3))
+                 * random.uniform(0, 3, (500, 1, 1)))
+        tvecs = random.normal(size=(500, 1, 3))
+
+        yaws = tag_geometry(rvecs, tvecs)[3]
+
+        for rvec, yaw in zip(rvecs, yaws):
+            self.assertAlmostEqual(yaw, rq_decomposition_yaw(rvec[0]), places=6)
+
+
+    def test_single_tag_geometry_matches_tag_geometry(self):
+        random = numpy.random.RandomState(1)
+        rvecs = random.normal(size=(100, 1, 3))
+        tvecs = random.normal(size=(100, 1, 3))
+
+        x, z, directions, yaws = tag_geometry(rvecs, tvecs)
+
+        for i in range(len(rvecs)):
+            single = single_tag_geometry(rvecs[i], tvecs[i])
+            self.assertAlmostEqual(single[0], x[i])
+            self.assertAlmostEqual(single[1], z[i])
+            self.assertAlmostEqual(single[2], directions[i])
+            self.assertAlmostEqual(single[3], yaws[i])
+
+
+    def test_single_tag_geometry_zero_x(self):
+        direction = single_tag_geometry(numpy.zeros(3),
+                                        numpy.array([0, 0, 0.2]))[2]
+
+        self.assertAlmostEqual(direction, numpy.pi / 2)
+
+
+    def test_tag_geometry_zero_rotation(self):
+        yaws = tag_geometry(numpy.zeros((1, 1, 3)), numpy.ones((1, 1, 3)))[3]
+
+        self.assertEqual(yaws[0], 0)
+
+
+    def test_tag_geometry_direction(self):
+        tag = TagRecognition()
+        tvecs = numpy.array([[[-0.1, 0, 0.2]], [[0.1, 0, 0.2]], [[0, 0, 0.2]]])
+
+        directions = tag_geometry(numpy.zeros((3, 1, 3)), tvecs)[2]
+
+        self.assertAlmostEqual(directions[0], tag.get_direction(-0.1, 0.2))
+        self.assertAlmostEqual(directions[1], tag.get_direction(0.1, 0.2))
+        self.assertAlmostEqual(directions[2], numpy.pi / 2)
+
+
+    def test_tag_geometry_tag_pictures(self):
+        tag = TagRecognition(marker_length=0.025)
+
+        for img_src in sorted(glob.glob(self._pictures_dir + "*.jpg")):
+            tag_data = tag.detect(img_src=img_src)
+            if not tag_data:
+                continue
+            rvec, tvec, _ = ar.estimatePoseSingleMarkers(tag._corners[0],
+                                                         tag._MARKER_LENGTH,
+                                                         tag._CAMERA_MATRIX,
+                                                         tag._DIST_COEFFS)
+
+            self.assertAlmostEqual(tag_data['yaw'],
+                                   rq_decomposition_yaw(rvec[0][0]), places=6)
+            self.assertEqual(tag_data['x'], tvec[0][0][0])
+            self.assertEqual(tag_data['z'], tvec[0][0][2])
+
+
+    def test_set_resolution(self):
+        tag = TagRecognition(resolution=90)
+
+        tag.set_resolution(480)
+
+        self.assertEqual(tag.get_resolution(), 480)
+        self.assertEqual(tag._size, (480, 720))
+        self.assertAlmostEqual(tag._CAMERA_MATRIX[0][0],
+                               tag._CALIBRATION.get_camera_matrix(720, 480)[0][0])
+
+
+    def test_set_resolution_unsupported(self):
+        tag = TagRecognition(resolution=90)
+
+        tag.set_resolution(100)
+
+        self.assertEqual(tag.get_resolution(), 90)
+
+
+    def test_set_resolution_detects(self):
+        tag = TagRecognition(marker_length=0.025, resolution=144)
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        tag.detect(img_src=img_src)
+
+        tag.set_resolution(480)
+        expected = TagRecognition(marker_length=0.025, resolution=480)
+
+        self.assertEqual(tag.detect(img_src=img_src)['z'],
+                         expected.detect(img_src=img_src)['z'])
+
+
+    def test_resolution_scheduler(self):
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+        # The close ARTag is large at 480p, so a lower resolution is enough.
+        scheduler = ResolutionScheduler(TagRecognition.RESOLUTIONS,
+                                        switch_frames=2)
+        tag = TagRecognition(marker_length=0.025, resolution=480,
+                             resolution_scheduler=scheduler)
+
+        for _ in range(2):
+            self.assertNotEqual(tag.detect(img_src=img_src), None)
+
+        self.assertTrue(tag.get_resolution() < 480)
+        self.assertNotEqual(tag.detect(img_src=img_src), None)
+
+
+    def test_timing_default(self):
+        tag = TagRecognition()
+        tag.detect(img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+
+        self.assertEqual(tag.get_timer().snapshot(), {})
+
+
+    def test_timing(self):
+        tag = TagRecognition(marker_length=0.025, timing=True)
+
+        tag.detect(img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+
+        snapshot = tag.get_timer().snapshot()
+        for stage in TagRecognition.TIMED_STAGES + ('total',):
+            self.assertEqual(snapshot[stage]['count'], 1)
+
+
+    def test_detector_profile(self):
+        tag = TagRecognition(detector_profile={'adaptiveThreshWinSizeMax': 9})
+
+        self.assertEqual(tag._PARAMETERS.adaptiveThreshWinSizeMax, 9)
+
+
+    def test_detector_profile_file(self):
+        profile_dir = tempfile.mkdtemp()
+        profile_path = path.join(profile_dir, 'profile.json')
+        save_profile(profile_path, {'adaptiveThreshWinSizeStep': 20})
+
+        try:
+            tag = TagRecognition(marker_length=0.025,
+                                 detector_profile=profile_path)
+        finally:
+            shutil.rmtree(profile_dir)
+
+        self.assertEqual(tag._PARAMETERS.adaptiveThreshWinSizeStep, 20)
+        self.assertNotEqual(tag.detect(
+                img_src=self._pictures_dir + "straight_no_turn_5in.jpg"), None)
+
+
+    def test_observation_not_shared(self):
+        tag = TagRecognition(marker_length=0.025)
+        img_src = self._pictures_dir + "straight_no_turn_5in.jpg"
+
+        first = tag.detect(img_src=img_src)
+        second = tag.detect(img_src=img_src)
+
+        self.assertFalse(first is second)
+        self.assertEqual(first.seq + 1, second.seq)
+        self.assertTrue(first.timestamp <= second.timestamp)
+
+
+    def test_observation_marker_id(self):
+        tag = TagRecognition(marker_length=0.025)
+
+        tag_data = tag.detect(
+                img_src=self._pictures_dir + "straight_no_turn_5in.jpg")
+
+        self.assertEqual(tag_data.marker_id, 2)
+        self.assertEqual(tag_data['z'], tag_data.z)
+
+
+    def test_history(self):
+        tag = TagRecognition(marker_length=0.025, history_size=2)
+
+        observations = [tag.detect(img_src=self._pictures_dir + name)
+                        for name in ("straight_no_turn_5in.jpg", "no_tag.jpg",
+                                     "straight_no_turn_12in.jpg",
+                                     "left_no_turn_5in.jpg")]
+
+        self.assertEqual(list(tag.get_history()),
+                         [observations[2], observations[3]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,232 @@
+from os import path
+
+import math
+import sys
+import unittest
+
+FILE_PATH = path.dirname(path.realpath(__file__))
+sys.path.append(FILE_PATH + "/../../src")
+
+from tagobservation import TagObservation
+from tagrec import TagRecognition
+from tagtracker import AxisFilter, TagTracker
+
+class ScriptedTag(TagRecognition):
+    """Replays scripted detections with scripted frame timestamps."""
+    def __init__(self, detections):
+        TagRecognition.__init__(self, marker_length=0.025)
+        self._detections = list(detections)
+        self._timestamp = 0
+        self._seq = 0
+
+
+    def get_frame_info(self):
+        return self._seq, self._timestamp
+
+
+    def detect(self, img_src=None):
+        self._timestamp, tag_data = self._detections.pop(0)
+        self._seq += 1
+        return tag_data
+
+
+class RepeatingTag(ScriptedTag):
+    """Reports every scripted frame twice, as a loop faster than the camera."""
+    def __init__(self, detections):
+        ScriptedTag.__init__(self, detections)
+        self._repeat = False
+        self._tag_data = None
+
+
+    def detect(self, img_src=None):
+        if not self._repeat:
+            self._tag_data = ScriptedTag.detect(self, img_src)
+        self._repeat = not self._repeat
+        return self._tag_data
+
+
+class StalledTag(ScriptedTag):
+    """Reports one frame, then no new frames, as a source that timed out."""
+    def __init__(self, timestamp, tag_data):
+        ScriptedTag.__init__(self, [(timestamp, tag_data)])
+
+
+    def detect(self, img_src=None):
+        if self._detections:
+            return ScriptedTag.detect(self, img_src)
+        return None
+
+
+def tag_data(x, z, yaw=0):
+    return TagObservation(x=x, z=z, yaw=yaw, marker_id=2)
+
+
+class AxisFilterTest(unittest.TestCase):
+    def test_reset(self):
+        axis = AxisFilter(1, 0.01, 1)
+        axis.reset(2)
+
+        self.assertEqual(axis.position, 2)
+        self.assertEqual(axis.velocity, 0)
+
+
+    def test_constant_velocity_converges(self):
+        axis = AxisFilter(0.01, 0.0001, 1)
+        axis.reset(0)
+
+        for i in range(1, 50):
+            axis.predict(0.1)
+            axis.update(0.5 * i * 0.1)
+
+        self.assertAlmostEqual(axis.velocity, 0.5, delta=0.01)
+
+
+    def test_predict(self):
+        axis = AxisFilter(1, 0.01, 1)
+        axis.reset(1)
+        axis.velocity = 2
+
+        axis.predict(0.5)
+
+        self.assertAlmostEqual(axis.position, 2)
+
+
+class TagTrackerTest(unittest.TestCase):
+    def test_not_tracking_by_default(self):
+        tracker = TagTracker(ScriptedTag([]))
+
+        self.assertFalse(tracker.is_tracking())
+        self.assertEqual(tracker.predict(), None)
+
+
+    def test_first_detection(self):
+        tracker = TagTracker(ScriptedTag([(1.0, tag_data(0.1, 0.2, 5))]))
+
+        result = tracker.detect()
+
+        self.assertAlmostEqual(result['x'], 0.1)
+        self.assertAlmostEqual(result['z'], 0.2)
+        self.assertAlmostEqual(result['yaw'], 5)
+        self.assertFalse(result.predicted)
+        self.assertEqual(result.marker_id, 2)
+        self.assertTrue(tracker.is_tracking())
+
+
+    def test_not_detected(self):
+        tracker = TagTracker(ScriptedTag([(1.0, None)]))
+
+        self.assertEqual(tracker.detect(), None)
+
+
+    def test_direction_and_decision(self):
+        tag = ScriptedTag([(1.0, tag_data(-0.05, 0.15))])
+        tracker = TagTracker(tag)
+
+        result = tracker.detect()
+
+        self.assertAlmostEqual(result['direction'],
+                               tag.get_direction(-0.05, 0.15))
+        self.assertEqual(result['decision'], -1)
+
+
+    def test_velocity_estimate(self):
+        detections = [(i * 0.1, tag_data(0, 0.3 - 0.02 * i))
+                      for i in range(30)]
+        tracker = TagTracker(ScriptedTag(detections))
+
+        for i in range(30):
+            tracker.detect()
+
+        self.assertAlmostEqual(tracker.get_velocity()[1], -0.2, delta=0.02)
+
+
+    def test_predicts_through_missed_frames(self):
+        detections = ([(i * 0.1, tag_data(0, 0.3 - 0.02 * i))
+                       for i in range(30)]
+                      + [(3.0, None), (3.1, None)])
+        tracker = TagTracker(ScriptedTag(detections), max_missed_frames=2)
+
+        for i in range(30):
+            tracker.detect()
+        tracker.detect()
+        result = tracker.detect()
+
+        self.assertTrue(result.predicted)
+        self.assertAlmostEqual(result['z'], 0.3 - 0.02 * 31, delta=0.01)
+
+
+    def test_lost_after_max_missed_frames(self):
+        detections = [(0.0, tag_data(0, 0.3)), (0.1, None), (0.2, None)]
+        tracker = TagTracker(ScriptedTag(detections), max_missed_frames=1)
+
+        tracker.detect()
+        self.assertNotEqual(tracker.detect(), None)
+        self.assertEqual(tracker.detect(), None)
+        self.assertFalse(tracker.is_tracking())
+
+
+    def test_reset_after_lost(self):
+        detections = [(0.0, tag_data(0, 0.3)), (0.1, None),
+                      (5.0, tag_data(0.1, 0.1))]
+        tracker = TagTracker(ScriptedTag(detections), max_missed_frames=0)
+
+        tracker.detect()
+        tracker.detect()
+        result = tracker.detect()
+
+        self.assertAlmostEqual(result['z'], 0.1)
+        self.assertEqual(tracker.get_velocity(), (0, 0, 0))
+
+
+    def test_smooths_noise(self):
+        noise = [0.01, -0.01] * 15
+        detections = [(i * 0.1, tag_data(0, 0.2 + noise[i]))
+                      for i in range(30)]
+        tracker = TagTracker(ScriptedTag(detections))
+
+        for i in range(30):
+            result = tracker.detect()
+
+        self.assertTrue(abs(result['z'] - 0.2) < 0.01)
+
+
+    def test_repeated_frame_not_fused_again(self):
+        detections = [(1 + i * 0.1, tag_data(0.01 * i, 0.2 + 0.02 * i))
+                      for i in range(5)]
+        tracker = TagTracker(ScriptedTag(detections))
+        repeating = TagTracker(RepeatingTag(detections))
+
+        for i in range(5):
+            expected = tracker.detect()
+            first = repeating.detect()
+            second = repeating.detect()
+
+            self.assertEqual(first, expected)
+            self.assertEqual(second, first)
+        self.assertEqual(repeating.get_velocity(), tracker.get_velocity())
+
+
+    def test_no_new_frame_lost(self):
+        tracker = TagTracker(StalledTag(1.0, tag_data(0, 0.3)),
+                             max_missed_frames=2)
+
+        self.assertFalse(tracker.detect().predicted)
+        self.assertTrue(tracker.detect().predicted)
+        self.assertTrue(tracker.detect().predicted)
+        self.assertEqual(tracker.detect(), None)
+        self.assertFalse(tracker.is_tracking())
+
+
+    def test_direction_straight_ahead(self):
+        tracker = TagTracker(ScriptedTag([(1.0, tag_data(0, 0.3)),
+                                          (1.1, None)]))
+
+        detected = tracker.detect()
+        predicted = tracker.detect()
+
+        self.assertAlmostEqual(detected['direction'], math.pi / 2)
+        self.assertAlmostEqual(predicted['direction'], math.pi / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()